@@ -198,6 +198,8 @@ install -m0644 -D conf/copr-backend.sysusers.conf %{buildroot}%{_sysusersdir}/co
 %systemd_postun_with_restart copr-backend-log.service
 %systemd_postun_with_restart copr-backend-build.service
 %systemd_postun_with_restart copr-backend-action.service
+%systemd_postun_with_restart copr-backend-createrepo.service
+%systemd_postun_with_restart copr-backend-msgbus.service
 
 %files
 %license LICENSE
@@ -387,12 +387,11 @@ class RawhideToRelease(Action):
 
                 if isinstance(self.storage, PulpStorage):
                     build_id = int(build.split("-")[0])
-                    response =self.storage.client.get_content(
+                    rpms = self.storage.client.iter_content(
                         [build_id],
                         data["rawhide_chroot"],
                         fields=["prn"],
                     )
-                    rpms = response.json()["results"]
                     prns = [rpm["prn"] for rpm in rpms]
                     success = self.storage.create_repository_version(
                         data["copr_dir"],
@@ -417,7 +416,8 @@ class RawhideToRelease(Action):
         if isinstance(self.storage, PulpStorage):
             return BackendResultEnum("success")
         for i in range(5):
-            if call_copr_repo(chrootdir, appstream=appstream, logger=self.log):
+            if call_copr_repo(chrootdir, appstream=appstream, logger=self.log,
+                              backend_opts=self.opts):
                 return BackendResultEnum("success")
             self.log.error("Createrepo failed, trying again #%s", i)
             time.sleep(10)
@@ -2,12 +2,15 @@
 BuildBackgroundWorker class + internals.
 """
 
+import contextlib
 import functools
 import glob
+import gzip
 import logging
 import os
 import shutil
 import statistics
+import threading
 import time
 import json
 import shlex
@@ -33,11 +36,11 @@ from copr_backend.exceptions import (
 )
 from copr_backend.rpmeta import rpmeta_predict_build_time
 from copr_backend.helpers import (
-    run_cmd, register_build_result, format_evr,
+    register_build_result, format_evr,
 )
 from copr_backend.job import BuildJob
 from copr_backend.msgbus import MessageSender
-from copr_backend.sign import sign_rpms_in_dir, get_pubkey
+from copr_backend.sign import sign_rpms, get_pubkey
 from copr_backend.sshcmd import SSHConnection, SSHConnectionError
 from copr_backend.vm_alloc import ResallocHostFactory
 from copr_backend.storage import storage_for_job
@@ -152,6 +155,7 @@ class BuildBackgroundWorker(BackendBackgroundWorker):
         self.canceled = False
         self.last_hostname = None
         self.storage = None
+        self._builder_log_compression = None
 
     @classmethod
     def adjust_arg_parser(cls, parser):
@@ -581,16 +585,63 @@ class BuildBackgroundWorker(BackendBackgroundWorker):
         except SSHConnectionError as exc:
             return "Stopped following builder for broken SSH: {}".format(exc)
 
-    def _compress_logs(self):
+    @contextlib.contextmanager
+    def _timed_step(self, name):
         """
-        Compress builder-live.log, backend.log, and fedora-review.log using gzip.
-        Never raise any exception!
+        Log how long the given build (post-processing) step took, so we can
+        see where the wall-clock time goes.
         """
-        logs = [
-            self.job.builder_log,
-            self.job.backend_log,
-            self.job.review_log,
-        ]
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.log.info("Step %s took %.2fs", name, time.time() - start)
+
+    @staticmethod
+    def _compress_log(src):
+        """
+        Compress the log file in-process (no gzip process spawned), and remove
+        the original file like gzip(1) does.  Raise OSError on failure.
+        """
+        dest = src + ".gz"
+        try:
+            with open(src, "rb") as f_in:
+                with gzip.open(dest, "wb") as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+            shutil.copystat(src, dest)
+        except OSError:
+            if os.path.exists(src) and os.path.exists(dest):
+                os.unlink(dest)
+            raise
+        os.unlink(src)
+
+    def _start_builder_log_compression(self):
+        """
+        The builder-live.log is complete once the results are downloaded, so
+        compress it on background while we post-process the build results.
+        """
+        def _compress():
+            with self._timed_step("compress_builder_log"):
+                self._compress_logs([self.job.builder_log])
+
+        self._builder_log_compression = threading.Thread(target=_compress)
+        self._builder_log_compression.start()
+
+    def _compress_logs(self, logs=None):
+        """
+        Compress builder-live.log, backend.log, and fedora-review.log in-process
+        (see _compress_log()).  Never raise any exception!
+        """
+        if logs is None:
+            logs = [
+                self.job.builder_log,
+                self.job.backend_log,
+                self.job.review_log,
+            ]
+            if self._builder_log_compression:
+                # already compressed (or being compressed) on background
+                self._builder_log_compression.join()
+                logs.remove(self.job.builder_log)
 
         # For automatic redirect from log to log.gz, consider configuring
         # Lighttpd like:
@@ -623,9 +674,8 @@ class BuildBackgroundWorker(BackendBackgroundWorker):
         for src in logs:
             dest = src + ".gz"
             if os.path.exists(dest):
-                # This shouldn't ever happen, but if it happened - gzip below
-                # would interactively ask whether we want to overwrite the
-                # existing file, and it would deadlock the worker.
+                # This shouldn't ever happen, but if it happened we don't want
+                # to overwrite the existing (possibly complete) compressed log.
                 self.log.error("Compressed log %s exists", dest)
                 continue
 
@@ -635,10 +685,11 @@ class BuildBackgroundWorker(BackendBackgroundWorker):
                 self.log.warning("Not trying to compress %s as it does not exist", src)
                 continue
 
-            self.log.info("Compressing %s by gzip", src)
-            res = run_cmd(["gzip", src], logger=self.log)
-            if res.returncode not in [0, 2]:
-                self.log.error("Unable to compress file %s", src)
+            self.log.info("Compressing %s", src)
+            try:
+                self._compress_log(src)
+            except OSError as err:
+                self.log.error("Unable to compress file %s: %s", src, err)
 
     def _download_results(self):
         """
@@ -665,18 +716,28 @@ class BuildBackgroundWorker(BackendBackgroundWorker):
         don't remove them from the original place. At the end, a `self._cleanup`
         method will remove the temporary data.
 
+        When signing is enabled, each RPM is uploaded as soon as it is signed,
+        while the other RPMs are still being signed.
+
         Currently, we need to run several more methods between this method and
         the cleanup but it should be possible to rearrange the steps, so that
         this method could upload the results and remove the temporary files
         at the same time.
         """
         rpms = self.storage.find_build_results(self.job.results_dir)
+        if self.opts.do_sign:
+            rpms = self._sign_built_packages(rpms)
+
         result = self.storage.upload_build_results(
             rpms,
             self.job.chroot,
             build_id=self.job.build_id,
         )
 
+        # Not every storage uploads the RPMs, but they need to be signed anyway
+        for _ in rpms:
+            pass
+
         # Only PulpStorage returns package HREFs
         if not result:
             return
@@ -702,25 +763,30 @@ class BuildBackgroundWorker(BackendBackgroundWorker):
         if not os.path.exists(successfile):
             raise BackendError("No success file => build failure")
 
-    @skipped_for_source_build
-    def _sign_built_packages(self):
+    def _sign_built_packages(self, rpms):
         """
             Sign built rpms
              using `copr_username` and `copr_projectname` from self.job
              by means of obs-sign. If user builds doesn't have a key pair
              at sign service, it would be created through ``copr-keygen``
 
-        :param chroot_dir: Directory with rpms to be signed
-        :param pkg: path to the source package
+        This is a generator, the signed RPMs are yielded one by one.  Nothing
+        is signed for source builds, the RPMs are just passed through.
 
+        :param rpms: list of paths to RPMs to be signed
         """
+        if self.job.chroot == 'srpm-builds':
+            self.log.debug("Skipping signing for source build")
+            yield from rpms
+            return
+
         self.log.info("Going to sign pkgs from source: %s in chroot: %s",
                       self.job.task_id, self.job.chroot_dir)
 
-        sign_rpms_in_dir(
+        yield from sign_rpms(
             self.job.project_owner,
             self.job.project_name,
-            os.path.join(self.job.chroot_dir, self.job.target_dir_name),
+            rpms,
             self.job.chroot,
             opts=self.opts,
             log=self.log
@@ -1032,24 +1098,29 @@ class BuildBackgroundWorker(BackendBackgroundWorker):
                              .format(transfer_failure))
 
         self._keep_alive_for_user_ssh()
-        self._download_results()
+        with self._timed_step("download_results"):
+            self._download_results()
         self._drop_host()
+        self._start_builder_log_compression()
 
         # raise error if build failed
         try:
             self._check_build_success()
             # Build _succeeded_.  Do the tasks for successful run.
             failed = False
-            if self.opts.do_sign:
-                self._sign_built_packages()
-            self._upload_results_to_storage()
-            self._do_createrepo()
-            self._parse_results()
-            build_details = self._get_build_details(self.job)
-            self.job.update(build_details)
-            self.job.validate()
-            self._add_pubkey()
-            self._cleanup()
+            with self._timed_step("sign_and_upload"):
+                self._upload_results_to_storage()
+            with self._timed_step("createrepo"):
+                self._do_createrepo()
+            with self._timed_step("parse_results"):
+                self._parse_results()
+                build_details = self._get_build_details(self.job)
+                self.job.update(build_details)
+                self.job.validate()
+            with self._timed_step("add_pubkey"):
+                self._add_pubkey()
+            with self._timed_step("cleanup"):
+                self._cleanup()
         except Exception as ex:
             self.log.error("Build failed: %s", ex)
             failed = True
@@ -1109,4 +1180,6 @@ class BuildBackgroundWorker(BackendBackgroundWorker):
                 self._compress_logs()
             else:
                 self.log.error("No job object from Frontend")
+            if self.storage:
+                self.storage.close()
             self.redis_set_worker_flag("status", "done")
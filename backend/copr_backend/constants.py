@@ -39,6 +39,16 @@ class BuildStatus(object):
 
 LOG_REDIS_FIFO = "copr:backend:log:fifo::"
 
+# createrepo daemon, see copr_backend.daemons.createrepo
+CREATEREPO_REDIS_FIFO = "copr:backend:createrepo:fifo::"
+CREATEREPO_REDIS_PROCESSING = "copr:backend:createrepo:processing::"
+CREATEREPO_REDIS_RESULT = "copr:backend:createrepo:result::{}"
+CREATEREPO_REDIS_ALIVE = "copr:backend:createrepo:alive"
+
+# message bus outbox, see copr_backend.daemons.msgbus
+MSGBUS_REDIS_OUTBOX = "copr:backend:msgbus:outbox::{}"
+MSGBUS_REDIS_WAKEUP = "copr:backend:msgbus:wakeup::"
+
 default_log_format = Formatter(
     '[%(asctime)s][%(levelname)6s][PID:%(process)d][%(name)10s][%(filename)s:%(funcName)s:%(lineno)d] %(message)s')
 build_log_format = Formatter(
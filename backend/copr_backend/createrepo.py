@@ -1,7 +1,18 @@
+"""
+Createrepo related logic, shared by the 'copr-repo' script and the createrepo
+daemon.
+"""
+
+import datetime
 import json
 import os
+import shlex
+import shutil
+import subprocess
 
 from copr_common.redis_helpers import get_redis_connection
+from copr_backend.constants import CHROOTS_USING_SQLITE_REPODATA
+from copr_backend.helpers import run_cmd
 
 # todo: add logging here
 # from copr_backend.helpers import BackendConfigReader, get_redis_logger
@@ -219,3 +230,268 @@ class BatchedCreaterepo:
         for key in self.notify_keys:
             self.log.info("Notifying %s that we succeeded", key)
             self.redis.hset(key, "status", "success")
+
+
+def check_subdir(subdir):
+    """
+    Check that the build subdirectory name (in a chroot directory) is sane,
+    raise ValueError if not.
+    """
+    if not subdir:
+        raise ValueError("subdir can not be empty string")
+    if '..' in subdir:
+        raise ValueError("relative '..' in subdir name '{}'".format(subdir))
+    if ' ' in subdir:
+        raise ValueError("space character in subdir name '{}'".format(subdir))
+    if '/' in subdir:
+        raise ValueError(
+            "'/' in subdir name '{}', we support only single-level subdir "
+            "for now".format(subdir))
+    return subdir
+
+
+def printable_cmd(cmd):
+    return ' '.join([shlex.quote(arg) for arg in cmd])
+
+
+def unlink_unsafe(path):
+    try:
+        os.unlink(path)
+    except:
+        pass
+
+
+def filter_existing(opts, subdirs):
+    """ Return items from ``subdirs`` that exist """
+    new_subdirs = []
+    for subdir in subdirs:
+        full_path = os.path.join(opts.directory, subdir)
+        if not os.path.exists(full_path):
+            opts.log.warning("Subdirectory %s doesn't exist", subdir)
+            continue
+        new_subdirs.append(subdir)
+    return new_subdirs
+
+
+def _database_option(chroot: str) -> str:
+    for os_family, old_versions in CHROOTS_USING_SQLITE_REPODATA.items():
+        if any(f"{os_family}-{old_version}" == chroot for old_version in old_versions):
+            return "--database"
+
+    return "--no-database"
+
+
+def run_createrepo(opts):
+    compression = "--general-compress-type=gz"
+    createrepo_cmd = ['/usr/bin/createrepo_c', opts.directory, _database_option(opts.chroot), '--ignore-lock',
+                      '--local-sqlite', '--cachedir', '/tmp/', '--workers', '8', compression]
+
+    if "epel-5" in opts.directory or "rhel-5" in opts.directory:
+        # this is because rhel-5 doesn't know sha256
+        createrepo_cmd.extend(['-s', 'sha', '--checksum', 'md5'])
+
+    mb_comps_xml_path = os.path.join(opts.directory, "comps.xml")
+    if os.path.exists(mb_comps_xml_path):
+        createrepo_cmd += ['--groupfile', mb_comps_xml_path]
+
+    repodata_xml = os.path.join(opts.directory, 'repodata', 'repomd.xml')
+    repodata_exist = os.path.exists(repodata_xml)
+
+    if repodata_exist:
+        # optimized createrepo run
+        createrepo_cmd += ["--update"]
+        if not opts.do_stat:
+            # We never change the RPM files, therefore we can rely on the
+            # caches.  Exception to this rule is e.g. copr_fix_gpg.py file.
+            createrepo_cmd += ["--skip-stat"]
+        if not opts.full:
+            createrepo_cmd += ["--recycle-pkglist"]
+
+    opts.add = filter_existing(opts, opts.add)
+    opts.delete = filter_existing(opts, opts.delete)
+
+    # full run is never skipped
+    createrepo_run_needed = opts.full
+
+    for subdir in opts.delete:
+        # something is going to be deleted
+        createrepo_run_needed = True
+        createrepo_cmd += ['--excludes', '*{}/*'.format(subdir)]
+
+    for rpm in opts.rpms_to_remove:
+        createrepo_run_needed = True
+        createrepo_cmd += ['--excludes', '{}'.format(rpm)]
+
+    filelist = os.path.join(opts.directory, '.copr-createrepo-pkglist')
+    if opts.add:
+        # assure createrepo is run after each addition
+        createrepo_run_needed = True
+
+        unlink_unsafe(filelist)
+        with open(filelist, "wb") as filelist_fd:
+            for subdir in opts.add:
+                q_dir = shlex.quote(opts.directory)
+                q_sub = shlex.quote(subdir)
+                find = 'cd {} && find {} -name "*.rpm"'.format(q_dir, q_sub)
+                opts.log.info("searching for rpms: %s", find)
+                files = subprocess.check_output(find, shell=True)
+                opts.log.info("rpms: %s", files.decode('utf-8').strip().split('\n'))
+                filelist_fd.write(files)
+
+        createrepo_cmd += ['--pkglist', filelist]
+
+    if opts.devel:
+        # createrepo_c doesn't create --outputdir itself
+        outputdir = os.path.join(opts.directory, 'devel')
+        try:
+            os.mkdir(outputdir)
+        except FileExistsError:
+            pass
+
+        createrepo_cmd += [
+            '--outputdir', outputdir,
+            '--baseurl', opts.baseurl]
+
+        # TODO: With --devel, we should check that all removed packages isn't
+        # referenced by the main repository.  If it does, we should delete those
+        # entries from main repo as well.
+
+    try:
+        if createrepo_run_needed:
+            run_cmd(createrepo_cmd, check=True, logger=opts.log)
+        else:
+            opts.log.info("createrepo_c run is not actually needed, "
+                          "skipping command: %s",
+                          printable_cmd(createrepo_cmd))
+
+    finally:
+        unlink_unsafe(filelist)
+
+    return createrepo_run_needed
+
+
+def add_appdata(opts):
+    if opts.devel:
+        opts.log.info("appstream-builder skipped, /devel subdir")
+        return
+
+    if os.path.exists(os.path.join(opts.projectdir, ".disable-appstream")):
+        opts.log.info("appstream-builder skipped, .disable-appstream file")
+        return
+
+    if not opts.appstream:
+        opts.log.info("appstream-builder skipped")
+        return
+
+    path = opts.directory
+    origin = os.path.join(opts.ownername, opts.projectname)
+
+    run_cmd([
+        "/usr/bin/timeout", "--kill-after=240", "180",
+        "/usr/bin/appstream-builder",
+        "--temp-dir=" + os.path.join(path, 'tmp'),
+        "--cache-dir=" + os.path.join(path, 'cache'),
+        "--packages-dir=" + path,
+        "--output-dir=" + os.path.join(path, 'appdata'),
+        "--basename=appstream",
+        "--include-failed",
+        "--min-icon-size=48",
+        "--veto-ignore=missing-parents",
+        "--enable-hidpi",
+        "--origin=" + origin],
+        check=True, logger=opts.log)
+
+    mr_cmd = ["/usr/bin/modifyrepo_c", "--no-compress"]
+
+    if os.path.exists(os.path.join(path, "appdata", "appstream.xml.gz")):
+        run_cmd(mr_cmd + [os.path.join(path, 'appdata', 'appstream.xml.gz'),
+                          os.path.join(path, 'repodata')],
+                check=True, logger=opts.log)
+
+    if os.path.exists(os.path.join(path, "appdata", "appstream-icons.tar.gz")):
+        run_cmd(mr_cmd +
+                [os.path.join(path, 'appdata', 'appstream-icons.tar.gz'),
+                 os.path.join(path, 'repodata')],
+                check=True, logger=opts.log)
+
+    # The appstream-builder utility provides a strange access rights to the
+    # created directories.  Fix them, so that lighttpd could serve appdata dir.
+    # https://github.com/hughsie/appstream-glib/issues/399
+    fix_dirs = ["tmp", "cache", "appdata"]
+    find_cmd = ["find"] + [os.path.join(path, subdir) for subdir in fix_dirs]
+    run_cmd(find_cmd + ["-type", "d", "-exec", "chmod", "755", "{}", "+"],
+            check=True, logger=opts.log)
+    run_cmd(find_cmd + ["-type", "f", "-exec", "chmod", "644", "{}", "+"],
+            check=True, logger=opts.log)
+
+
+def delete_builds(opts):
+    # To avoid race conditions, remove the directories _after_ we have
+    # successfully generated the new repodata.
+    for subdir in opts.delete:
+        opts.log.info("removing %s subdirectory", subdir)
+        try:
+            shutil.rmtree(os.path.join(opts.directory, subdir))
+        except:
+            opts.log.exception("can't remove %s subdirectory", subdir)
+
+    for rpm in opts.rpms_to_remove:
+        opts.log.info("removing %s", rpm)
+        try:
+            os.unlink(os.path.join(opts.directory, rpm))
+            prune_log = os.path.join(opts.directory, os.path.dirname(rpm),
+                                     "prune.log")
+            with open(prune_log, "a+") as fd:
+                fd.write("{} pruned on {}, by PID {}\n".format(
+                    rpm,
+                    datetime.datetime.now(datetime.UTC),
+                    os.getpid(),
+                ))
+        except OSError:
+            opts.log.exception("can't remove %s", rpm)
+
+
+def assert_new_createrepo():
+    sp = subprocess.Popen(['/usr/bin/createrepo_c', '--help'],
+                          stdout=subprocess.PIPE)
+    out, _ = sp.communicate()
+    assert b'--recycle-pkglist' in out
+
+
+def process_directory_path(opts):
+    helper_path = opts.directory = os.path.realpath(opts.directory)
+    helper_path, opts.chroot = os.path.split(helper_path)
+    opts.projectdir = helper_path
+    helper_path, opts.dirname = os.path.split(helper_path)
+    helper_path, opts.ownername = os.path.split(helper_path)
+    opts.projectname = opts.dirname.split(':')[0]
+    opts.baseurl = os.path.join(opts.results_baseurl, opts.ownername,
+                                opts.dirname, opts.chroot)
+
+
+def update_repository(opts):
+    """
+    Add (opts.add) and remove (opts.delete, opts.rpms_to_remove) the builds
+    to/from the repository in opts.directory, and re-generate the repository
+    metadata.  This needs to be called under the directory lock.  Return False
+    if nothing needed to be done.
+    """
+    dont_add = set(opts.delete).intersection(opts.add)
+    if dont_add:
+        opts.log.info("Subdirs %s are requested to both added and removed, "
+                      "so we only remove them", ", ".join(dont_add))
+        opts.add = list(set(opts.add) - dont_add)
+
+    # (re)create the repository
+    if not run_createrepo(opts):
+        opts.log.warning("no-op")
+        return False
+
+    # delete the RPMs, do this _after_ craeterepo, so we close the major
+    # race between package removal and re-createrepo
+    delete_builds(opts)
+
+    # TODO: racy, these info aren't available for some time, once it is
+    # possible we should move those two things before 'delete_builds' call.
+    add_appdata(opts)
+    return True
@@ -2,6 +2,7 @@
 BuildDispatcher related classes.
 """
 
+from copr_common.dispatcher import TaskChanges
 from copr_common.worker_manager import HashWorkerLimit
 from copr_backend.dispatcher import BackendDispatcher
 from copr_backend.rpm_builds import (
@@ -86,6 +87,11 @@ class BuildDispatcher(BackendDispatcher):
         super().__init__(backend_opts)
         self.max_workers = backend_opts.builds_max_workers
 
+        # Opaque token identifying the last task list we downloaded from
+        # frontend, see get_frontend_task_changes().
+        self._queue_token = None
+        self._priority = _PriorityCounter()
+
         for tag_type in ["arch", "tag", "arch_per_owner"]:
             match tag_type:
                 case "arch":
@@ -120,20 +126,48 @@ class BuildDispatcher(BackendDispatcher):
         """
         Retrieve a list of build jobs to be done.
         """
+        changes = self._get_pending_jobs_delta(None)
+        if changes is None:
+            return []
+        return changes.changed
+
+    def get_frontend_task_changes(self):
+        """
+        Retrieve only the changes in the build queue since the last call.
+        """
+        if not self._queue_token:
+            return None
+        return self._get_pending_jobs_delta(self._queue_token)
+
+    def _get_pending_jobs_delta(self, token):
+        """
+        Ask frontend what happened in the build queue since the ``token`` was
+        generated.  Without ``token`` (or if frontend doesn't remember it) we
+        get the full queue.
+        """
+        url_path = "pending-jobs-delta"
+        if token:
+            url_path += "/" + token
+
         try:
-            raw_tasks = self.frontend_client.get('pending-jobs').json()
+            delta = self.frontend_client.get(url_path).json()
         except (FrontendClientException, ValueError) as error:
             self.log.exception("Retrieving build jobs from %s failed with error: %s",
                                self.opts.frontend_base_url, error)
-            return []
+            self._queue_token = None
+            return None
+
+        self._queue_token = delta["token"]
+        if delta["full"]:
+            self._priority = _PriorityCounter()
 
         tasks = []
-        priority = _PriorityCounter()
-        for raw in raw_tasks:
+        for raw in delta["changed"]:
             task = BuildQueueTask(raw)
-            task.backend_priority = priority.get_priority(task)
+            task.backend_priority = self._priority.get_priority(task)
             tasks.append(task)
-        return tasks
+
+        return TaskChanges(tasks, delta["removed"], full=delta["full"])
 
     def get_cancel_requests_ids(self):
         try:
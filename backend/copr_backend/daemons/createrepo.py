@@ -0,0 +1,252 @@
+"""
+Long-running createrepo service.  Instead of starting one 'copr-repo' process
+per each finished build (each of them fighting for the same directory lock),
+call_copr_repo() hands over the request to this daemon through a Redis queue.
+All the requests pending for the same repository directory are coalesced
+into a single createrepo_c run, different directories are processed
+concurrently.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import time
+
+from munch import Munch
+from setproctitle import setproctitle
+
+from copr_common.lock import Lock
+from copr_common.redis_helpers import get_redis_connection
+
+from copr_backend.constants import (
+    CREATEREPO_REDIS_ALIVE,
+    CREATEREPO_REDIS_FIFO,
+    CREATEREPO_REDIS_PROCESSING,
+    CREATEREPO_REDIS_RESULT,
+)
+from copr_backend.createrepo import (
+    MAX_IN_BATCH,
+    assert_new_createrepo,
+    check_subdir,
+    process_directory_path,
+    update_repository,
+)
+from copr_backend.helpers import CommandException, get_redis_logger
+
+
+def _unique(items):
+    return list(dict.fromkeys(items))
+
+
+class CreaterepoDaemon:
+    """
+    Process the createrepo requests from the CREATEREPO_REDIS_FIFO queue, and
+    report the results back to the CREATEREPO_REDIS_RESULT lists (the
+    requesting processes wait there).
+
+    The requests are LPUSHed to the queue, and the daemon takes them from the
+    right end with (B)RPOPLPUSH (not BLMOVE, which needs Redis 6.2+).  The
+    accepted requests are atomically moved to the CREATEREPO_REDIS_PROCESSING
+    list, and they are removed from there only once the result is reported.  So no request is lost when the daemon is
+    restarted, the unfinished requests are processed again after the start.
+
+    Each repository directory is processed by at most one thread at a time,
+    requests for a busy directory wait (and are coalesced) till the thread
+    finishes.  Requests are coalesced only if they have the same 'devel' and
+    'appstream' options, see BatchedCreaterepo.options() for more info.
+    """
+
+    # While running, we keep the CREATEREPO_REDIS_ALIVE key in Redis.
+    alive_timeout = 60
+    # How long we wait for a new request in one loop.
+    wait_timeout = 10
+    # How long we keep the results for the requesting processes.
+    result_timeout = 3600
+
+    def __init__(self, opts, log=None):
+        self.opts = opts
+        self.log = log or get_redis_logger(opts, "createrepo_daemon",
+                                           "modifyrepo")
+        self.redis = get_redis_connection(opts)
+        self.executor = ThreadPoolExecutor(
+            max_workers=opts.get("createrepo_daemon_workers", 4))
+        self.lock = threading.Lock()
+        # directories being processed right now
+        self.busy = set()
+        # directory => list of requests waiting for the directory
+        self.waiting = {}
+
+    def _keep_alive(self):
+        while True:
+            self.redis.set(CREATEREPO_REDIS_ALIVE, "1", ex=self.alive_timeout)
+            time.sleep(self.alive_timeout / 6)
+
+    def _parse(self, raw_requests):
+        requests = []
+        for raw in raw_requests:
+            try:
+                request = json.loads(raw)
+            except ValueError:
+                self.log.error("Invalid createrepo request: %s", raw)
+                self.redis.lrem(CREATEREPO_REDIS_PROCESSING, 1, raw)
+                continue
+            # for dropping it from CREATEREPO_REDIS_PROCESSING
+            request["raw"] = raw
+            requests.append(request)
+        return requests
+
+    def get_requests(self):
+        """
+        Wait for the next request, and return the list of all the currently
+        pending requests.  The requests are moved to the
+        CREATEREPO_REDIS_PROCESSING list.
+        """
+        raw = self.redis.brpoplpush(CREATEREPO_REDIS_FIFO,
+                                    CREATEREPO_REDIS_PROCESSING,
+                                    self.wait_timeout)
+        if raw is None:
+            return []
+
+        pipeline = self.redis.pipeline()
+        for _ in range(self.redis.llen(CREATEREPO_REDIS_FIFO)):
+            pipeline.rpoplpush(CREATEREPO_REDIS_FIFO,
+                               CREATEREPO_REDIS_PROCESSING)
+        pending = [item for item in pipeline.execute() if item is not None]
+        return self._parse([raw] + pending)
+
+    def get_unfinished_requests(self):
+        """
+        Return the requests accepted, but not finished, before the restart.
+        The oldest requests are at the right end of the list.
+        """
+        raw_requests = self.redis.lrange(CREATEREPO_REDIS_PROCESSING, 0, -1)
+        return self._parse(reversed(raw_requests))
+
+    def dispatch(self, requests):
+        """
+        Queue the requests for processing, start the threads for the
+        directories that are not being processed right now.
+        """
+        with self.lock:
+            for request in requests:
+                self.waiting.setdefault(request["directory"], []).append(request)
+            for directory in list(self.waiting):
+                if directory in self.busy:
+                    continue
+                self.busy.add(directory)
+                self.executor.submit(self.process_directory, directory,
+                                     self.waiting.pop(directory))
+
+    def process_directory(self, directory, requests):
+        """
+        Process all the requests for one directory, and then the requests
+        that came for the directory in the meantime.
+        """
+        try:
+            for batch in self.coalesce(requests):
+                self.process_batch(batch)
+        except Exception:  # pylint: disable=broad-except
+            # the executor would silently swallow it
+            self.log.exception("Failed to process requests for %s", directory)
+        finally:
+            with self.lock:
+                self.busy.discard(directory)
+            self.dispatch([])
+
+    @staticmethod
+    def coalesce(requests):
+        """
+        Split the list of requests into batches, one batch is processed by a
+        single createrepo_c run.
+        """
+        groups = {}
+        for request in requests:
+            key = (request["directory"], request["devel"], request["appstream"])
+            groups.setdefault(key, []).append(request)
+
+        batches = []
+        for group in groups.values():
+            for i in range(0, len(group), MAX_IN_BATCH):
+                batches.append(group[i:i+MAX_IN_BATCH])
+        return batches
+
+    def batch_opts(self, batch):
+        """
+        Merge the requests in batch into the 'copr-repo' like options
+        """
+        first = batch[0]
+        opts = Munch(
+            log=self.log,
+            results_baseurl=self.opts.results_baseurl,
+            directory=first["directory"],
+            devel=first["devel"],
+            appstream=first["appstream"],
+            do_stat=any(request["do_stat"] for request in batch),
+            full=False,
+            add=[],
+            delete=[],
+            rpms_to_remove=[],
+        )
+
+        for request in batch:
+            for subdir in request["add"] + request["delete"]:
+                check_subdir(subdir)
+            if not (request["add"] or request["delete"]
+                    or request["rpms_to_remove"]):
+                # neither --add nor --delete means full createrepo run
+                opts.full = True
+            opts.add += request["add"]
+            opts.delete += request["delete"]
+            opts.rpms_to_remove += request["rpms_to_remove"]
+
+        if opts.full:
+            # There's no point in searching for directories to be added, but we
+            # still want to process .delete/.rpms_to_remove!
+            opts.add = []
+
+        opts.add = _unique(opts.add)
+        opts.delete = _unique(opts.delete)
+        opts.rpms_to_remove = _unique(opts.rpms_to_remove)
+        process_directory_path(opts)
+        return opts
+
+    def process_batch(self, batch):
+        """
+        Run createrepo for the batch of requests, and notify the requesters.
+        """
+        result = "failure"
+        try:
+            opts = self.batch_opts(batch)
+            self.log.info("Processing %s createrepo request(s) for %s",
+                          len(batch), opts.directory)
+            with Lock(self.redis, self.log).lock(opts.directory):
+                update_repository(opts)
+            result = "success"
+        except CommandException:
+            self.log.exception("Sub-command failed")
+        except Exception:  # pylint: disable=broad-except
+            self.log.exception("Unexpected exception")
+
+        pipeline = self.redis.pipeline()
+        for request in batch:
+            key = CREATEREPO_REDIS_RESULT.format(request["id"])
+            pipeline.rpush(key, result)
+            pipeline.expire(key, self.result_timeout)
+            pipeline.lrem(CREATEREPO_REDIS_PROCESSING, 1, request["raw"])
+        pipeline.execute()
+
+    def run(self):
+        """
+        Process the requests, indefinitely.  Exit immediately if the
+        'createrepo_daemon' option is disabled.
+        """
+        setproctitle("CreaterepoDaemon")
+        if not self.opts.createrepo_daemon:
+            # call_copr_repo() runs copr-repo directly, nothing to do.
+            self.log.info("The createrepo_daemon option is disabled, exiting")
+            return
+        assert_new_createrepo()
+        threading.Thread(target=self._keep_alive, daemon=True).start()
+        self.dispatch(self.get_unfinished_requests())
+        while True:
+            self.dispatch(self.get_requests())
@@ -14,12 +14,43 @@ from .. import constants
 from .. import helpers
 
 
+class BatchedFileHandler(logging.handlers.WatchedFileHandler):
+    """
+    WatchedFileHandler that checks whether the file was rotated, and flushes
+    the written records, only once per batch of records (see begin_batch() and
+    end_batch()) instead of once per each record.
+    """
+
+    def emit(self, record):
+        # skip the WatchedFileHandler's os.stat() call
+        logging.FileHandler.emit(self, record)
+
+    def flush(self):
+        # called by StreamHandler.emit() after each record, see end_batch()
+        pass
+
+    def begin_batch(self):
+        """ Re-open the log file if it was rotated """
+        self.acquire()
+        try:
+            self.reopenIfNeeded()
+        finally:
+            self.release()
+
+    def end_batch(self):
+        """ Write the buffered records """
+        logging.FileHandler.flush(self)
+
+
 class RedisLogHandler(object):
     """
     Single point to collect logs through redis pub/sub and write
         them through standard python logging lib
     """
 
+    # Maximum number of records taken from Redis at once
+    batch_size = 1000
+
     def __init__(self, opts):
         self.opts = opts
 
@@ -38,15 +69,17 @@ class RedisLogHandler(object):
 
         level = getattr(logging, self.opts.log_level.upper(), None)
         self.loggers = {}
+        self.handlers = []
 
         for component in self.components:
             logger = logging.Logger(component)
-            handler = logging.handlers.WatchedFileHandler(
+            handler = BatchedFileHandler(
                 filename=os.path.join(self.log_dir, "{}.log".format(component)))
             handler.setFormatter(self.opts.log_format)
             handler.setLevel(level)
             logger.addHandler(handler)
             self.loggers[component] = logger
+            self.handlers.append(handler)
 
     def handle_msg(self, json_event):
         try:
@@ -64,13 +97,36 @@ class RedisLogHandler(object):
         except Exception as err:
             self.main_logger.exception(err)
 
+    def get_batch(self, rc):
+        """
+        Wait for the next entry, and return the list of it plus (at most
+        batch_size) other pending entries.
+        """
+        # indefinitely wait for the next entry, note that blpop returns
+        # tuple (FIFO_NAME, ELEMENT)
+        (_, json_event) = rc.blpop([constants.LOG_REDIS_FIFO])
+
+        pipeline = rc.pipeline()
+        pipeline.lrange(constants.LOG_REDIS_FIFO, 0, self.batch_size - 1)
+        pipeline.ltrim(constants.LOG_REDIS_FIFO, self.batch_size, -1)
+        pending, _ = pipeline.execute()
+        return [json_event] + pending
+
+    def handle_batch(self, json_events):
+        """
+        Write the batch of entries into the log files
+        """
+        for handler in self.handlers:
+            handler.begin_batch()
+        for json_event in json_events:
+            self.handle_msg(json_event)
+        for handler in self.handlers:
+            handler.end_batch()
+
     def run(self):
         self.setup_logging()
         setproctitle("RedisLogHandler")
 
         rc = get_redis_connection(self.opts)
         while True:
-            # indefinitely wait for the next entry, note that blpop returns
-            # tuple (FIFO_NAME, ELEMENT)
-            (_, json_event) = rc.blpop([constants.LOG_REDIS_FIFO])
-            self.handle_msg(json_event)
+            self.handle_batch(self.get_batch(rc))
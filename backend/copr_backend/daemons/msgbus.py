@@ -0,0 +1,141 @@
+"""
+Long-running message bus publisher.  With the 'msgbus_outbox' option, build
+workers don't connect to the message buses (one connection per worker, and
+synchronous re-tries when the broker is slow), but only append the messages to
+per-bus Redis outboxes (see MsgBusOutbox).  This daemon keeps one persistent
+connection per bus, and publishes the queued messages in order.
+"""
+
+import math
+import time
+
+from setproctitle import setproctitle
+
+from copr_common.redis_helpers import get_redis_connection
+
+from copr_backend.constants import MSGBUS_REDIS_OUTBOX, MSGBUS_REDIS_WAKEUP
+from copr_backend.helpers import get_redis_logger
+from copr_backend.msgbus import (
+    configured_buses,
+    create_bus,
+    message_from_outbox,
+)
+
+
+class MessageBusDaemon:
+    """
+    Publish the messages from the MSGBUS_REDIS_OUTBOX queues.  Each bus has
+    its own queue, and the messages are removed from the queue only after they
+    are published, so the order of messages (e.g. build.start before build.end
+    for the same build) is preserved even if the broker is temporarily
+    unavailable.  Only one daemon may run at a time.
+    """
+
+    # Maximum number of messages taken from one outbox at once.
+    batch_size = 100
+    # How long we wait for a new message in one loop.
+    wait_timeout = 10
+    # Seconds to wait after the first failure, doubled after each next one.
+    retry_delay = 1
+    max_retry_delay = 300
+
+    def __init__(self, opts, log=None, buses=None):
+        self.opts = opts
+        self.log = log or get_redis_logger(opts, "msgbus_daemon", "msgbus")
+        self.redis = get_redis_connection(opts)
+        self.buses = buses
+        # bus name => number of consecutive failures
+        self.failures = {}
+        # bus name => time of the next publishing attempt
+        self.next_attempt = {}
+
+    def connect(self):
+        """
+        Connect to all the configured buses
+        """
+        self.buses = {}
+        for name, bus_class, bus_config in configured_buses(self.opts):
+            self.log.info("Connecting to %s bus %s", bus_class.bus_type, name)
+            self.buses[name] = create_bus(bus_class, bus_config, self.log)
+
+    def publish(self, name, bus):
+        """
+        Publish the first (at most batch_size) messages from the outbox of
+        the given bus, and drop them from the outbox.  Return the number of
+        messages processed.  Upon a publishing failure, stop and schedule the
+        next attempt (the failed message stays at the head of the outbox).
+        """
+        outbox = MSGBUS_REDIS_OUTBOX.format(name)
+        raw_messages = self.redis.lrange(outbox, 0, self.batch_size - 1)
+
+        processed = 0
+        for raw in raw_messages:
+            try:
+                message = message_from_outbox(raw)
+            except (ValueError, KeyError, TypeError):
+                self.log.exception("Dropping invalid message %s", raw)
+                processed += 1
+                continue
+
+            try:
+                bus.publish(message)
+            except Exception:  # pylint: disable=broad-except
+                self.failures[name] = self.failures.get(name, 0) + 1
+                delay = min(self.retry_delay * 2 ** (self.failures[name] - 1),
+                            self.max_retry_delay)
+                self.next_attempt[name] = time.time() + delay
+                self.log.exception("Failed to publish to %s, re-trying in %ss",
+                                   name, delay)
+                break
+
+            self.failures.pop(name, None)
+            processed += 1
+
+        if processed:
+            # Workers only append to the tail, so we can safely drop the head.
+            self.redis.ltrim(outbox, processed, -1)
+        return processed
+
+    def publish_all(self):
+        """
+        Publish one batch of messages for each bus (unless we wait for a
+        re-try).  Return True if there are likely more messages to publish.
+        """
+        pending = False
+        now = time.time()
+        for name, bus in self.buses.items():
+            if self.next_attempt.get(name, 0) > now:
+                continue
+            self.next_attempt.pop(name, None)
+            if self.publish(name, bus) == self.batch_size:
+                pending = True
+        return pending
+
+    def wait(self):
+        """
+        Wait till some worker queues a new message, or till the next
+        re-try is due.
+        """
+        timeout = self.wait_timeout
+        if self.next_attempt:
+            timeout = min(timeout, min(self.next_attempt.values()) - time.time())
+        timeout = max(1, math.ceil(timeout))
+        self.redis.blpop([MSGBUS_REDIS_WAKEUP], timeout=timeout)
+        # One wake-up is enough for all the messages queued so far.
+        self.redis.delete(MSGBUS_REDIS_WAKEUP)
+
+    def run(self):
+        """
+        Publish the messages, indefinitely.  Exit immediately (without
+        connecting to the buses) if the 'msgbus_outbox' option is disabled.
+        """
+        setproctitle("MessageBusDaemon")
+        if not self.opts.msgbus_outbox:
+            # The workers publish the messages directly, nothing to do.
+            self.log.info("The msgbus_outbox option is disabled, exiting")
+            return
+        if self.buses is None:
+            self.connect()
+        while True:
+            if not self.publish_all():
+                self.wait()
@@ -1,12 +1,14 @@
 import json
 import logging
 import logging.handlers
+import multiprocessing.util
 import optparse
 import os
 import sys
 import errno
 import time
 import types
+import uuid
 import glob
 import shlex
 import shutil
@@ -36,9 +38,13 @@ from . import constants
 
 DOMAIN = "fedorahosted.org"
 
+# How many log records RedisPublishHandler sends to Redis at once
+LOG_BATCH_SIZE = 100
+
 LOG_COMPONENTS = [
     "build_dispatcher", "action_dispatcher",
     "backend", "actions", "worker", "modifyrepo", "pruner", "analyze-results",
+    "msgbus",
 ]
 
 
@@ -302,6 +308,18 @@ class BackendConfigReader(object):
         opts.do_sign = _get_conf(
             cp, "backend", "do_sign", False, mode="bool")
 
+        opts.createrepo_daemon = _get_conf(
+            cp, "backend", "createrepo_daemon", False, mode="bool")
+
+        opts.createrepo_daemon_workers = _get_conf(
+            cp, "backend", "createrepo_daemon_workers", 4, mode="int")
+
+        opts.msgbus_outbox = _get_conf(
+            cp, "backend", "msgbus_outbox", False, mode="bool")
+
+        opts.sign_max_workers = _get_conf(
+            cp, "backend", "sign_max_workers", 4, mode="int")
+
         opts.keygen_host = _get_conf(
             cp, "backend", "keygen_host", "copr-keygen.cloud.fedoraproject.org")
 
@@ -500,15 +518,53 @@ def format_tb(ex, ex_traceback):
 
 class RedisPublishHandler(logging.Handler):
     """
+    Send the log records to Redis, to be written by RedisLogHandler.  The
+    records are buffered, and sent in one RPUSH once there's ``batch_size``
+    of them, once they are ``flush_interval`` seconds old, when an
+    ``flush_level`` (or more severe) record arrives, or at process exit
+    (logging.shutdown() flushes all the handlers).
+
     :type rc: StrictRedis
     """
-    def __init__(self, rc, who, level=logging.NOTSET,):
+    def __init__(self, rc, who, level=logging.NOTSET, batch_size=1,
+                 flush_interval=1.0, flush_level=logging.ERROR):
         super(RedisPublishHandler, self).__init__(level)
 
         self.rc = rc
         self.who = who
-
-    def emit(self, record):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.buffer = []
+        self.pid = None
+        self.flusher = None
+
+    def _check_fork(self):
+        # The buffered records belong to the parent process, and the flusher
+        # thread doesn't exist after fork().
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.buffer = []
+            self.flusher = None
+            # multiprocessing children end with os._exit(), so we can not rely
+            # on logging.shutdown() there
+            multiprocessing.util.Finalize(self, self.flush, exitpriority=10)
+
+    def _start_flusher(self):
+        if self.batch_size <= 1 or self.flusher:
+            return
+        self.flusher = Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def format_record(self, record):
+        """
+        Convert the record into the JSON string for RedisLogHandler
+        """
         # copr specific semantics
 
         # Alternative to copy.deepcopy().  If we edit the original record
@@ -535,13 +591,33 @@ class RedisPublishHandler(logging.Handler):
         record.exc_text = None
         record.args = ()
 
+        return json.dumps(record.__dict__)
+
+    def emit(self, record):
+        self._check_fork()
+        self._start_flusher()
+        self.buffer.append(self.format_record(record))
+        if len(self.buffer) >= self.batch_size \
+                or record.levelno >= self.flush_level:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
         try:
-            self.rc.rpush(constants.LOG_REDIS_FIFO, json.dumps(record.__dict__))
-        # pylint: disable=W0703
-        except Exception as error:
-            _, _, ex_tb = sys.exc_info()
-            sys.stderr.write("Failed to publish log record to redis, {}"
-                             .format(format_tb(error, ex_tb)))
+            self._check_fork()
+            if not self.buffer:
+                return
+            records, self.buffer = self.buffer, []
+            try:
+                self.rc.rpush(constants.LOG_REDIS_FIFO, *records)
+            # pylint: disable=W0703
+            except Exception as error:
+                _, _, ex_tb = sys.exc_info()
+                sys.stderr.write("Failed to publish {} log record(s) to "
+                                 "redis, {}".format(len(records),
+                                                    format_tb(error, ex_tb)))
+        finally:
+            self.release()
 
 def get_redis_log_handler(opts, component):
     """
@@ -555,7 +631,8 @@ def get_redis_log_handler(opts, component):
     assert component in LOG_COMPONENTS
     rc = get_redis_connection(opts)
     # level=DEBUG, by default we send everything logger gives us
-    handler = RedisPublishHandler(rc, component, level=logging.DEBUG)
+    handler = RedisPublishHandler(rc, component, level=logging.DEBUG,
+                                  batch_size=LOG_BATCH_SIZE)
     return handler
 
 
@@ -670,11 +747,72 @@ def format_filename(name, version, release, epoch, arch, zero_epoch=False):
     return "{}-{}-{}.{}".format(name, version, release, arch)
 
 
+def _request_createrepo_daemon(backend_opts, request, timeout, logger):
+    """
+    Hand over the createrepo request to the createrepo daemon, and wait for
+    the result.  Return True/False (success/failure), or None if the daemon
+    isn't running (so the caller should do the createrepo on its own).
+    """
+    redis = get_redis_connection(backend_opts)
+    if not redis.exists(constants.CREATEREPO_REDIS_ALIVE):
+        if logger:
+            logger.warning("Createrepo daemon is not running")
+        return None
+
+    request["id"] = uuid.uuid4().hex
+    result_key = constants.CREATEREPO_REDIS_RESULT.format(request["id"])
+    # the daemon pops from the right end, see CreaterepoDaemon
+    redis.lpush(constants.CREATEREPO_REDIS_FIFO, json.dumps(request))
+
+    start = time.time()
+    while True:
+        wait = 10
+        if timeout is not None:
+            wait = max(1, min(wait, int(timeout - (time.time() - start))))
+
+        response = redis.blpop([result_key], timeout=wait)
+        if response:
+            return response[1] == "success"
+
+        if timeout is not None and time.time() - start >= timeout:
+            if logger:
+                logger.error("Createrepo request %s timeouted", request["id"])
+            return False
+
+        if not redis.exists(constants.CREATEREPO_REDIS_ALIVE):
+            # The request may be processed after the daemon restart, too.
+            # But createrepo is idempotent, so it doesn't hurt.
+            if logger:
+                logger.warning("Createrepo daemon disappeared")
+            return None
+
+
 def call_copr_repo(directory, rpms_to_remove=None, devel=False, add=None, delete=None, timeout=None,
-                   logger=None, appstream=True, do_stat=False):
+                   logger=None, appstream=True, do_stat=False, backend_opts=None):
     """
     Execute 'copr-repo' tool, and return True if the command succeeded.
+
+    When the ``createrepo_daemon`` option is enabled in ``backend_opts``, the
+    request is processed by the (running) createrepo daemon instead, so the
+    createrepo_c runs are batched for the given directory.
     """
+    if backend_opts and backend_opts.get("createrepo_daemon"):
+        request = {
+            "directory": directory,
+            "add": [subdir for subdir in add or [] if subdir is not None],
+            "delete": [subdir for subdir in delete or [] if subdir is not None],
+            "rpms_to_remove": rpms_to_remove or [],
+            "devel": devel,
+            "appstream": appstream,
+            "do_stat": do_stat,
+        }
+        result = _request_createrepo_daemon(backend_opts, request, timeout,
+                                            logger)
+        if result is not None:
+            if not result and logger:
+                logger.error("Createrepo failed")
+            return result
+
     cmd = ["copr-repo", "--batched", directory]
     def opt_multiply(option, subdirs):
         args = []
@@ -2,6 +2,7 @@
 Shared logic for hitcounter scripts
 """
 
+import json
 import os
 import re
 from datetime import datetime
@@ -70,7 +71,13 @@ def update_frontend(accesses, log, dry_run=False, try_indefinitely=False):
     if not result:
         log.debug("No recognizable hits among these accesses, skipping.")
         return
+    send_hit_data(result, log, dry_run, try_indefinitely)
 
+
+def send_hit_data(result, log, dry_run=False, try_indefinitely=False):
+    """
+    Send the hit data, as returned by `get_hit_data`, to frontend
+    """
     log.debug(
         "Sending: %i results from %i to %i",
         len(result["hits"]),
@@ -168,3 +175,115 @@ def get_hit_data(accesses, log):
         "ts_to": max(timestamps),
         "hits": hits,
     } if hits else {}
+
+
+def merge_hit_data(result, other):
+    """
+    Merge two `get_hit_data` outputs into one, return the merged dict
+    """
+    if not result:
+        return other
+    if not other:
+        return result
+    hits = dict(result["hits"])
+    for key_str, count in other["hits"].items():
+        hits[key_str] = hits.get(key_str, 0) + count
+    return {
+        "ts_from": min(result["ts_from"], other["ts_from"]),
+        "ts_to": max(result["ts_to"], other["ts_to"]),
+        "hits": hits,
+    }
+
+
+class AccessLogFollower:
+    """
+    Read the access log incrementally, like `tail -F` does.  The position in
+    the file is remembered in the `state_file` so we don't count the same
+    accesses twice after restart.  Log rotation (the file is replaced with a
+    new one, or truncated) is detected.
+    """
+
+    def __init__(self, path, state_file, log):
+        self.path = path
+        self.state_file = state_file
+        self.log = log
+        self.fd = None
+        self.inode = None
+        self.offset = 0
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as fd:
+                state = json.load(fd)
+            return state["inode"], state["offset"]
+        except FileNotFoundError:
+            return None, 0
+        except (ValueError, KeyError):
+            self.log.warning("Invalid state file %s, starting from the "
+                             "beginning of %s", self.state_file, self.path)
+            return None, 0
+
+    def save_state(self):
+        """
+        Remember the position of already processed lines.  Call this only
+        after the lines were successfully processed.
+        """
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fd:
+            json.dump({"inode": self.inode, "offset": self.offset}, fd)
+        os.replace(tmp, self.state_file)
+
+    def _open(self, resume=True):
+        try:
+            # pylint: disable=consider-using-with
+            self.fd = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+
+        inode, offset = self._load_state() if resume else (None, 0)
+        stat = os.fstat(self.fd.fileno())
+        if stat.st_ino != inode or stat.st_size < offset:
+            offset = 0
+        self.inode = stat.st_ino
+        self.offset = offset
+        return True
+
+    def _read_lines(self):
+        self.fd.seek(self.offset)
+        for line in self.fd:
+            if not line.endswith(b"\n"):
+                # The line is not completely written yet, we'll read it again
+                # next time.
+                break
+            self.offset += len(line)
+            yield line.decode("utf-8", errors="replace")
+
+    def _rotated(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if stat.st_ino != self.inode:
+            return True
+        # truncated (copytruncate)
+        return stat.st_size < self.offset
+
+    def new_lines(self):
+        """
+        Yield the complete lines appended to the file since the last call.
+        """
+        if self.fd is None and not self._open():
+            return
+
+        yield from self._read_lines()
+
+        if not self._rotated():
+            return
+
+        self.log.info("File %s rotated, reopening", self.path)
+        # Finish reading the old file, there might be something new.
+        yield from self._read_lines()
+        self.fd.close()
+        self.fd = None
+        if self._open(resume=False):
+            yield from self._read_lines()
@@ -13,7 +13,9 @@ except ImportError:
     # copr_messaging is optional
     schema = None
 
-from .constants import BuildStatus
+from copr_common.redis_helpers import get_redis_connection
+
+from .constants import BuildStatus, MSGBUS_REDIS_OUTBOX, MSGBUS_REDIS_WAKEUP
 
 try:
     import fedmsg
@@ -134,6 +136,29 @@ def message_from_worker_job(style, topic, job, who, ip, pid):
     raise NotImplementedError
 
 
+def message_to_outbox(message):
+    """
+    Serialize the (validated) message object so it can be stored in the
+    MsgBusOutbox queue.
+    """
+    return json.dumps({
+        "class": type(message).__name__,
+        "body": message.body,
+    })
+
+
+def message_from_outbox(raw):
+    """
+    Re-create the message object serialized by message_to_outbox().  Raise
+    ValueError for unparseable data.
+    """
+    data = json.loads(raw)
+    message_class = getattr(schema, data["class"], None)
+    if message_class is None:
+        raise ValueError("Unknown message class {}".format(data["class"]))
+    return message_class(body=data["body"])
+
+
 class MsgBus(object):
     """
     An "abstract" message bus class, don't instantiate!
@@ -184,6 +209,13 @@ class MsgBus(object):
                 # We don't want to halt the worker because of messaging.
                 self.log.exception("Attempt %s to publish a message failed", attempt)
 
+    def publish(self, message):
+        """
+        Send the already validated message, just one attempt.  Raise an
+        exception upon failure (re-tries are up to the caller).
+        """
+        self._send_message(message)
+
     def announce_job(self, msg_type, job, who, ip, pid):
         """
         Compat thing to be removed;  future types of messages (v2+) should be
@@ -337,23 +369,95 @@ class MsgBusFedoraMessaging(MsgBus):
         fm_api.publish(message)
 
 
+class MsgBusOutbox(MsgBus):
+    """
+    Don't talk to the message bus at all, just append the messages to the
+    Redis outbox of the bus.  The outbox is processed by the MessageBusDaemon,
+    see copr_backend.daemons.msgbus.
+    """
+
+    bus_type = "outbox"
+
+    def __init__(self, bus_class, opts, name, redis, log=None):
+        # messages are generated in the style the target bus expects
+        self.style = bus_class.style
+        self.target_type = bus_class.bus_type
+        self.outbox = MSGBUS_REDIS_OUTBOX.format(name)
+        self.redis = redis
+        opts.bus_id = getattr(opts, 'bus_id', bus_class.__name__)
+        super().__init__(opts, log)
+
+    def _send_message(self, message):
+        pipeline = self.redis.pipeline()
+        pipeline.rpush(self.outbox, message_to_outbox(message))
+        pipeline.rpush(MSGBUS_REDIS_WAKEUP, "1")
+        pipeline.execute()
+
+    @property
+    def info(self):
+        return "{} bus (outbox)".format(self.target_type)
+
+
+def configured_buses(backend_opts):
+    """
+    Return the list of (name, bus_class, bus_config) triples for all the
+    configured message buses.  The name is unique, and it identifies the bus
+    outbox.
+    """
+    bus_classes = {
+        "stomp": MsgBusStomp,
+        "fedora-messaging": MsgBusFedoraMessaging,
+    }
+
+    buses = []
+    for bus_config in backend_opts.msg_buses:
+        bus_class = bus_classes.get(bus_config.bus_type)
+        if not bus_class:
+            continue
+        name = getattr(bus_config, "bus_id", None)
+        if not name:
+            name = os.path.basename(bus_config.__file__)
+        buses.append((name, bus_class, bus_config))
+
+    if backend_opts.fedmsg_enabled:
+        buses.append(("fedmsg", MsgBusFedmsg, None))
+
+    return buses
+
+
+def create_bus(bus_class, bus_config, log):
+    """
+    Instantiate the bus_class, this connects to the bus
+    """
+    if bus_class is MsgBusFedmsg:
+        return MsgBusFedmsg(log)
+    return bus_class(bus_config, log)
+
+
 class MessageSender:
     """
-    Automatically send messages to all configured buses.
+    Automatically send messages to all configured buses.  With the
+    'msgbus_outbox' option, the messages are only queued in Redis and the
+    copr-backend-msgbus service publishes them.
     """
     def __init__(self, backend_opts, name, log):
         self.log = log
         self.name = name
 
+        redis = None
+        if backend_opts.get("msgbus_outbox"):
+            redis = get_redis_connection(backend_opts)
+
         msg_buses = []
-        for bus_config in backend_opts.msg_buses:
-            if bus_config.bus_type == 'stomp':
-                msg_buses.append(MsgBusStomp(bus_config, log))
-            elif bus_config.bus_type == 'fedora-messaging':
-                msg_buses.append(MsgBusFedoraMessaging(bus_config, log))
-
-        if backend_opts.fedmsg_enabled:
-            msg_buses.append(MsgBusFedmsg(log))
+        for bus_name, bus_class, bus_config in configured_buses(backend_opts):
+            if redis:
+                if bus_config is None:
+                    # Hack to not require opts argument for now.
+                    bus_config = type('', (), {})
+                msg_buses.append(MsgBusOutbox(bus_class, bus_config, bus_name,
+                                              redis, log))
+            else:
+                msg_buses.append(create_bus(bus_class, bus_config, log))
 
         self.msg_buses = msg_buses
         self.pid = os.getpid()
@@ -2,17 +2,25 @@
 Pulp doesn't provide an API client, we are implementing it for ourselves
 """
 
-import io
 import json
 import logging
+import mmap
 import os
 import shutil
 import time
 import tomllib
 import hashlib
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
 from itertools import batched
 from urllib.parse import urlencode
 
+import requests
+from requests.adapters import HTTPAdapter
+
 from copr_common.request import SafeRequest
 from copr_common.lock import Lock
 from copr_common.redis_helpers import get_redis_connection
@@ -248,6 +256,250 @@ class BatchedAddRemoveContent:
             self.commit()
 
 
+@contextmanager
+def mmap_file(path):
+    """
+    Map the whole file into memory (read-only) and yield a memoryview of it.
+    The file content isn't read until it is accessed, and the kernel can drop
+    the pages from the memory any time.
+    """
+    with open(path, "rb") as fp:
+        if not os.fstat(fp.fileno()).st_size:
+            # Empty files can not be mapped
+            yield memoryview(b"")
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()
+
+
+class MultipartFileBody:
+    """
+    A multipart/form-data request body with one file (or its part given by
+    a memoryview), and optional string fields.  This is a file-like object
+    that is read by `requests` in small blocks, so (unlike with the `files=`
+    argument) we never copy the whole file content into a single buffer.
+    """
+
+    def __init__(self, view, filename, fields=None):
+        self.boundary = uuid.uuid4().hex
+        prefix = ""
+        for name, value in (fields or {}).items():
+            prefix += (
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            )
+        prefix += (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        )
+        self.parts = [
+            memoryview(prefix.encode("utf-8")),
+            view,
+            memoryview(f"\r\n--{self.boundary}--\r\n".encode("utf-8")),
+        ]
+        self.size = sum(len(part) for part in self.parts)
+        self.position = 0
+
+    @property
+    def content_type(self):
+        """
+        The Content-Type header value for this body
+        """
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self.size
+
+    def tell(self):
+        """ file-like API """
+        return self.position
+
+    def seek(self, position):
+        """ file-like API, only absolute positions """
+        self.position = position
+
+    def read(self, size=-1):
+        """
+        Return at most SIZE bytes from the current position, as bytes
+        """
+        if size is None or size < 0:
+            size = self.size
+
+        chunks = []
+        offset = 0
+        for part in self.parts:
+            if size <= 0:
+                break
+            start = self.position - offset
+            offset += len(part)
+            if start >= len(part):
+                continue
+            chunk = part[start:start + size].tobytes()
+            chunks.append(chunk)
+            size -= len(chunk)
+            self.position += len(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        """
+        Release the file content (so the underlying mmap can be closed)
+        """
+        for part in self.parts:
+            part.release()
+
+
+class PulpTaskTracker:
+    """
+    Wait for Pulp tasks to finish.  All the tracked tasks are polled by one
+    background thread, in bulk (one filtered list query per round, for all
+    the tasks that are due), and each task has its own polling backoff.  So
+    one slow task doesn't delay noticing that others already finished.  The
+    tracker is thread-safe, one instance is shared by all PulpClient users.
+    The thread only runs while there are some tasks to track.
+    """
+
+    # The first check is done after `poll_interval` seconds, then the interval
+    # doubles up to `max_poll_interval`.
+    poll_interval = 1
+    max_poll_interval = 30
+
+    # How many tasks we query at once (the hrefs are in the URL)
+    batch_size = 50
+
+    finished_states = ("completed", "failed", "canceled", "skipped")
+
+    def __init__(self, client):
+        self.client = client
+        self.log = client.log
+        # task href => [future, next_check, interval, number of waiters]
+        self._tasks = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def track(self, task):
+        """
+        Start tracking the TASK (href), and return a Future which is resolved
+        with the task data once the task finishes (successfully or not).
+        """
+        with self._condition:
+            if task in self._tasks:
+                self._tasks[task][3] += 1
+                return self._tasks[task][0]
+
+            future = Future()
+            self._tasks[task] = [
+                future,
+                time.monotonic() + self.poll_interval,
+                self.poll_interval,
+                1,
+            ]
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, daemon=True,
+                                                name="PulpTaskTracker")
+                self._thread.start()
+            self._condition.notify()
+            return future
+
+    def untrack(self, futures):
+        """
+        The caller doesn't wait for the FUTURES (returned by track()) anymore,
+        e.g. after a timeout.  Once nobody waits for a task, it isn't polled
+        anymore, and its future is cancelled.
+        """
+        futures = set(futures)
+        with self._condition:
+            for task, entry in list(self._tasks.items()):
+                if entry[0] not in futures:
+                    continue
+                entry[3] -= 1
+                if entry[3] <= 0:
+                    entry[0].cancel()
+                    del self._tasks[task]
+            self._condition.notify()
+
+    def stop(self):
+        """
+        Stop tracking all the tasks (their futures are cancelled), and wait
+        for the background thread to exit.
+        """
+        with self._condition:
+            for future, _, _, _ in self._tasks.values():
+                future.cancel()
+            self._tasks = {}
+            thread = self._thread
+            self._condition.notify()
+        if thread and thread is not threading.current_thread():
+            thread.join()
+
+    def _due_tasks(self):
+        """
+        Wait till some tasks need to be checked, and return them.  Return
+        None if there's nothing to track (the thread should exit).
+        """
+        with self._condition:
+            while True:
+                if not self._tasks:
+                    # track() starts a new thread once needed
+                    self._thread = None
+                    return None
+                now = time.monotonic()
+                timeout = min(next_check for _, next_check, _, _
+                              in self._tasks.values()) - now
+                if timeout <= 0:
+                    # Check the tasks that are almost due too, so the tasks
+                    # submitted around the same time are checked together.
+                    return [task for task, (_, next_check, interval, _)
+                            in self._tasks.items()
+                            if next_check - interval / 2 <= now]
+                self._condition.wait(timeout)
+
+    def _query(self, tasks):
+        uri = "api/v3/tasks/?" + urlencode({
+            "pulp_href__in": ",".join(tasks),
+            "fields": "pulp_href,state,created_resources,error",
+            "limit": len(tasks),
+        })
+        self.log.debug("Pulp: checking %s tasks", len(tasks))
+        response = self.client.send("GET", uri)
+        return {data["pulp_href"]: data for data in response.json()["results"]}
+
+    def _run(self):
+        while True:
+            due_tasks = self._due_tasks()
+            if due_tasks is None:
+                return
+            for tasks in batched(due_tasks, self.batch_size):
+                try:
+                    states = self._query(tasks)
+                except Exception:  # pylint: disable=broad-except
+                    self.log.exception("Unable to query Pulp tasks")
+                    states = {}
+
+                finished = []
+                with self._condition:
+                    now = time.monotonic()
+                    for task in tasks:
+                        if task not in self._tasks:
+                            # stop() or untrack() called meanwhile
+                            continue
+                        data = states.get(task)
+                        if data and data["state"] in self.finished_states:
+                            finished.append((self._tasks.pop(task)[0], data))
+                            continue
+                        entry = self._tasks[task]
+                        entry[2] = min(entry[2] * 2, self.max_poll_interval)
+                        entry[1] = now + entry[2]
+
+                for future, data in finished:
+                    future.set_result(data)
+
+
 class PulpRequest:
     """
     A deferred Pulp API request that can be submitted and waited on.
@@ -289,12 +541,41 @@ class PulpClient:
             config = tomllib.load(fp)
         return cls(config["cli"], log, opts)
 
+    # Large files are uploaded in chunks of this size
+    chunk_size = 1024 * 1024 * 100
+
+    # How many chunks of one file are uploaded concurrently
+    chunk_upload_workers = 4
+
+    # How many get_content() batches are queried concurrently
+    get_content_workers = 4
+
+    # Failed tasks are re-submitted after this many seconds, the delay
+    # doubles with each failure up to `max_retry_backoff`
+    retry_backoff = 5
+    max_retry_backoff = 300
+
     def __init__(self, config, log=None, opts=None):
         self.config = config
         self.timeout = 60
         self.log = log or logging.getLogger(__name__)
         self.opts = opts
 
+        # Re-use the connections to Pulp, even from multiple threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max(10, 2 * self.chunk_upload_workers))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.tasks = PulpTaskTracker(self)
+
+    def close(self):
+        """
+        Stop tracking the Pulp tasks, and close the connections
+        """
+        self.tasks.stop()
+        self.session.close()
+
     @property
     def auth(self):
         """
@@ -340,6 +621,7 @@ class PulpClient:
             try_indefinitely=True,
             timeout=timeout or self.timeout,
             user_agent="crc-pulp-client",
+            session=self.session,
         )
         if all(self.cert):
             request.cert = self.cert
@@ -473,17 +755,23 @@ class PulpClient:
         https://docs.pulpproject.org/pulp_rpm/restapi.html#tag/Content:-Packages/operation/content_rpm_packages_create
         """
         uri = "/api/v3/content/rpm/packages/upload/"
-        with open(path, "rb") as fp:
-            data = {"pulp_labels": json.dumps(labels)}
-            files = {"file": fp}
-            self.log.info("Pulp: create_content: %s %s", uri, path)
-            package = self.send("POST", uri, data=data, files=files, timeout=timeout)
+        with mmap_file(path) as view:
+            body = MultipartFileBody(view, os.path.basename(path), {
+                "pulp_labels": json.dumps(labels),
+            })
+            try:
+                self.log.info("Pulp: create_content: %s %s", uri, path)
+                package = self.send("POST", uri, data=body, timeout=timeout,
+                                    headers={"Content-Type": body.content_type})
+            finally:
+                body.close()
         return package
 
     def create_content_chunked(self, path, labels):
         """
         Split a file into chunks, upload them and reassemble them on the Pulp
-        side.
+        side.  The chunks are uploaded concurrently, and the file checksum is
+        calculated meanwhile.
         https://pulpproject.org/pulpcore/docs/user/guides/upload-publish/?h=chunked#chunked-uploads
         https://docs.pulpproject.org/pulp_rpm/restapi.html#tag/Content:-Packages/operation/content_rpm_packages_create
         """
@@ -497,42 +785,7 @@ class PulpClient:
         upload_href = response.json()["pulp_href"]
         upload_url = self.config["base_url"] + upload_href
 
-        with open(path, "rb") as fp:
-            sha256 = hashlib.file_digest(fp, "sha256")
-
-        # Upload the chunks
-        size = 1024 * 1024 * 100
-        for i, chunk in enumerate(self._read_chunks(path, size=size)):
-            # Figure out the start and end byte of the chunk within the whole
-            # file
-            start = i * size
-            end = start + len(chunk) - 1
-            headers = {
-                "Content-Range": "bytes {0}-{1}/*".format(start, end),
-            }
-            files = {
-                "file": (
-                    # Filename
-                    "chunk{0}".format(i),
-
-                    # Content from bytes that we already have in the memory
-                    io.BytesIO(chunk),
-
-                    # A generic MIME type for binary files
-                    "application/octet-stream",
-                ),
-            }
-            response = self.send(
-                "PUT",
-                upload_url,
-                files=files,
-                headers=headers,
-            )
-            if not response.ok:
-                raise RuntimeError(
-                    "Failed to upload chunk {0} of {1}: {2}"
-                    .format(i, path, response.reason)
-                )
+        sha256 = self._upload_chunks(path, upload_url)
 
         # Send the file request that we want to reassemble the file
         commit_url = self.config["base_url"] + upload_href + "commit/"
@@ -561,13 +814,68 @@ class PulpClient:
         self.log.info("Successfully created a content for chunked uploaded %s", path)
         return response
 
-    def _read_chunks(self, path, size=10000):
+    def _upload_chunk(self, upload_url, view, start, index):
         """
-        Generate chunks of a given file
+        Upload one chunk of a file, VIEW is the chunk content starting at the
+        START byte of the file
         """
-        with open(path, "rb") as fp:
-            while content := fp.read(size):
-                yield content
+        end = start + len(view) - 1
+        body = MultipartFileBody(view, "chunk{0}".format(index))
+        headers = {
+            "Content-Range": "bytes {0}-{1}/*".format(start, end),
+            "Content-Type": body.content_type,
+        }
+        try:
+            response = self.send("PUT", upload_url, data=body, headers=headers)
+        finally:
+            body.close()
+        if not response.ok:
+            raise RuntimeError(
+                "Failed to upload chunk {0}: {1}".format(index, response.reason))
+
+    def _upload_chunks(self, path, upload_url):
+        """
+        Upload the file in chunks, at most `chunk_upload_workers` at the same
+        time, and return its sha256 hash object.  The file is mmap'ed, so only
+        the chunks currently being uploaded (or hashed) occupy the memory.
+        """
+        sha256 = hashlib.sha256()
+        with mmap_file(path) as view, \
+                ThreadPoolExecutor(max_workers=self.chunk_upload_workers) as executor:
+            in_progress = {}
+
+            def _finish(futures):
+                for future in futures:
+                    start = in_progress.pop(future)
+                    # re-raise the upload failure, if any
+                    future.result()
+                    # The chunk is both uploaded and hashed, drop its pages
+                    # from our memory (madvise needs page-aligned start)
+                    if isinstance(view.obj, mmap.mmap) \
+                            and start % mmap.PAGESIZE == 0:
+                        view.obj.madvise(mmap.MADV_DONTNEED, start,
+                                         min(self.chunk_size, len(view) - start))
+
+            try:
+                for index, start in enumerate(range(0, len(view), self.chunk_size)):
+                    if len(in_progress) >= self.chunk_upload_workers:
+                        done, _ = wait(in_progress, return_when=FIRST_COMPLETED)
+                        _finish(done)
+
+                    end = start + self.chunk_size
+                    future = executor.submit(self._upload_chunk, upload_url,
+                                             view[start:end], start, index)
+                    in_progress[future] = start
+                    # Calculate the checksum while the chunk is being uploaded
+                    sha256.update(view[start:end])
+
+                _finish(list(in_progress))
+            except Exception:
+                for future in in_progress:
+                    future.cancel()
+                wait(in_progress)
+                raise
+        return sha256
 
     def modify_repository_content(self, repository, add_content_units, remove_content_units):
         """
@@ -625,19 +933,50 @@ class PulpClient:
         """
         Get a list of PRNs for RPMs with provided build ids
         https://pulpproject.org/pulp_rpm/restapi/#tag/Content:-Packages/operation/content_rpm_packages_list
+
+        This accumulates all the results into one response, prefer
+        iter_content() for large sets of builds.
+        """
+        all_results = []
+        response = None
+        for results, response in self._get_content_batches(build_ids, chroot,
+                                                           fields):
+            all_results.extend(results)
+        return PaginatedResponse(all_results, response)
+
+    def iter_content(self, build_ids, chroot=None, fields=None):
+        """
+        Same as get_content(), but generate the RPMs (dicts) one by one, as
+        they come from Pulp
+        """
+        if not build_ids:
+            raise ValueError("Content must be queried for specific builds")
+        return (rpm for results, _ in self._get_content_batches(
+                    build_ids, chroot, fields)
+                for rpm in results)
+
+    def _get_content_batches(self, build_ids, chroot=None, fields=None):
+        """
+        Query the content for batches of build ids concurrently, and generate
+        the (results, response) pairs for each batch (in the original order)
         """
         if not build_ids:
             raise ValueError("Content must be queried for specific builds")
 
-        all_results = []
         # We need to chunk the `build_ids` into lists of only 7 items otherwise
         # we are going to hit validation error from Pulp
         # See https://github.com/fedora-copr/copr/issues/4187
         # See https://github.com/pulp/pulpcore/issues/7435
-        for batch in batched(build_ids, 7):
-            results, response = self._get_content(batch, chroot, fields)
-            all_results.extend(results)
-        return PaginatedResponse(all_results, response)
+        with ThreadPoolExecutor(max_workers=self.get_content_workers) as executor:
+            # Don't query too much ahead of the consumer
+            in_flight = deque()
+            for batch in batched(build_ids, 7):
+                in_flight.append(executor.submit(
+                    self._get_content, batch, chroot, fields))
+                if len(in_flight) >= 2 * self.get_content_workers:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
 
     def _get_content(self, build_ids, chroot=None, fields=None):
         query = ""
@@ -706,6 +1045,7 @@ class PulpClient:
         finish.  Retry failed requests/tasks until timeout.  Raise
         RuntimeError if any request cannot be completed within the timeout.
         """
+        # pylint: disable=redefined-outer-name
         if not requests:
             return []
 
@@ -713,49 +1053,68 @@ class PulpClient:
         results = [None] * len(requests)
 
         # Initialize the todo-list.
-        # (index, request, task_href_or_None, backoff_sleep)
-        pending = [(i, req, None, 5) for i, req in enumerate(requests)]
-
-        while pending:
-            if time.monotonic() > deadline:
-                descriptions = ", ".join(
-                    req.description for _, req, _, _ in pending)
-                raise RuntimeError(
-                    f"Pulp tasks timed out after {timeout}s: {descriptions}")
-
-            still_pending = []
-            for i, req, task, backoff_sleep in pending:
-                if task is None:
-                    self.log.info("Pulp: submitting %s", req.description)
-                    response = self.send(req.method, req.url, req.data)
-                    if response.status_code != 202:
-                        results[i] = response.json()
+        # index => (request, task_future_or_None, submit_at, backoff_sleep)
+        pending = {i: (req, None, 0, self.retry_backoff)
+                   for i, req in enumerate(requests)}
+
+        try:
+            while pending:
+                now = time.monotonic()
+                if now > deadline:
+                    descriptions = ", ".join(
+                        req.description for req, _, _, _ in pending.values())
+                    raise RuntimeError(
+                        f"Pulp tasks timed out after {timeout}s: {descriptions}")
+
+                for i, (req, future, submit_at, backoff_sleep) in list(pending.items()):
+                    if future is None:
+                        if submit_at > now:
+                            continue
+                        self.log.info("Pulp: submitting %s", req.description)
+                        response = self.send(req.method, req.url, req.data)
+                        if response.status_code != 202:
+                            results[i] = response.json()
+                            del pending[i]
+                            continue
+                        task = response.json()["task"]
+                        self.log.info("Pulp: %s => task %s",
+                                      req.description, task)
+                        pending[i] = (req, self.tasks.track(task), 0,
+                                      backoff_sleep)
                         continue
-                    task = response.json()["task"]
-                    self.log.info("Pulp: %s => task %s",
-                                  req.description, task)
-                    still_pending.append((i, req, task, backoff_sleep))
-                    continue
 
-                response = self.get_task(task)
-                data = response.json()
-                if data["state"] in ("waiting", "running"):
-                    still_pending.append((i, req, task, backoff_sleep))
-                    continue
-                if data["state"] == "completed":
-                    self.log.info("Pulp %s %s succeeded",
-                                  req.description, task)
-                    results[i] = data
-                    continue
-                self.log.warning("Pulp %s %s failed, resubmitting: %s",
-                                  req.description, task, data)
-                # Re-add with None href.
-                still_pending.append((i, req, None,
-                                      min(backoff_sleep * 2, 300)))
-
-            pending = still_pending
-            if pending:
-                time.sleep(max(s for _, _, _, s in pending))
+                    if not future.done():
+                        continue
+                    data = future.result()
+                    if data["state"] == "completed":
+                        self.log.info("Pulp %s %s succeeded",
+                                      req.description, data["pulp_href"])
+                        results[i] = data
+                        del pending[i]
+                        continue
+                    self.log.warning("Pulp %s %s failed, resubmitting in %ss: %s",
+                                     req.description, data["pulp_href"],
+                                     backoff_sleep, data)
+                    pending[i] = (req, None, now + backoff_sleep,
+                                  min(backoff_sleep * 2, self.max_retry_backoff))
+
+                if not pending:
+                    break
+
+                # Sleep till any of the tasks finishes, or till we need to
+                # re-submit some request.
+                futures = [future for _, future, _, _ in pending.values() if future]
+                wakeup = min([submit_at for _, future, submit_at, _
+                              in pending.values() if not future] + [deadline])
+                sleep = max(0, wakeup - time.monotonic())
+                if futures:
+                    wait(futures, timeout=sleep, return_when=FIRST_COMPLETED)
+                elif sleep:
+                    time.sleep(sleep)
+        finally:
+            # Don't keep polling the tasks nobody waits for (timeout, error)
+            self.tasks.untrack(future for _, future, _, _ in pending.values()
+                               if future)
 
         return results
 
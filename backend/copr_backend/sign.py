@@ -4,6 +4,7 @@
 Wrapper for /bin/sign from obs-sign package
 """
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from subprocess import Popen, PIPE, SubprocessError
 import os
 import time
@@ -136,16 +137,20 @@ def gpg_hashtype_for_chroot(chroot, opts):
     return "sha256"
 
 
-def sign_rpms_in_dir(username, projectname, path, chroot, opts, log):
+def sign_rpms(username, projectname, rpm_list, chroot, opts, log):
     """
-    Signs rpms using obs-signd.
+    Sign the given list of RPMs using obs-signd.  This is a generator, the
+    paths of RPMs are yielded one by one (in an undetermined order) as soon as
+    they are signed, so the caller can process them further while the rest is
+    still being signed.  The packages are signed concurrently, by at most
+    ``opts.sign_max_workers`` /bin/sign processes.
 
-    If some some pkgs failed to sign, entire build marked as failed,
-    but we continue to try sign other pkgs.
+    If some some pkgs failed to sign, we continue to try sign other pkgs, and
+    raise the exception at the end.
 
     :param username: copr username
     :param projectname: copr projectname
-    :param path: directory with rpms to be signed
+    :param rpm_list: list of paths to RPMs to be signed
     :param chroot: chroot name where we sign packages, affects the hash type
     :param Munch opts: backend config
 
@@ -153,13 +158,6 @@ def sign_rpms_in_dir(username, projectname, path, chroot, opts, log):
 
     :raises: :py:class:`backend.exceptions.CoprSignError` failed to sign at least one package
     """
-
-    rpm_list = [
-        os.path.join(path, filename.name)
-        for filename in os.scandir(path)
-        if filename.name.endswith(".rpm")
-    ]
-
     if not rpm_list:
         return
 
@@ -170,20 +168,51 @@ def sign_rpms_in_dir(username, projectname, path, chroot, opts, log):
     except CoprSignNoKeyError:
         create_user_keys(username, projectname, opts, try_indefinitely=True)
 
-    errors = []  # tuples (rpm_filepath, exception)
-    for rpm in rpm_list:
-        try:
-            _sign_one(rpm, create_gpg_email(username, projectname, opts.sign_domain),
-                      hashtype, log)
-            log.info("signed rpm: %s", rpm)
+    email = create_gpg_email(username, projectname, opts.sign_domain)
+    max_workers = min(opts.sign_max_workers, len(rpm_list))
+    failed = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_sign_one, rpm, email, hashtype, log): rpm
+            for rpm in rpm_list
+        }
+        for future in as_completed(futures):
+            rpm = futures[future]
+            try:
+                future.result()
+                log.info("signed rpm: %s", rpm)
+
+            except CoprSignError:
+                log.exception("failed to sign rpm: %s", rpm)
+                failed.add(rpm)
+                continue
+
+            yield rpm
+
+    if failed:
+        raise CoprSignError("Rpm sign failed, affected rpms: {}"
+                            .format([rpm for rpm in rpm_list if rpm in failed]))
 
-        except CoprSignError as e:
-            log.exception("failed to sign rpm: %s", rpm)
-            errors.append((rpm, e))
 
-    if errors:
-        raise CoprSignError("Rpm sign failed, affected rpms: {}"
-                            .format([err[0] for err in errors]))
+def sign_rpms_in_dir(username, projectname, path, chroot, opts, log):
+    """
+    Signs rpms in the given directory using obs-signd, see sign_rpms().
+
+    If some some pkgs failed to sign, entire build marked as failed,
+    but we continue to try sign other pkgs.
+
+    :param path: directory with rpms to be signed
+
+    :raises: :py:class:`backend.exceptions.CoprSignError` failed to sign at least one package
+    """
+    rpm_list = [
+        os.path.join(path, filename.name)
+        for filename in os.scandir(path)
+        if filename.name.endswith(".rpm")
+    ]
+
+    for _ in sign_rpms(username, projectname, rpm_list, chroot, opts, log):
+        pass
 
 
 def create_user_keys(username, projectname, opts, try_indefinitely=False):
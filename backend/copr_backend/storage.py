@@ -3,7 +3,6 @@ Support for various data storages, e.g. results directory on backend, Pulp, etc.
 """
 
 import os
-import gc
 import time
 from tempfile import TemporaryDirectory
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -75,6 +74,11 @@ class Storage:
         self.opts = opts
         self.log = log
 
+    def close(self):
+        """
+        Release the resources (connections, threads) held by the storage
+        """
+
     def init_project(self, dirname, chroot, reason=None):
         """
         Make sure users can enable a DNF repository for this project/chroot
@@ -196,7 +200,7 @@ class BackendStorage(Storage):
             pass
 
         return call_copr_repo(repo, appstream=self.appstream, devel=self.devel,
-                              logger=self.log)
+                              logger=self.log, backend_opts=self.opts)
 
     def publish_repository(self, chroot, **kwargs):
         assert "chroot_dir" in kwargs
@@ -211,7 +215,8 @@ class BackendStorage(Storage):
         return call_copr_repo(kwargs["chroot_dir"], devel=self.devel,
                               add=[kwargs["target_dir_name"]],
                               logger=self.log,
-                              appstream=self.appstream)
+                              appstream=self.appstream,
+                              backend_opts=self.opts)
 
     def delete_repository(self, chroot):
         chroot_path = os.path.join(
@@ -248,7 +253,8 @@ class BackendStorage(Storage):
             if chroot != "srpm-builds":
                 repo = call_copr_repo(
                     chroot_path, delete=subdirs, devel=self.devel,
-                    appstream=self.appstream, logger=self.log)
+                    appstream=self.appstream, logger=self.log,
+                    backend_opts=self.opts)
                 if not repo:
                     result = False
 
@@ -303,7 +309,8 @@ class BackendStorage(Storage):
             new_chroot_path = os.path.join(new_path, chroot)
             ensure_dir_exists(new_chroot_path, self.log)
 
-            if createrepo and not call_copr_repo(new_chroot_path, logger=self.log):
+            if createrepo and not call_copr_repo(new_chroot_path, logger=self.log,
+                                                 backend_opts=self.opts):
                 return False
         return True
 
@@ -339,6 +346,9 @@ class PulpStorage(Storage):
         self._redis_conn = get_redis_connection(self.opts)
         self._lock = Lock(self._redis_conn, self.log)
 
+    def close(self):
+        self.client.close()
+
     def init_project(self, dirname, chroot, reason=None):
         repository_name = self._repository_name(chroot, dirname)
         try:
@@ -450,10 +460,15 @@ class PulpStorage(Storage):
         """
         Add an RPM to the storage
         """
+        # Large files are uploaded in parallel chunks
+        create_content = self.client.create_content
+        if os.path.getsize(path) > self.client.chunk_size:
+            create_content = self.client.create_content_chunked
+
         i = 1
         while True:
             try:
-                response = self.client.create_content(path, labels)
+                response = create_content(path, labels)
                 if response.ok:
                     return response
                 self.log.error(
@@ -466,14 +481,6 @@ class PulpStorage(Storage):
                     "Failed to create Pulp content for: %s, %s %s (attempt #%s)",
                     path, ex.response.reason, ex.response.text, i,
                 )
-                # We need to explicitly the force garbage collector to run
-                # right now, otherwise we will leak a lot of memory by trying
-                # to upload the (large) file again and again. Which means
-                # reading it again and again. Not sure why the previous memory
-                # couldn't be re-used and not sure why the garbage collector
-                # doesn't free it automatically. It doesn't though, this fixes
-                # a real memory leak that led to the process being OOM-killed.
-                gc.collect()
             i += 1
 
     def upload_build_results(self, rpm_paths, chroot, max_workers=1, build_id=None):
@@ -581,6 +588,7 @@ class PulpStorage(Storage):
     def delete_builds(self, dirname, chroot_builddirs, build_ids):
         # pylint: disable=too-many-locals
         result = True
+        list_of_prns = None
         for chroot, subdirs in chroot_builddirs.items():
             # We don't upload results of source builds to Pulp
             if chroot == "srpm-builds":
@@ -594,9 +602,11 @@ class PulpStorage(Storage):
                 continue
 
             repository = self._get_repository(chroot)
-            # Find the RPMs by list of build ids
-            content_response = self.client.get_content(build_ids, fields=["prn"])
-            list_of_prns = [package["prn"] for package in content_response.json()["results"]]
+            # Find the RPMs by list of build ids.  The query isn't limited to
+            # this chroot, so we do it only once.
+            if list_of_prns is None:
+                list_of_prns = [package["prn"] for package in
+                                self.client.iter_content(build_ids, fields=["prn"])]
 
             dirs_to_delete = [os.path.join(chroot_path, subdir)
                               for subdir in subdirs]
@@ -658,12 +668,11 @@ class PulpStorage(Storage):
         # pylint: disable=too-many-positional-arguments
         src_fullname = "{0}/{1}".format(src_owner, src_project)
         with TemporaryDirectory(prefix="copr-fork-") as tmp:
-            response = self.client.get_content(
+            rpms = self.client.iter_content(
                 [src_build_id],
                 chroot,
                 fields=["location_href"],
             )
-            rpms = response.json()["results"]
             for rpm in rpms:
                 filename = rpm["location_href"]
                 url = "{0}/{1}/{2}/Packages/{3}/{4}".format(
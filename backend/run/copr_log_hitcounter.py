@@ -6,15 +6,27 @@ This is script is supposed to be run daily from lighttpd logrotate, e.g.
        /usr/bin/copr_log_hitcounter.py /var/log/lighttpd/access.log \
            --ignore-subnets 172.25.80.0/20 209.132.184.33/24 || :
    endscript
+
+Alternatively, it can run as a service with the --follow option.  Then it
+continuously reads the newly appended lines and sends the aggregated hits to
+frontend every --flush-interval minutes (don't combine it with the prerotate
+hook then, the hits would be counted twice).
 """
 
 import re
 import os
+import time
 import logging
 import argparse
 from datetime import datetime
 from copr_common.log import setup_script_logger
-from copr_backend.hitcounter import update_frontend
+from copr_backend.hitcounter import (
+    AccessLogFollower,
+    get_hit_data,
+    merge_hit_data,
+    send_hit_data,
+    update_frontend,
+)
 
 
 log = logging.getLogger(__name__)
@@ -26,6 +38,26 @@ logline_regex = re.compile(
     r'"(?P<referer>.*)"\s+"(?P<agent>.*)"', re.IGNORECASE)
 
 
+def parse_access_lines(lines):
+    """
+    Take raw access log lines and return the accesses as a list of dicts.
+    """
+    for line in lines:
+        m = logline_regex.match(line)
+        if not m:
+            continue
+        # Rename dict keys to match `copr-aws-s3-hitcounter`
+        access = m.groupdict()
+        access["cs-uri-stem"] = access.pop("url")
+        access["sc-status"] = access.pop("code")
+        access["cs(User-Agent)"] = access.pop("agent")
+        timestamp = datetime.strptime(access.pop("timestamp"),
+                                      "%d/%b/%Y:%H:%M:%S %z")
+        access["time"] = timestamp.strftime("%H:%M:%S")
+        access["date"] = timestamp.strftime("%Y-%m-%d")
+        yield access
+
+
 def parse_access_file(path):
     """
     Take a raw access file and return its contents as a list of dicts.
@@ -35,20 +67,49 @@ def parse_access_file(path):
         if not firstline.startswith("=== start:"):
             raise ValueError(f"Invalid header: expected '=== start:' at the beginning, got: {firstline!r}")
 
-        for line in logfile:
-            m = logline_regex.match(line)
-            if not m:
-                continue
-            # Rename dict keys to match `copr-aws-s3-hitcounter`
-            access = m.groupdict()
-            access["cs-uri-stem"] = access.pop("url")
-            access["sc-status"] = access.pop("code")
-            access["cs(User-Agent)"] = access.pop("agent")
-            timestamp = datetime.strptime(access.pop("timestamp"),
-                                          "%d/%b/%Y:%H:%M:%S %z")
-            access["time"] = timestamp.strftime("%H:%M:%S")
-            access["date"] = timestamp.strftime("%Y-%m-%d")
-            yield access
+        yield from parse_access_lines(logfile)
+
+
+def chunked(iterable, size):
+    """
+    Split the iterable into lists of SIZE items
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def follow_access_file(args):
+    """
+    Continuously read the newly appended lines in the access log, and send
+    the aggregated hits to frontend every ARGS.flush_interval minutes.
+    """
+    follower = AccessLogFollower(args.logfile, args.state_file, log)
+    flush_interval = args.flush_interval * 60
+    last_flush = time.time()
+    result = {}
+    while True:
+        # Aggregate the hits in chunks, so we don't keep all the accesses
+        # in memory.
+        accesses = parse_access_lines(follower.new_lines())
+        for chunk in chunked(accesses, 1000):
+            result = merge_hit_data(result, get_hit_data(chunk, log))
+
+        if time.time() - last_flush >= flush_interval:
+            if result:
+                send_hit_data(result, log=log, dry_run=args.dry_run,
+                              try_indefinitely=True)
+                result = {}
+            if not args.dry_run:
+                follower.save_state()
+            last_flush = time.time()
+
+        time.sleep(args.poll_interval)
 
 
 def get_arg_parser():
@@ -71,6 +132,28 @@ def get_arg_parser():
         "--verbose",
         action="store_true",
         help=("Print verbose information about what is going on"))
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help=("Don't exit, continuously read the lines appended to the "
+              "logfile (like 'tail -F'), and send the hits periodically"))
+    parser.add_argument(
+        "--flush-interval",
+        type=int,
+        default=5,
+        help=("With --follow, send the hits to frontend every N minutes "
+              "(default: %(default)s)"))
+    parser.add_argument(
+        "--poll-interval",
+        type=int,
+        default=10,
+        help=("With --follow, check the logfile for new lines every N "
+              "seconds (default: %(default)s)"))
+    parser.add_argument(
+        "--state-file",
+        default="/var/lib/copr/copr_log_hitcounter.state",
+        help=("With --follow, remember the position in the logfile here, "
+              "to continue after restart (default: %(default)s)"))
     return parser
 
 
@@ -82,24 +165,18 @@ def main():
     if args.verbose:
         log.setLevel(logging.DEBUG)
 
+    if args.follow:
+        follow_access_file(args)
+        return
+
     # If the access.log gets too big, sending it all at once to frontend will
     # timeout. Let's send it in chunks.
     # The issue is, there is no transaction mechanism, so theoretically some
     # chunks may succeed, some fail and never be counted. But we try to send
     # each request repeatedly and losing some access hits from time to time
     # isn't a mission critical issue and I would just roll with it.
-    size = 1000
-    chunks = []
-    len_chunks = 0
-    for chunk in parse_access_file(args.logfile):
-        chunks.append(chunk)
-        len_chunks += 1
-        if len_chunks >= size:
-            update_frontend(chunks, log=log, dry_run=args.dry_run)
-            chunks = []
-            len_chunks = 0
-    if len_chunks >= size:
-        update_frontend(chunks, log=log, dry_run=args.dry_run)
+    for chunk in chunked(parse_access_file(args.logfile), 1000):
+        update_frontend(chunk, log=log, dry_run=args.dry_run)
 
 
 if __name__ == "__main__":
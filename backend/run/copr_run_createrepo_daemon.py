@@ -0,0 +1,19 @@
+#!/usr/bin/python3
+# coding: utf-8
+
+import sentry_sdk
+from copr_backend.helpers import get_backend_opts
+from copr_backend.daemons.createrepo import CreaterepoDaemon
+
+
+def main():
+    opts = get_backend_opts()
+    if opts["sentry_dsn"]:
+        sentry_sdk.init(dsn=opts["sentry_dsn"])
+
+    daemon = CreaterepoDaemon(opts)
+    daemon.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,7 @@ sys.path.append(os.path.join(WORKDIR, '..'))
 
 # pylint: disable=wrong-import-position
 from copr_common.redis_helpers import get_redis_connection
+from copr_common.worker_manager import publish_worker_event
 
 REDIS_OPTS = Munch(
     redis_db=9,
@@ -61,6 +62,7 @@ def do_the_useful_stuff(process_counter, task_id, worker_id, sleep):
 
     result = 1 if process_counter % 8 else 2
     redis.hset(worker_id, 'status', str(result))
+    publish_worker_event(redis, worker_id)
     return 0
 
 
@@ -0,0 +1,102 @@
+#! /usr/bin/python3
+
+"""
+Compare the throughput of the Redis log shipping (RedisPublishHandler ->
+Redis -> RedisLogHandler), per-record vs. batched.  Needs a running Redis
+server, e.g.:
+
+    $ PYTHONPATH=.:../common python3 tests/benchmark_redis_logging.py \
+        --redis-port 7777 --records 100000
+"""
+
+import argparse
+import logging
+import logging.handlers
+import os
+import shutil
+import tempfile
+import time
+
+from munch import Munch
+
+from copr_common.redis_helpers import get_redis_connection
+from copr_backend.constants import LOG_REDIS_FIFO
+from copr_backend.daemons.log import RedisLogHandler
+from copr_backend.helpers import LOG_BATCH_SIZE, RedisPublishHandler
+
+
+def _get_arg_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", default=6379, type=int)
+    parser.add_argument("--redis-db", default=9, type=int)
+    parser.add_argument("--records", default=50000, type=int)
+    return parser
+
+
+def publish(rc, records, batch_size):
+    """ Log RECORDS lines through RedisPublishHandler """
+    handler = RedisPublishHandler(rc, "worker", batch_size=batch_size,
+                                  flush_interval=3600)
+    log = logging.Logger("benchmark")
+    log.addHandler(handler)
+    start = time.time()
+    for i in range(records):
+        log.info("Build %s, chroot %s: some chatty line", i, "fedora-rawhide")
+    handler.flush()
+    return time.time() - start
+
+
+def consume(opts, rc, records, batched):
+    """ Write RECORDS lines from Redis to the log files """
+    consumer = RedisLogHandler(opts)
+    consumer.setup_logging()
+
+    start = time.time()
+    if batched:
+        done = 0
+        while done < records:
+            batch = consumer.get_batch(rc)
+            consumer.handle_batch(batch)
+            done += len(batch)
+    else:
+        # the original one-by-one RedisLogHandler.run() loop
+        for logger in consumer.loggers.values():
+            logger.handlers = [logging.handlers.WatchedFileHandler(
+                handler.baseFilename) for handler in logger.handlers]
+        for _ in range(records):
+            (_, json_event) = rc.blpop([LOG_REDIS_FIFO])
+            consumer.handle_msg(json_event)
+    return time.time() - start
+
+
+def main():
+    args = _get_arg_parser().parse_args()
+    workdir = tempfile.mkdtemp(prefix="copr-benchmark-logging-")
+    opts = Munch(
+        redis_host=args.redis_host,
+        redis_port=args.redis_port,
+        redis_db=args.redis_db,
+        log_dir=os.path.join(workdir, "copr"),
+        log_level="info",
+        log_format=logging.Formatter(
+            "[%(asctime)s][%(levelname)6s][PID:%(process)d] %(message)s"),
+    )
+    rc = get_redis_connection(opts)
+    rc.delete(LOG_REDIS_FIFO)
+
+    try:
+        for name, batch_size, batched in [("per-record", 1, False),
+                                          ("batched", LOG_BATCH_SIZE, True)]:
+            published = publish(rc, args.records, batch_size)
+            consumed = consume(opts, rc, args.records, batched)
+            print("{:>10}: publish {:>9.0f} records/s, consume {:>9.0f} "
+                  "records/s".format(name, args.records / published,
+                                     args.records / consumed))
+    finally:
+        rc.delete(LOG_REDIS_FIFO)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
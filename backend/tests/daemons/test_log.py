@@ -1,5 +1,6 @@
 # coding: utf-8
 
+import json
 import logging
 from munch import Munch
 import time
@@ -12,7 +13,10 @@ import pytest
 from unittest import mock
 from unittest.mock import patch, MagicMock
 
+from copr_common.redis_helpers import get_redis_connection
+from copr_backend.constants import LOG_REDIS_FIFO
 from copr_backend.daemons.log import RedisLogHandler
+from copr_backend.helpers import RedisPublishHandler
 
 
 @pytest.fixture
@@ -167,3 +171,62 @@ class TestLog(object):
     #     # import ipdb; ipdb.set_trace()
     #
     #     x = 2
+
+
+class TestRedisLogHandlerBatch:
+    def setup_method(self):
+        self.workdir = tempfile.mkdtemp(prefix="copr-redis-log-test-")
+        self.opts = Munch(
+            redis_db=9,
+            redis_port=7777,
+            log_dir=os.path.join(self.workdir, "copr"),
+            log_level="info",
+            log_format=logging.Formatter("%(levelname)s %(message)s"),
+        )
+        self.rc = get_redis_connection(self.opts)
+        self.rc.delete(LOG_REDIS_FIFO)
+        self.handler = RedisLogHandler(self.opts)
+        self.handler.setup_logging()
+
+    def teardown_method(self):
+        self.rc.delete(LOG_REDIS_FIFO)
+        shutil.rmtree(self.workdir)
+
+    def _read(self, component):
+        with open(os.path.join(self.workdir, component + ".log")) as fd:
+            return fd.read()
+
+    def test_batch(self):
+        publisher = RedisPublishHandler(self.rc, "pruner", batch_size=10)
+        log = logging.Logger("copr_backend.test_log_batch")
+        log.addHandler(publisher)
+        for i in range(5):
+            log.info("message %s", i)
+        log.debug("not logged")
+        publisher.flush()
+
+        self.handler.batch_size = 3
+        batch = self.handler.get_batch(self.rc)
+        assert len(batch) == 4
+        assert self.rc.llen(LOG_REDIS_FIFO) == 2
+
+        self.handler.handle_batch(batch)
+        assert self._read("pruner") == "".join(
+            "INFO message {}\n".format(i) for i in range(4))
+
+        self.handler.handle_batch(self.handler.get_batch(self.rc))
+        assert self._read("pruner").endswith("INFO message 4\n")
+        assert not self.rc.exists(LOG_REDIS_FIFO)
+
+    def test_rotated_file_reopened(self):
+        self.rc.rpush(LOG_REDIS_FIFO, json.dumps({
+            "who": "backend", "msg": "first", "levelno": logging.INFO,
+            "levelname": "INFO"}))
+        self.handler.handle_batch(self.handler.get_batch(self.rc))
+        os.rename(os.path.join(self.workdir, "backend.log"),
+                  os.path.join(self.workdir, "backend.log.1"))
+        self.rc.rpush(LOG_REDIS_FIFO, json.dumps({
+            "who": "backend", "msg": "second", "levelno": logging.INFO,
+            "levelname": "INFO"}))
+        self.handler.handle_batch(self.handler.get_batch(self.rc))
+        assert self._read("backend") == "INFO second\n"
@@ -1,4 +1,11 @@
-from copr_backend.hitcounter import url_to_key_strings
+import logging
+import os
+
+from copr_backend.hitcounter import (
+    AccessLogFollower,
+    merge_hit_data,
+    url_to_key_strings,
+)
 
 
 class TestHitcounter:
@@ -45,3 +52,53 @@ class TestHitcounter:
             "chroot_rpms_dl_stat|frostyx|foo|fedora-42-x86_64",
             "project_rpms_dl_stat|frostyx|foo",
         }
+
+    def test_merge_hit_data(self):
+        assert merge_hit_data({}, {}) == {}
+        first = {"ts_from": 10, "ts_to": 20, "hits": {"a": 1, "b": 2}}
+        assert merge_hit_data({}, first) == first
+        assert merge_hit_data(first, {
+            "ts_from": 5, "ts_to": 15, "hits": {"b": 3, "c": 1}
+        }) == {"ts_from": 5, "ts_to": 20, "hits": {"a": 1, "b": 5, "c": 1}}
+
+    def test_access_log_follower(self, f_temp_directory):
+        logfile = os.path.join(f_temp_directory.workdir, "access.log")
+        state = os.path.join(f_temp_directory.workdir, "state")
+        log = logging.getLogger()
+
+        follower = AccessLogFollower(logfile, state, log)
+        assert list(follower.new_lines()) == []
+
+        with open(logfile, "w") as fd:
+            fd.write("line 1\nline 2\nincompl")
+        assert list(follower.new_lines()) == ["line 1\n", "line 2\n"]
+        assert list(follower.new_lines()) == []
+
+        with open(logfile, "a") as fd:
+            fd.write("ete 3\n")
+        assert list(follower.new_lines()) == ["incomplete 3\n"]
+        follower.save_state()
+
+        # rotation, some lines were appended to the old file before that
+        with open(logfile, "a") as fd:
+            fd.write("line 4\n")
+        os.rename(logfile, logfile + ".1")
+        with open(logfile, "w") as fd:
+            fd.write("new 1\n")
+        assert list(follower.new_lines()) == ["line 4\n", "new 1\n"]
+
+        # restart without saving state, we start from the saved position
+        # which belongs to the rotated file
+        follower = AccessLogFollower(logfile, state, log)
+        assert list(follower.new_lines()) == ["new 1\n"]
+        follower.save_state()
+
+        with open(logfile, "a") as fd:
+            fd.write("new 2\n")
+        follower = AccessLogFollower(logfile, state, log)
+        assert list(follower.new_lines()) == ["new 2\n"]
+
+        # truncated
+        with open(logfile, "w") as fd:
+            fd.write("x\n")
+        assert list(follower.new_lines()) == ["x\n"]
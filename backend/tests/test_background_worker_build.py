@@ -359,7 +359,7 @@ def test_build_and_sign(mc_sign_one, f_build_rpm_sign_on, caplog):
 
 @mock.patch("copr_backend.sign.SIGN_BINARY", "tests/fake-bin-sign")
 @mock.patch("copr_backend.sign._sign_one")
-@_patch_bwbuild_object("sign_rpms_in_dir")
+@_patch_bwbuild_object("sign_rpms")
 def test_sign_built_packages_exception(mc_sign_rpms, mc_sign_one,
                                        f_build_rpm_sign_on, caplog):
     _side_effect = mc_sign_one
@@ -834,7 +834,8 @@ def test_unable_to_start_builder(f_build_srpm, caplog):
     assert_logs_exist([
         "Can't start copr-rpmbuild",
         "out:\nstdout\nerr:\nstderr\n",
-        "builder-live.log: No such file or directory",
+        "Unable to compress file",
+        "No such file or directory",
     ], caplog)
     assert_logs_dont_exist(["Retry"], caplog)
 
@@ -1,7 +1,13 @@
 """ test counting priority of build task """
 
+# pylint: disable=protected-access
+
+from unittest.mock import MagicMock
+
 import pytest
+from munch import Munch
 
+from copr_common.dispatcher import Dispatcher, TaskChanges
 from copr_backend.rpm_builds import BuildQueueTask, PRIORITY_SECTION_SIZE
 from copr_backend.daemons.build_dispatcher import _PriorityCounter
 
@@ -109,3 +115,92 @@ def test_sandbox_priority():
         "background": True,
         "sandbox": "cecil/baz--submitter",
     })) == 1  # the same arch, but different sandbox
+
+
+class _ToyDispatcher(Dispatcher):
+    # pylint: disable=abstract-method
+    def __init__(self):
+        super().__init__(Munch())
+        self.full_fetches = 0
+        self.tasks = []
+        self.changes = None
+
+    def get_frontend_tasks(self):
+        self.full_fetches += 1
+        return self.tasks
+
+    def get_frontend_task_changes(self):
+        return self.changes
+
+
+def test_incremental_task_changes():
+    tasks = [BuildQueueTask({
+        "build_id": str(i),
+        "task_id": str(i),
+        "project_owner": "cecil",
+    }) for i in range(3)]
+
+    dispatcher = _ToyDispatcher()
+    worker_manager = MagicMock()
+    dispatcher.tasks = tasks[:2]
+    dispatcher.changes = TaskChanges([tasks[2]], ["0"])
+
+    # the first fetch is always full
+    dispatcher._refresh_tasks(worker_manager)
+    assert dispatcher.full_fetches == 1
+    assert worker_manager.clean_tasks.call_count == 1
+    assert worker_manager.add_task.call_count == 2
+
+    # then we apply changes in place
+    dispatcher._refresh_tasks(worker_manager)
+    assert dispatcher.full_fetches == 1
+    assert worker_manager.clean_tasks.call_count == 1
+    refilled = list(worker_manager.refill_tasks.call_args[0][0])
+    assert refilled == tasks[1:]
+
+    # frontend can tell us to start from scratch
+    dispatcher.changes = TaskChanges([tasks[0]], full=True)
+    dispatcher._refresh_tasks(worker_manager)
+    assert dispatcher.full_fetches == 1
+    assert worker_manager.clean_tasks.call_count == 2
+    assert dispatcher._frontend_tasks == {"0": tasks[0]}
+
+    # periodic full re-sync
+    dispatcher._last_full_resync -= dispatcher.full_resync_period
+    dispatcher._refresh_tasks(worker_manager)
+    assert dispatcher.full_fetches == 2
+
+
+def test_empty_full_resync():
+    tasks = [BuildQueueTask({
+        "build_id": str(i),
+        "task_id": str(i),
+        "project_owner": "cecil",
+    }) for i in range(2)]
+
+    dispatcher = _ToyDispatcher()
+    worker_manager = MagicMock()
+    dispatcher.tasks = tasks
+    dispatcher._refresh_tasks(worker_manager)
+    assert set(dispatcher._frontend_tasks) == {"0", "1"}
+
+    # the frontend queue has drained
+    dispatcher.changes = TaskChanges([], full=True)
+    dispatcher._refresh_tasks(worker_manager)
+    assert worker_manager.clean_tasks.call_count == 2
+    assert dispatcher._frontend_tasks == {}
+
+    # the finished tasks are not re-queued by the next changes
+    dispatcher.changes = TaskChanges([], [])
+    dispatcher._refresh_tasks(worker_manager)
+    assert list(worker_manager.refill_tasks.call_args[0][0]) == []
+
+    # the same with the periodic full re-sync
+    dispatcher.tasks = tasks
+    dispatcher._last_full_resync -= dispatcher.full_resync_period
+    dispatcher._refresh_tasks(worker_manager)
+    dispatcher.tasks = []
+    dispatcher._last_full_resync -= dispatcher.full_resync_period
+    dispatcher._refresh_tasks(worker_manager)
+    assert dispatcher._frontend_tasks == {}
+    assert worker_manager.clean_tasks.call_count == 4
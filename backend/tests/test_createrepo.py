@@ -2,7 +2,9 @@ import os
 import json
 import logging
 import tempfile
+import threading
 import shutil
+from unittest import mock
 
 import testlib
 from testlib import (
@@ -12,10 +14,17 @@ from testlib import (
 )
 
 from copr_common.redis_helpers import get_redis_connection
+from copr_backend.constants import (
+    CREATEREPO_REDIS_ALIVE,
+    CREATEREPO_REDIS_FIFO,
+    CREATEREPO_REDIS_PROCESSING,
+    CREATEREPO_REDIS_RESULT,
+)
 from copr_backend.createrepo import (
     BatchedCreaterepo,
     MAX_IN_BATCH,
 )
+from copr_backend.daemons.createrepo import CreaterepoDaemon
 from copr_backend.pulp import BatchedAddRemoveContent
 
 from copr_backend.helpers import BackendConfigReader
@@ -264,6 +273,157 @@ class TestBatchedCreaterepo:
         assert len(without_status) == 3
 
 
+def _daemon_request(request_id, directory, **kwargs):
+    request = {
+        "id": request_id,
+        "directory": directory,
+        "add": [],
+        "delete": [],
+        "rpms_to_remove": [],
+        "devel": False,
+        "appstream": True,
+        "do_stat": False,
+    }
+    request.update(kwargs)
+    return request
+
+
+class TestCreaterepoDaemon:
+    def setup_method(self):
+        self.workdir = tempfile.mkdtemp(prefix="copr-createrepo-daemon-test-")
+        self.config_file = testlib.minimal_be_config(self.workdir, {
+            "redis_db": 9,
+            "redis_port": 7777,
+        })
+        self.config = BackendConfigReader(self.config_file).read()
+        self.redis = get_redis_connection(self.config)
+        self.redis.flushdb()
+        self.daemon = CreaterepoDaemon(self.config, logging.getLogger())
+        self.daemon.wait_timeout = 1
+        self.chroot_dir = os.path.join(self.workdir, "user", "project",
+                                       "fedora-rawhide-x86_64")
+
+    def teardown_method(self):
+        shutil.rmtree(self.workdir)
+        self.redis.flushdb()
+
+    def test_coalesce(self):
+        requests = [
+            _daemon_request("1", "/a", add=["01-foo"]),
+            _daemon_request("2", "/b", add=["02-foo"]),
+            _daemon_request("3", "/a", add=["03-foo"]),
+            _daemon_request("4", "/a", add=["04-foo"], devel=True),
+        ]
+        requests += [_daemon_request(str(i), "/c") for i in range(5, 5 + MAX_IN_BATCH + 1)]
+        batches = [[r["id"] for r in batch]
+                   for batch in CreaterepoDaemon.coalesce(requests)]
+        assert batches[:3] == [["1", "3"], ["2"], ["4"]]
+        assert len(batches) == 5
+        assert len(batches[3]) == MAX_IN_BATCH
+        assert len(batches[4]) == 1
+
+    def test_batch_opts(self):
+        batch = [
+            _daemon_request("1", self.chroot_dir, add=["01-foo", "02-bar"]),
+            _daemon_request("2", self.chroot_dir, add=["01-foo"],
+                            delete=["03-baz"], do_stat=True),
+        ]
+        opts = self.daemon.batch_opts(batch)
+        assert opts.add == ["01-foo", "02-bar"]
+        assert opts.delete == ["03-baz"]
+        assert opts.do_stat
+        assert not opts.full
+        assert opts.ownername == "user"
+        assert opts.projectname == "project"
+
+        # a request without add/delete means full createrepo
+        batch.append(_daemon_request("3", self.chroot_dir))
+        opts = self.daemon.batch_opts(batch)
+        assert opts.full
+        assert opts.add == []
+        assert opts.delete == ["03-baz"]
+
+    def _push(self, *requests):
+        for request in requests:
+            self.redis.lpush(CREATEREPO_REDIS_FIFO, json.dumps(request))
+
+    @mock.patch("copr_backend.daemons.createrepo.update_repository")
+    def test_roundtrip(self, update_repository):
+        self._push(_daemon_request("1", self.chroot_dir, add=["01-foo"]),
+                   _daemon_request("2", self.chroot_dir, add=["02-foo"]),
+                   _daemon_request("3", self.chroot_dir, add=["../bad"]))
+
+        requests = self.daemon.get_requests()
+        assert len(requests) == 3
+        assert not self.redis.exists(CREATEREPO_REDIS_FIFO)
+        # not dropped till processed
+        assert self.redis.llen(CREATEREPO_REDIS_PROCESSING) == 3
+        for batch in CreaterepoDaemon.coalesce(requests[:2]):
+            self.daemon.process_batch(batch)
+        self.daemon.process_batch(requests[2:])
+
+        assert update_repository.call_count == 1
+        assert update_repository.call_args[0][0].add == ["01-foo", "02-foo"]
+        for request_id, result in [("1", "success"), ("2", "success"),
+                                   ("3", "failure")]:
+            key = CREATEREPO_REDIS_RESULT.format(request_id)
+            assert self.redis.lrange(key, 0, -1) == [result]
+
+        assert not self.redis.exists(CREATEREPO_REDIS_PROCESSING)
+        assert self.daemon.get_requests() == []
+
+    def test_unfinished_requests_after_restart(self):
+        self._push(_daemon_request("1", self.chroot_dir, add=["01-foo"]),
+                   _daemon_request("2", self.chroot_dir, add=["02-foo"]))
+        assert len(self.daemon.get_requests()) == 2
+
+        # daemon restarted before the requests were processed
+        daemon = CreaterepoDaemon(self.config, logging.getLogger())
+        requests = daemon.get_unfinished_requests()
+        assert [request["id"] for request in requests] == ["1", "2"]
+
+    def test_run_disabled(self):
+        self.config.createrepo_daemon = False
+        daemon = CreaterepoDaemon(self.config, logging.getLogger())
+        with mock.patch.object(daemon, "get_requests") as get_requests:
+            daemon.run()
+        assert not get_requests.called
+        assert not self.redis.exists(CREATEREPO_REDIS_ALIVE)
+
+    @mock.patch("copr_backend.daemons.createrepo.update_repository")
+    def test_directories_processed_concurrently(self, update_repository):
+        slow_dir = os.path.join(self.workdir, "user", "slow",
+                                "fedora-rawhide-x86_64")
+        release_slow = threading.Event()
+
+        def _update(opts):
+            if opts.directory == slow_dir:
+                assert release_slow.wait(timeout=10)
+        update_repository.side_effect = _update
+
+        self._push(_daemon_request("1", slow_dir, add=["01-foo"]))
+        self.daemon.dispatch(self.daemon.get_requests())
+        # the slow directory is busy, new requests for it wait
+        self._push(_daemon_request("2", slow_dir, add=["02-foo"]),
+                   _daemon_request("3", slow_dir, add=["03-foo"]),
+                   _daemon_request("4", self.chroot_dir, add=["04-foo"]))
+        self.daemon.dispatch(self.daemon.get_requests())
+
+        # other directories are not blocked by the slow one
+        assert self.redis.blpop([CREATEREPO_REDIS_RESULT.format("4")],
+                                timeout=10)[1] == "success"
+        assert len(self.daemon.waiting[slow_dir]) == 2
+
+        release_slow.set()
+        for request_id in ["1", "2", "3"]:
+            assert self.redis.blpop([CREATEREPO_REDIS_RESULT.format(request_id)],
+                                    timeout=10)[1] == "success"
+        # the waiting requests were coalesced into one run
+        assert update_repository.call_count == 3
+        assert update_repository.call_args[0][0].add == ["02-foo", "03-foo"]
+        assert not self.redis.exists(CREATEREPO_REDIS_PROCESSING)
+
+
 class TestBatchedAddRemoveContent:
     def setup_method(self):
         self.workdir = tempfile.mkdtemp(prefix="copr-batched-ar-test-")
@@ -11,6 +11,7 @@ from copr_common.tree import walk_limited
 from copr_common.redis_helpers import get_redis_connection
 from copr_backend.background_worker_build import BackendError
 from copr_backend.helpers import (
+    RedisPublishHandler,
     copy2_but_hardlink_rpms,
     get_chroot_arch,
     get_redis_logger,
@@ -54,6 +55,38 @@ class TestHelpers(object):
         assert "error occurred: Backend process error: foobar\n" in data["msg"]
         assert 'raise BackendError("foobar")' in data["msg"]
 
+    def _batched_logger(self, **kwargs):
+        handler = RedisPublishHandler(self.rc, "backend", **kwargs)
+        log = logging.Logger("copr_backend.test_batched")
+        log.addHandler(handler)
+        return log, handler
+
+    def test_redis_logger_batch_size(self):
+        log, _ = self._batched_logger(batch_size=3, flush_interval=3600)
+        log.info("first")
+        log.info("second")
+        assert self.rc.llen(LOG_REDIS_FIFO) == 0
+        log.info("third %s", "message")
+        messages = [json.loads(raw)["msg"]
+                    for raw in self.rc.lrange(LOG_REDIS_FIFO, 0, -1)]
+        assert messages == ["first", "second", "third message"]
+
+    def test_redis_logger_batch_flush(self):
+        log, handler = self._batched_logger(batch_size=100, flush_interval=3600)
+        log.info("info")
+        assert self.rc.llen(LOG_REDIS_FIFO) == 0
+        log.error("error")
+        assert self.rc.llen(LOG_REDIS_FIFO) == 2
+        log.info("at exit")
+        handler.flush()
+        assert self.rc.llen(LOG_REDIS_FIFO) == 3
+
+    def test_redis_logger_batch_interval(self):
+        log, _ = self._batched_logger(batch_size=100, flush_interval=0.1)
+        log.info("info")
+        (_, raw_message) = self.rc.blpop([LOG_REDIS_FIFO], timeout=5)
+        assert json.loads(raw_message)["msg"] == "info"
+
     def test_get_chroot_arch(self):
         assert get_chroot_arch("fedora-26-x86_64") == "x86_64"
         assert get_chroot_arch("epel-7-ppc64le") == "ppc64le"
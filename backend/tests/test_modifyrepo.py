@@ -28,6 +28,7 @@ from testlib import (
 from copr_prune_results import run_prunerepo
 
 from copr_common.redis_helpers import get_redis_connection
+from copr_backend.createrepo import run_createrepo
 from copr_backend.helpers import (
     BackendConfigReader,
     call_copr_repo,
@@ -406,7 +407,6 @@ class TestModifyRepo(object):
         os.makedirs(repodata)
         with open(xml, 'w'):
             pass
-        filedict = runpy.run_path(modifyrepo)
         opts = munch.Munch()
         opts.directory = repodir
         opts.add = []
@@ -419,7 +419,7 @@ class TestModifyRepo(object):
         opts.chroot = chroot
 
         # run the method
-        filedict["run_createrepo"](opts)
+        run_createrepo(opts)
 
         additional_args = [] if do_stat else ["--skip-stat"]
 
@@ -0,0 +1,180 @@
+"""
+Test the message bus outbox, and the MessageBusDaemon publishing from it
+"""
+
+import logging
+import shutil
+import tempfile
+from unittest import mock
+
+from munch import Munch
+
+import testlib
+
+from copr_common.redis_helpers import get_redis_connection
+from copr_backend.constants import MSGBUS_REDIS_OUTBOX, MSGBUS_REDIS_WAKEUP
+from copr_backend.daemons.msgbus import MessageBusDaemon
+from copr_backend.helpers import BackendConfigReader
+from copr_backend.msgbus import (
+    MessageSender,
+    MsgBus,
+    MsgBusOutbox,
+    MsgBusStomp,
+)
+
+# pylint: disable=attribute-defined-outside-init
+
+
+class FakeMessage:
+    """ Stand-in for the copr_messaging.schema classes """
+    def __init__(self, body):
+        self.body = body
+
+    def validate(self):
+        """ all messages are valid """
+
+
+class FakeSchema:
+    """ Stand-in for the copr_messaging.schema module """
+    FakeMessage = FakeMessage
+
+
+class FakeBroker(MsgBus):
+    """
+    Local stand-in for a message broker, remembers the published messages and
+    fails the first 'failures' attempts.
+    """
+    def __init__(self, failures=0):
+        super().__init__(Munch(), logging.getLogger())
+        self.failures = failures
+        self.attempts = 0
+        self.published = []
+
+    def _send_message(self, message):
+        self.attempts += 1
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("broker is slow")
+        self.published.append(message.body)
+
+
+class TestMessageBusOutbox:
+    def setup_method(self):
+        self.workdir = tempfile.mkdtemp(prefix="copr-msgbus-test-")
+        self.config_file = testlib.minimal_be_config(self.workdir, {
+            "redis_db": 9,
+            "redis_port": 7777,
+            "msgbus_outbox": "true",
+        })
+        self.config = BackendConfigReader(self.config_file).read()
+        self.redis = get_redis_connection(self.config)
+        self.redis.flushdb()
+        self.schema = mock.patch("copr_backend.msgbus.schema", FakeSchema)
+        self.schema.start()
+        self.outbox = MsgBusOutbox(MsgBusStomp, Munch(), "ci", self.redis,
+                                   logging.getLogger())
+
+    def teardown_method(self):
+        self.schema.stop()
+        shutil.rmtree(self.workdir)
+        self.redis.flushdb()
+
+    def _daemon(self, broker):
+        daemon = MessageBusDaemon(self.config, logging.getLogger(),
+                                  buses={"ci": broker})
+        daemon.wait_timeout = 1
+        return daemon
+
+    def _queue(self, *builds):
+        for build in builds:
+            self.outbox.send_message(FakeMessage({"build": build}))
+
+    def test_sender_does_not_connect(self):
+        self.config.msg_buses = [Munch(bus_type="stomp", bus_id="ci",
+                                       __file__="/etc/copr/msgbuses/ci.conf")]
+        with mock.patch("copr_backend.msgbus.create_bus") as create_bus:
+            sender = MessageSender(self.config, "worker", logging.getLogger())
+        assert not create_bus.called
+        [bus] = sender.msg_buses
+        assert isinstance(bus, MsgBusOutbox)
+        assert bus.style == "v1stomp"
+        assert bus.outbox == MSGBUS_REDIS_OUTBOX.format("ci")
+
+    def test_publish_in_order(self):
+        self._queue(1, 2, 3)
+        assert self.redis.llen(MSGBUS_REDIS_OUTBOX.format("ci")) == 3
+        assert self.redis.llen(MSGBUS_REDIS_WAKEUP) == 3
+
+        broker = FakeBroker()
+        daemon = self._daemon(broker)
+        daemon.wait()
+        assert not self.redis.exists(MSGBUS_REDIS_WAKEUP)
+        assert daemon.publish_all() is False
+        assert broker.published == [{"build": 1}, {"build": 2}, {"build": 3}]
+        assert not self.redis.exists(MSGBUS_REDIS_OUTBOX.format("ci"))
+
+    def test_batches(self):
+        self._queue(*range(5))
+        broker = FakeBroker()
+        daemon = self._daemon(broker)
+        daemon.batch_size = 2
+        assert daemon.publish_all() is True
+        assert daemon.publish_all() is True
+        assert daemon.publish_all() is False
+        assert broker.published == [{"build": i} for i in range(5)]
+
+    def test_retry_keeps_order(self):
+        self._queue(1, 2)
+        broker = FakeBroker(failures=2)
+        daemon = self._daemon(broker)
+        daemon.retry_delay = 0.01
+
+        daemon.publish_all()
+        assert broker.published == []
+        assert daemon.failures == {"ci": 1}
+        assert "ci" in daemon.next_attempt
+
+        # we don't re-try too early
+        daemon.retry_delay = 3600
+        daemon.next_attempt["ci"] = 0
+        daemon.publish_all()
+        assert daemon.failures == {"ci": 2}
+        assert broker.attempts == 2
+        daemon.publish_all()
+        assert broker.attempts == 2
+
+        # broker is back, we publish everything in the original order
+        self._queue(3)
+        daemon.next_attempt["ci"] = 0
+        daemon.publish_all()
+        assert broker.published == [{"build": 1}, {"build": 2}, {"build": 3}]
+        assert daemon.failures == {}
+        assert daemon.next_attempt == {}
+
+    def test_invalid_message_dropped(self):
+        self.redis.rpush(MSGBUS_REDIS_OUTBOX.format("ci"), "not-json",
+                         '{"class": "Unknown", "body": {}}')
+        self._queue(1)
+        broker = FakeBroker()
+        self._daemon(broker).publish_all()
+        assert broker.published == [{"build": 1}]
+        assert not self.redis.exists(MSGBUS_REDIS_OUTBOX.format("ci"))
+
+    def test_retry_delay(self):
+        broker = FakeBroker(failures=10)
+        daemon = self._daemon(broker)
+        daemon.max_retry_delay = 4
+        for expected in [1, 2, 4, 4]:
+            self._queue(1)
+            daemon.next_attempt["ci"] = 0
+            with mock.patch("copr_backend.daemons.msgbus.time.time",
+                            return_value=100):
+                daemon.publish_all()
+            assert daemon.next_attempt["ci"] == 100 + expected
+
+    def test_run_disabled(self):
+        self.config.msgbus_outbox = False
+        daemon = MessageBusDaemon(self.config, logging.getLogger())
+        with mock.patch.object(daemon, "connect") as connect:
+            daemon.run()
+        assert not connect.called
@@ -4,9 +4,20 @@ Test Pulp client
 
 # pylint: disable=attribute-defined-outside-init
 
+import hashlib
+import os
+import re
+import threading
+import time
 from unittest.mock import Mock, patch
 import pytest
-from copr_backend.pulp import PulpClient, PulpRequest
+from copr_backend.pulp import (
+    MultipartFileBody,
+    PulpClient,
+    PulpRequest,
+    mmap_file,
+)
+from testlib.pulp_server import FakePulpServer
 
 
 class TestPulp:
@@ -124,10 +135,9 @@ class TestPulp:
         build_ids = list(range(25))
         response = client.get_content(build_ids, fields=["prn"])
         assert client.send.call_count == 4
-        assert client.send.call_args_list[0].args[1].count("build_id") == 7
-        assert client.send.call_args_list[1].args[1].count("build_id") == 7
-        assert client.send.call_args_list[2].args[1].count("build_id") == 7
-        assert client.send.call_args_list[3].args[1].count("build_id") == 4
+        # The batches are queried concurrently, in any order
+        assert sorted(call.args[1].count("build_id")
+                      for call in client.send.call_args_list) == [4, 7, 7, 7]
 
         assert response.ok
         assert response.json()["count"] == 200
@@ -140,13 +150,36 @@ class TestPulp:
         assert "Content must be queried for specific builds" in str(ex)
         assert not client.send.called
 
+        with pytest.raises(ValueError):
+            client.iter_content([], fields=["prn"])
+
+    def test_iter_content_concurrent(self):
+        client = PulpClient(self.config)
+        # All the worker threads need to meet here, otherwise the test hangs
+        barrier = threading.Barrier(client.get_content_workers, timeout=10)
+
+        def mock_send(_, uri):
+            barrier.wait()
+            build_ids = re.findall(r"build_id%3D(\d+)", uri)
+            results = [{"prn": "rpm-{0}".format(build_id)}
+                       for build_id in build_ids]
+            return self.create_mock_response(results, len(results))
+
+        client.send = Mock(side_effect=mock_send)
+        rpms = client.iter_content(list(range(7 * client.get_content_workers)))
+        assert not client.send.called
+        assert [rpm["prn"] for rpm in rpms] == [
+            "rpm-{0}".format(i) for i in range(7 * client.get_content_workers)]
+        assert client.send.call_count == client.get_content_workers
+
 
 class TestDeliverRequests:
 
     def setup_method(self, _method):
+        self.server = FakePulpServer().start()
         self.config = {
             "api_root": "/pulp/",
-            "base_url": "http://pulp.fpo:24817",
+            "base_url": self.server.base_url,
             "cert": "",
             "domain": "default",
             "dry_run": False,
@@ -159,153 +192,256 @@ class TestDeliverRequests:
             "verify_ssl": True,
         }
         self.client = PulpClient(self.config)
+        self.client.retry_backoff = 0.01
+        self.client.max_retry_backoff = 0.04
+        self.client.tasks.poll_interval = 0.01
+        self.client.tasks.max_poll_interval = 0.04
+
+    def teardown_method(self, _method):
+        self.client.close()
+        self.server.stop()
 
-    def _mock_response(self, status_code, json_data=None):
-        resp = Mock()
-        resp.ok = 200 <= status_code < 400
-        resp.status_code = status_code
-        resp.text = "mock"
-        resp.json.return_value = json_data or {}
-        return resp
+    def _task_gets(self):
+        return [path for method, path in self.server.requests
+                if method == "GET"]
 
     def test_empty_list(self):
         assert not self.client.deliver_and_wait([])
+        assert not self.server.requests
 
-    @patch("time.sleep")
-    def test_sync_request(self, _sleep):
-        self.client.send = Mock(return_value=self._mock_response(
-            201, {"pulp_href": "/repo/1/"}))
-        req = PulpRequest("POST", "/api/v3/repositories/rpm/rpm/",
+    def test_sync_request(self):
+        req = PulpRequest("POST", "/api/v3/repositories/rpm/rpm/sync/",
                           {"name": "test"}, "create repo")
         results = self.client.deliver_and_wait([req])
-        assert results == [{"pulp_href": "/repo/1/"}]
-        self.client.send.assert_called_once_with("POST",
-            "/api/v3/repositories/rpm/rpm/", {"name": "test"})
-
-    @patch("time.sleep")
-    def test_async_task_completed(self, _sleep):
-        submit_resp = self._mock_response(202, {"task": "/tasks/abc/"})
-        task_resp = self._mock_response(200, {
-            "state": "completed",
-            "created_resources": ["/content/1/"],
-        })
-        self.client.send = Mock(return_value=submit_resp)
-        self.client.get_task = Mock(return_value=task_resp)
-
-        req = PulpRequest("POST", "/url/", None, "test task")
-        results = self.client.deliver_and_wait([req])
-        assert results[0]["state"] == "completed"
-        self.client.get_task.assert_called_once_with("/tasks/abc/")
-
-    @patch("time.sleep")
-    def test_async_task_waiting_then_completed(self, _sleep):
-        submit_resp = self._mock_response(202, {"task": "/tasks/abc/"})
-        waiting_resp = self._mock_response(200, {"state": "waiting"})
-        completed_resp = self._mock_response(200, {
-            "state": "completed",
-            "created_resources": [],
-        })
-        self.client.send = Mock(return_value=submit_resp)
-        self.client.get_task = Mock(side_effect=[waiting_resp, completed_resp])
+        assert results == [{"pulp_href": "/pulp/api/v3/repositories/rpm/rpm/sync/"}]
+        assert self.server.requests == [
+            ("POST", "/pulp/api/v3/repositories/rpm/rpm/sync/")]
 
+    def test_async_task_waiting_then_completed(self):
+        self.server.polls["/pulp/url/"] = 3
         req = PulpRequest("DELETE", "/url/", None, "delete thing")
         results = self.client.deliver_and_wait([req])
         assert results[0]["state"] == "completed"
-        assert self.client.get_task.call_count == 2
-        _sleep.assert_called()
-
-    @patch("time.sleep")
-    def test_failed_task_resubmitted(self, _sleep):
-        submit_resp = self._mock_response(202, {"task": "/tasks/1/"})
-        failed_resp = self._mock_response(200, {"state": "failed"})
-        resubmit_resp = self._mock_response(202, {"task": "/tasks/2/"})
-        completed_resp = self._mock_response(200, {
-            "state": "completed",
-            "created_resources": [],
-        })
-        self.client.send = Mock(side_effect=[submit_resp, resubmit_resp])
-        self.client.get_task = Mock(side_effect=[failed_resp, completed_resp])
+        assert results[0]["created_resources"] == ["/pulp/url/created/"]
+        assert self.server.task_queries == [1, 1, 1, 1]
 
+    def test_failed_task_resubmitted(self):
+        self.server.failures["/pulp/url/"] = 2
         req = PulpRequest("POST", "/url/", None, "retry task")
         results = self.client.deliver_and_wait([req])
         assert results[0]["state"] == "completed"
-        assert self.client.send.call_count == 2
-        assert self.client.get_task.call_count == 2
-
-    @patch("time.sleep")
-    @patch("time.monotonic")
-    def test_timeout_raises(self, mock_monotonic, _sleep):
-        mock_monotonic.side_effect = [0, 0, 100]
-        submit_resp = self._mock_response(202, {"task": "/tasks/1/"})
-        waiting_resp = self._mock_response(200, {"state": "waiting"})
-        self.client.send = Mock(return_value=submit_resp)
-        self.client.get_task = Mock(return_value=waiting_resp)
+        posts = [r for r in self.server.requests if r[0] == "POST"]
+        assert len(posts) == 3
 
+    def test_timeout_raises(self):
+        self.server.polls["/pulp/url/"] = 1000
         req = PulpRequest("POST", "/url/", None, "slow task")
-        with pytest.raises(RuntimeError, match="timed out"):
-            self.client.deliver_and_wait([req], timeout=10)
-
-    @patch("time.sleep")
-    def test_multiple_parallel_requests(self, _sleep):
-        submit1 = self._mock_response(202, {"task": "/tasks/1/"})
-        submit2 = self._mock_response(202, {"task": "/tasks/2/"})
-        completed1 = self._mock_response(200, {
-            "state": "completed", "result": "one"})
-        completed2 = self._mock_response(200, {
-            "state": "completed", "result": "two"})
-        self.client.send = Mock(side_effect=[submit1, submit2])
-        self.client.get_task = Mock(side_effect=[completed1, completed2])
-
-        reqs = [
-            PulpRequest("DELETE", "/repo/1/", None, "delete repo 1"),
-            PulpRequest("DELETE", "/dist/1/", None, "delete dist 1"),
-        ]
-        results = self.client.deliver_and_wait(reqs)
-        assert results[0]["result"] == "one"
-        assert results[1]["result"] == "two"
+        with pytest.raises(RuntimeError, match="timed out.*slow task"):
+            self.client.deliver_and_wait([req], timeout=0.2)
 
-    @patch("time.sleep")
-    def test_backoff_increases_on_failure(self, mock_sleep):
-        """
-        Backoff doubles on each task failure and persists across resubmits.
-        """
-        submit_resp = self._mock_response(202, {"task": "/tasks/1/"})
-        failed_resp = self._mock_response(200, {"state": "failed"})
-        resubmit_resp = self._mock_response(202, {"task": "/tasks/2/"})
-        failed_resp2 = self._mock_response(200, {"state": "failed"})
-        resubmit_resp2 = self._mock_response(202, {"task": "/tasks/3/"})
-        completed_resp = self._mock_response(200, {"state": "completed"})
-        self.client.send = Mock(
-            side_effect=[submit_resp, resubmit_resp, resubmit_resp2])
-        self.client.get_task = Mock(
-            side_effect=[failed_resp, failed_resp2, completed_resp])
-
-        req = PulpRequest("POST", "/url/", None, "backoff task")
+    def test_tracker_thread_exits_when_idle(self):
+        self.server.polls["/pulp/url/"] = 1
+        req = PulpRequest("DELETE", "/url/", None, "delete thing")
+        self.client.deliver_and_wait([req])
+        thread = self.client.tasks._thread
+        if thread:
+            thread.join(timeout=5)
+            assert not thread.is_alive()
+        assert self.client.tasks._thread is None
+
+        # started again on demand
+        self.server.polls["/pulp/url/"] = 1
         results = self.client.deliver_and_wait([req])
         assert results[0]["state"] == "completed"
-        sleeps = [call.args[0] for call in mock_sleep.call_args_list]
-        assert sleeps == [5, 10, 10, 20, 20]
 
-    @patch("time.sleep")
-    def test_backoff_capped_at_300(self, mock_sleep):
+    def test_timeout_untracks_tasks(self):
+        self.server.polls["/pulp/url/"] = 1000
+        req = PulpRequest("POST", "/url/", None, "slow task")
+        with pytest.raises(RuntimeError, match="timed out"):
+            self.client.deliver_and_wait([req], timeout=0.1)
+        # nobody waits for the task, it's not polled anymore
+        assert not self.client.tasks._tasks
+        thread = self.client.tasks._thread
+        if thread:
+            thread.join(timeout=5)
+            assert not thread.is_alive()
+
+    def test_untrack_shared_task(self):
+        self.server.polls["/pulp/url/"] = 1000
+        first = self.client.tasks.track("/pulp/url/")
+        second = self.client.tasks.track("/pulp/url/")
+        assert first is second
+        self.client.tasks.untrack([first])
+        # still waited for by the other caller
+        assert not first.cancelled()
+        self.client.tasks.untrack([second])
+        assert second.cancelled()
+        assert not self.client.tasks._tasks
+
+    def test_close(self):
+        self.server.polls["/pulp/url/"] = 1000
+        future = self.client.tasks.track("/pulp/url/")
+        thread = self.client.tasks._thread
+        assert thread.is_alive()
+
+        self.client.close()
+        assert not thread.is_alive()
+        assert future.cancelled()
+        assert self.client.tasks._thread is None
+
+    def test_many_tasks_polled_in_bulk(self):
+        reqs = []
+        for i in range(120):
+            path = "/pulp/repo/{0}/".format(i)
+            self.server.polls[path] = i % 3
+            reqs.append(PulpRequest("DELETE", path[len("/pulp"):], None,
+                                    "delete repo {0}".format(i)))
+        # make sure all the tasks are submitted before the first check
+        self.client.tasks.poll_interval = 2
+        results = self.client.deliver_and_wait(reqs)
+        assert [r["created_resources"][0] for r in results] == [
+            "/pulp/repo/{0}/created/".format(i) for i in range(120)]
+
+        # one list query per round (limited by the batch size), no
+        # per-task GETs
+        assert all(path == "/pulp/api/v3/tasks/" for path in self._task_gets())
+        assert max(self.server.task_queries) == 50
+        assert sum(self.server.task_queries) == 120 + 80 + 40
+        assert len(self.server.task_queries) < 20
+
+    def test_slow_task_doesnt_delay_others(self):
         """
-        Backoff doubles on each failure but never exceeds 300s.
+        Multiple threads share the same tracker, and the fast tasks are
+        noticed even though a slow one is still running.
         """
-        failed_resp = self._mock_response(200, {"state": "failed"})
-        completed_resp = self._mock_response(200, {"state": "completed"})
-
-        # 8 failures: backoff goes 5→10→20→40→80→160→320→640
-        # but capped: 5→10→20→40→80→160→300→300
-        task_responses = [failed_resp] * 8 + [completed_resp]
-        submit_responses = [
-            self._mock_response(202, {"task": f"/tasks/{i}/"})
-            for i in range(9)
-        ]
-        self.client.send = Mock(side_effect=submit_responses)
-        self.client.get_task = Mock(side_effect=task_responses)
-
-        req = PulpRequest("POST", "/url/", None, "capped backoff")
-        results = self.client.deliver_and_wait([req])
+        self.server.polls["/pulp/slow/"] = 1000
+        slow = threading.Thread(target=self.client.deliver_and_wait, args=(
+            [PulpRequest("POST", "/slow/", None, "slow")], 5), daemon=True)
+        slow.start()
+
+        self.server.polls["/pulp/fast/"] = 2
+        start = time.time()
+        results = self.client.deliver_and_wait(
+            [PulpRequest("POST", "/fast/", None, "fast")])
         assert results[0]["state"] == "completed"
-        sleeps = [call.args[0] for call in mock_sleep.call_args_list]
-        assert max(sleeps) == 300
+        assert time.time() - start < 1
+        assert slow.is_alive()
+
+        # let the slow task finish
+        for task in self.server.tasks.values():
+            task.polls = 0
+        slow.join()
+
+
+class TestUploads:
+
+    def setup_method(self, _method):
+        self.config = {
+            "api_root": "/pulp/",
+            "base_url": "http://pulp.fpo:24817",
+            "cert": "",
+            "domain": "default",
+            "password": "1234",
+            "username": "admin",
+        }
+        self.client = PulpClient(self.config)
+
+    def teardown_method(self, _method):
+        self.client.close()
+
+    def test_multipart_body(self):
+        content = b"0123456789" * 10
+        body = MultipartFileBody(memoryview(content)[5:55], "foo.rpm",
+                                 {"pulp_labels": "{}"})
+        data = body.read()
+        assert len(data) == len(body)
+        assert data.startswith(("--" + body.boundary).encode())
+        assert b'name="pulp_labels"\r\n\r\n{}\r\n' in data
+        assert b'filename="foo.rpm"' in data
+        assert content[5:55] + b"\r\n--" in data
+        assert data.endswith(("--" + body.boundary + "--\r\n").encode())
+
+        # small reads, re-reads after seek
+        for _ in range(2):
+            body.seek(0)
+            parts = []
+            while part := body.read(7):
+                parts.append(part)
+            assert b"".join(parts) == data
+        body.close()
+
+    def test_mmap_file(self, f_temp_directory):
+        path = os.path.join(f_temp_directory.workdir, "empty")
+        with open(path, "wb"):
+            pass
+        with mmap_file(path) as view:
+            assert len(view) == 0
+        with open(path, "wb") as fd:
+            fd.write(b"abc")
+        with mmap_file(path) as view:
+            assert view.tobytes() == b"abc"
+
+    @patch("copr_backend.pulp.PulpClient.chunk_size", 1024 * 1024)
+    def test_create_content_chunked(self, f_temp_directory):
+        path = os.path.join(f_temp_directory.workdir, "big.rpm")
+        content = os.urandom(5 * 1024 * 1024 + 123)
+        with open(path, "wb") as fd:
+            fd.write(content)
+
+        uploaded = {}
+        threads = set()
+        lock = threading.Lock()
+
+        def _send(method, url, data=None, headers=None, **_kwargs):
+            response = Mock()
+            response.ok = True
+            if method == "PUT":
+                body = data.read()
+                with lock:
+                    uploaded[headers["Content-Range"]] = body
+                    threads.add(threading.get_ident())
+            else:
+                response.json.return_value = {
+                    "pulp_href": "/pulp/api/v3/uploads/1/",
+                }
+            return response
+
+        self.client.send = Mock(side_effect=_send)
+        self.client.deliver_and_wait = Mock(return_value=[
+            {"created_resources": ["/artifact/1/"]}])
+        self.client.create_content_chunked(path, {"build_id": 1})
+
+        assert len(uploaded) == 6
+        assert len(threads) >= 1
+        received = b""
+        for i in range(6):
+            start = i * 1024 * 1024
+            end = min(start + 1024 * 1024, len(content)) - 1
+            body = uploaded["bytes {0}-{1}/*".format(start, end)]
+            assert content[start:end + 1] + b"\r\n--" in body
+            received += content[start:end + 1]
+        assert received == content
+
+        commit = self.client.deliver_and_wait.call_args[0][0][0]
+        assert commit.data["sha256"] == hashlib.sha256(content).hexdigest()
+        assert commit.url.endswith("/pulp/api/v3/uploads/1/commit/")
+
+    def test_create_content_chunked_failure(self, f_temp_directory):
+        path = os.path.join(f_temp_directory.workdir, "big.rpm")
+        with open(path, "wb") as fd:
+            fd.write(b"x" * 100)
+        self.client.chunk_size = 10
+
+        def _send(method, _url, data=None, headers=None, **_kwargs):
+            response = Mock()
+            response.ok = headers is None or \
+                not headers["Content-Range"].startswith("bytes 30-")
+            response.reason = "Bad Request"
+            response.json.return_value = {"pulp_href": "/uploads/1/"}
+            return response
+
+        self.client.send = Mock(side_effect=_send)
+        self.client.deliver_and_wait = Mock()
+        with pytest.raises(RuntimeError, match="Failed to upload chunk 3"):
+            self.client.create_content_chunked(path, {})
+        assert not self.client.deliver_and_wait.called
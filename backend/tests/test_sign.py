@@ -33,6 +33,7 @@ class TestSign(object):
         self.opts = Munch(keygen_host="example.com")
         self.opts.gently_gpg_sha256 = False
         self.opts.sign_domain = "fedorahosted.org"
+        self.opts.sign_max_workers = 2
 
     def teardown_method(self, method):
         if self.tmp_dir_path:
@@ -301,6 +302,53 @@ class TestSign(object):
 
         assert mc_so.called
 
+    @mock.patch("copr_backend.sign.time.sleep")
+    def test_sign_rpms_in_dir_parallel(self, _sleep, tmp_dir):
+        """
+        Fake /bin/sign waiting till all the good packages are being signed
+        (i.e. fails if they are not signed concurrently), the failure is
+        reported per-RPM.
+        """
+        started = os.path.join(self.tmp_dir_path, "started")
+        os.mkdir(started)
+        sign_bin = os.path.join(self.tmp_dir_path, "sign")
+        with open(sign_bin, "w") as handle:
+            handle.write("\n".join([
+                "#! /bin/sh",
+                'test "$3" = -p && echo pubkey && exit 0',
+                'case "$7" in */bad.rpm) exit 1;; esac',
+                'touch "{0}/$(basename "$7")"'.format(started),
+                "for _ in $(seq 50); do",
+                '    test "$(ls {0} | wc -l)" -ge 6 && exit 0'.format(started),
+                "    sleep 0.1",
+                "done",
+                "exit 1",
+                "",
+            ]))
+        os.chmod(sign_bin, 0o755)
+
+        rpmdir = os.path.join(self.tmp_dir_path, "rpms")
+        os.mkdir(rpmdir)
+        rpms = ["pkg-{}.rpm".format(i) for i in range(6)] + ["bad.rpm"]
+        for name in rpms:
+            with open(os.path.join(rpmdir, name), "w") as handle:
+                handle.write("1")
+
+        self.opts.sign_max_workers = 6
+        log = MagicMock()
+        with mock.patch("copr_backend.sign.SIGN_BINARY", sign_bin):
+            with pytest.raises(CoprSignError) as err:
+                sign_rpms_in_dir(self.username, self.projectname, rpmdir,
+                                 "fedora-rawhide-x86_64", self.opts, log=log)
+
+        assert str(err.value).startswith(
+            "Rpm sign failed, affected rpms: ['{}']".format(
+                os.path.join(rpmdir, "bad.rpm")))
+        signed = [call[0][1] for call in log.info.call_args_list
+                  if call[0][0] == "signed rpm: %s"]
+        assert sorted(signed) == sorted(
+            os.path.join(rpmdir, name) for name in rpms[:-1])
+
 
 def test_chroot_gpg_hashes():
     chroots = [
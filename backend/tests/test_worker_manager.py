@@ -13,6 +13,7 @@ from copr_common.redis_helpers import get_redis_connection
 from copr_common.worker_manager import (
     JobQueue,
     WorkerManager,
+    HashWorkerLimit,
     PredicateWorkerLimit,
 )
 from copr_backend.actions import ActionWorkerManager, ActionQueueTask, Action
@@ -199,7 +200,7 @@ class TestLimitedWorkerManager(BaseTestWorkerManager):
             log=log,
             limits=self.limits)
 
-    @patch('copr_common.worker_manager.time.sleep')
+    @patch('copr_common.worker_manager.WorkerManager._wait_for_worker_events')
     @patch('copr_common.worker_manager.time.time')
     def test_that_limits_are_respected(self, mc_time, _mc_sleep, caplog):
         # each time.time() call incremented by 1
@@ -208,15 +209,9 @@ class TestLimitedWorkerManager(BaseTestWorkerManager):
         mc_time.side_effect = range(1000)
         self.worker_manager.run(timeout=150)
         messages = [
-            "Task '4' skipped, limit info: 'even', "
+            "Task '4' parked, limit info: 'even', "
             "matching: worker:0, worker:2",
-            "Task '6' skipped, limit info: 'even', "
-            "matching: worker:0, worker:2",
-            "Task '7' skipped, limit info: 'odd', "
-            "matching: worker:1, worker:3, worker:5",
-            "Task '8' skipped, limit info: 'even', "
-            "matching: worker:0, worker:2",
-            "Task '9' skipped, limit info: 'odd', "
+            "Task '7' parked, limit info: 'odd', "
             "matching: worker:1, worker:3, worker:5",
         ]
         for msg in messages:
@@ -224,35 +219,105 @@ class TestLimitedWorkerManager(BaseTestWorkerManager):
 
         # Even though the "even" limit kicked-out task 4, the task 5 is still
         # successfully started because that's the third "odd" task.  The rest of
-        # tasks is just skipped.
+        # tasks is parked together with 4 and 7, so not even checked.
         assert ('root', logging.INFO,
                 "Starting worker worker:5, task.priority=0") in \
             caplog.record_tuples
+        for task_id in [6, 8, 9]:
+            assert not [msg for _, _, msg in caplog.record_tuples
+                        if msg.startswith("Task '{}' parked".format(task_id))]
 
         # finish the task now
         self.redis.hset("worker:5", "status", "0")
 
-        self.setup_tasks()  # re-calculate limits
+        # Removing the finished worker frees the "odd" limit quota, and the
+        # parked tasks are re-activated in the same run() call (issue #1415).
         self.worker_manager.run(timeout=150)
-
-        # check worker manager recognized the finished task
         assert ('root', logging.INFO, "Finished worker worker:5") \
                 in caplog.record_tuples
-
-        # worker 7 is not yet started, it waits for next run() because run()
-        # doesn't free the limit quota when removing worker from Redis (see
-        # issue #1415)
-        worker_7_started = "Starting worker worker:7, task.priority=0"
-        assert ('root', logging.INFO, worker_7_started) not in \
+        assert ('root', logging.INFO,
+                "Starting worker worker:7, task.priority=0") in \
+            caplog.record_tuples
+        assert ('root', logging.INFO,
+                "Starting worker worker:9, task.priority=0") not in \
             caplog.record_tuples
 
-        # another run finally takes the task 7, because 5 is done
+        # re-calculating the limits doesn't start anything new
         self.setup_tasks(exclude=[5])
         self.worker_manager.run(timeout=150)
-        assert ('root', logging.INFO, worker_7_started) in \
+        assert ('root', logging.INFO,
+                "Starting worker worker:9, task.priority=0") not in \
             caplog.record_tuples
 
 
+class FloodTask(ToyQueueTask):
+    """ Task with the owner attribute, for the owner limits """
+    def __init__(self, _id, owner, priority=0):
+        super().__init__(_id)
+        self.owner = owner
+        self._priority = priority
+
+    @property
+    def priority(self):
+        return self._priority
+
+
+class CountingHashWorkerLimit(HashWorkerLimit):
+    """ Count how many times the limit was checked """
+    checks = 0
+
+    def check(self, task):
+        self.checks += 1
+        return super().check(task)
+
+
+class TestSingleOwnerFlood(BaseTestWorkerManager):
+    """
+    One owner submits a huge amount of tasks, the tasks of other owners must
+    not wait till the owner's tasks are skipped one by one.
+    """
+    flood_size = 100000
+
+    def setup_worker_manager(self):
+        self.limit = CountingHashWorkerLimit(lambda x: x.owner, 2,
+                                             name="owner")
+        self.worker_manager = ToyWorkerManager(
+            redis_connection=self.redis,
+            max_workers=10,
+            log=log,
+            limits=[self.limit])
+        # we don't need real background processes here
+        self.worker_manager.start_task = MagicMock()
+
+    def setup_tasks(self, exclude=None):
+        _unused = exclude
+        # See test_slow_priority_queue_filling().
+        log.setLevel(logging.INFO)
+        self.worker_manager.clean_tasks()
+        for i in range(self.flood_size):
+            self.worker_manager.add_task(FloodTask(i, "flooder"))
+        for i in range(3):
+            task_id = self.flood_size + i
+            self.worker_manager.add_task(
+                FloodTask(task_id, "user{}".format(i), priority=1))
+
+    def test_single_owner_flood(self):
+        self.worker_manager.run(timeout=0.5)
+
+        started = [call.args[1].owner for call in
+                   self.worker_manager.start_task.call_args_list]
+        assert sorted(started) == ["flooder", "flooder",
+                                   "user0", "user1", "user2"]
+
+        # The flooder's tasks were parked at once, instead of checking
+        # (and skipping) them one by one.
+        assert self.limit.checks < 10
+        # ... and they stay parked (not dropped) till the limit frees up
+        assert self.worker_manager.tasks.parked == {("flooder",)}
+        assert len(self.worker_manager.tasks.groups[("flooder",)]) \
+            == self.flood_size - 2
+
+
 class TestWorkerManager(BaseTestWorkerManager):
     def test_worker_starts(self):
         task = self.worker_manager.tasks.pop_task()
@@ -269,7 +334,7 @@ class TestWorkerManager(BaseTestWorkerManager):
         wid = "{}:123".format(self.worker_manager.worker_prefix)
         assert self.worker_manager.get_task_id_from_worker_id(wid) == "123"
 
-    @patch('copr_common.worker_manager.time.sleep')
+    @patch('copr_common.worker_manager.WorkerManager._wait_for_worker_events')
     def test_preexisting_broken_worker(self, _mc_sleep, caplog):
         """ from previous systemctl restart """
         fake_worker_name = self.worker_manager.worker_prefix + ":fake"
@@ -286,6 +351,36 @@ class TestWorkerManager(BaseTestWorkerManager):
         assert self.redis.hgetall('worker:3') == {}
         assert "cancel_request" in self.redis.hgetall('worker:4')
 
+    def test_refill_tasks(self):
+        # Not the 0-9 IDs from setup_tasks(), the background workers left
+        # behind by the previous tests may still (re-)create their keys.
+        tasks = [ToyQueueTask(i) for i in range(10, 15)]
+        self.worker_manager.clean_tasks()
+        for task in tasks:
+            self.worker_manager.add_task(task)
+
+        queue = self.worker_manager.tasks
+        entry = queue.entry_finder["14"]
+
+        # task 10 was skipped (e.g. because of limits), task 11 is processed
+        assert queue.pop_task() is tasks[0]
+        assert queue.pop_task() is tasks[1]
+        self.worker_manager._tracked_workers.add("worker:11")
+
+        # task 13 disappeared from frontend, and task 15 is new
+        self.worker_manager.refill_tasks(tasks[:3] + [tasks[4], ToyQueueTask(15)])
+
+        # task 14 kept in place
+        assert queue.entry_finder["14"] is entry
+
+        popped = []
+        while True:
+            try:
+                popped.append(queue.pop_task().id)
+            except KeyError:
+                break
+        assert popped == [12, 14, 10, 15]
+
     def test_slow_priority_queue_filling(self):
         """
         We discovered that adding tasks to a priority queue was a bottleneck
@@ -408,7 +503,7 @@ class TestActionWorkerManager(BaseTestWorkerManager):
         mc_time.side_effect = range(1000)
 
         # first loop just starts the toy:0 worker
-        with patch('copr_common.worker_manager.time.sleep'):
+        with patch('copr_common.worker_manager.WorkerManager._wait_for_worker_events'):
             self.worker_manager.run(timeout=1)
 
         params = self.wait_field(self.w0, 'started')
@@ -421,12 +516,12 @@ class TestActionWorkerManager(BaseTestWorkerManager):
             wait_pid_exit(params['PID'])
 
         # toy 0 is marked for deleting
-        with patch('copr_common.worker_manager.time.sleep'):
+        with patch('copr_common.worker_manager.WorkerManager._wait_for_worker_events'):
             self.worker_manager.run(timeout=1)
         assert 'delete' in self.redis.hgetall(self.w0)
 
         # toy 0 should be deleted
-        with patch('copr_common.worker_manager.time.sleep'):
+        with patch('copr_common.worker_manager.WorkerManager._wait_for_worker_events'):
             self.worker_manager.run(timeout=1)
         keys = self.workers()
         assert self.w1 in keys
@@ -457,7 +552,7 @@ class TestActionWorkerManager(BaseTestWorkerManager):
                 "Task 0 already has a worker process") in caplog.record_tuples
 
     def test_empty_queue_but_workers_running(self):
-        'check that sleep(1) is done if queue is empty, but some workers exist'
+        'check that we wait for workers if queue is empty, but some workers exist'
 
         self.worker_manager.clean_tasks()
 
@@ -468,7 +563,7 @@ class TestActionWorkerManager(BaseTestWorkerManager):
         # start the worker
         self.worker_manager.run(timeout=0.0001) # start them task
 
-        with patch('copr_common.worker_manager.time.sleep') as sleep:
+        with patch('copr_common.worker_manager.WorkerManager._wait_for_worker_events') as sleep:
             # we can spawn more workers, but queue is empty
             self.worker_manager.run(timeout=0.0001)
             assert sleep.called
@@ -477,8 +572,8 @@ class TestActionWorkerManager(BaseTestWorkerManager):
         # let the task finish
         self.wait_field(self.w0, 'status')
 
-        # check that we don't sleep here (no worker, no task)
-        with patch('copr_common.worker_manager.time.sleep') as sleep:
+        # check that we don't wait here (no worker, no task)
+        with patch('copr_common.worker_manager.WorkerManager._wait_for_worker_events') as sleep:
             self.worker_manager.run(timeout=0.0001)
             assert not sleep.called
 
@@ -525,8 +620,30 @@ class TestActionWorkerManager(BaseTestWorkerManager):
 
         assert len(self.worker_manager.worker_ids()) == 0
 
+    def test_worker_events_refill_slots(self, caplog):
+        """
+        Finished workers announce themselves, so the free slot is immediately
+        re-used, without waiting for the periodic cleanup.
+        """
+        self.setup_tasks(exclude=[3, 4, 5, 6, 7, 8, 9])
+        self.worker_manager.max_workers = 1
+        self.worker_manager.worker_cleanup_period = 1000
+        # Popen() reaps some of the finished processes on its own
+        self.worker_manager._clean_daemon_processes = \
+            lambda: WorkerManager._clean_daemon_processes(self.worker_manager)
+
+        start = time.time()
+        self.worker_manager.run(timeout=60)
+        assert time.time() - start < 30
+        assert self.workers() == []
+        for i in range(3):
+            assert ('root', logging.INFO, 'Finished worker {}{}'.format(
+                self.wprefix, i)) in caplog.record_tuples
+
     def test_max_workers_has_effect(self):
         self.worker_manager.max_workers = 1
+        # finished workers are replaced immediately, keep the first one busy
+        self.worker_manager.task_sleep = 2
         self.worker_manager.run(timeout=1)
         assert self.w0 in self.workers()
         assert self.w1 not in self.workers()
@@ -0,0 +1,144 @@
+"""
+A fake Pulp API server, good enough to test the PulpClient task handling
+"""
+
+import json
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakePulpTask:
+    """
+    A task created by the async (POST/PATCH/DELETE) request
+    """
+    def __init__(self, path, polls, fail):
+        self.href = "/pulp/api/v3/tasks/{0}/".format(uuid.uuid4())
+        self.path = path
+        self.polls = polls
+        self.fail = fail
+
+    def data(self):
+        """
+        Return the task data, as Pulp would do.  Each call moves the task
+        closer to its finish.
+        """
+        if self.polls > 0:
+            self.polls -= 1
+            state = "running"
+        else:
+            state = "failed" if self.fail else "completed"
+        return {
+            "pulp_href": self.href,
+            "state": state,
+            "created_resources": [self.path + "created/"],
+            "error": {"description": "failed"} if state == "failed" else None,
+        }
+
+
+class FakePulpServer:
+    """
+    Start the server in a background thread.  Requests to paths ending with
+    "/sync/" are processed synchronously, all the others create a Pulp task.
+
+    The task for the PATH takes `polls[PATH]` checks (default 0) before it
+    finishes, and it fails `failures[PATH]` times (default 0) before it
+    succeeds.
+    """
+
+    def __init__(self):
+        self.polls = {}
+        self.failures = {}
+        self.tasks = {}
+        # List of (method, path) tuples of all the received requests
+        self.requests = []
+        # Number of tasks asked about in each task list query
+        self.task_queries = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={"poll_interval": 0.05},
+                                       daemon=True)
+
+    @property
+    def base_url(self):
+        """ The URL to put into the PulpClient config """
+        return "http://127.0.0.1:{0}".format(self.server.server_port)
+
+    def start(self):
+        """ Start serving """
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """ Stop serving """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _create_task(self, path):
+        with self.lock:
+            failures = self.failures.get(path, 0)
+            if failures:
+                self.failures[path] = failures - 1
+            task = FakePulpTask(path, self.polls.get(path, 0), bool(failures))
+            self.tasks[task.href] = task
+        return task
+
+    def _query_tasks(self, query):
+        hrefs = query.get("pulp_href__in", [""])[0].split(",")
+        with self.lock:
+            self.task_queries.append(len(hrefs))
+            results = [self.tasks[href].data() for href in hrefs
+                       if href in self.tasks]
+        return {"count": len(results), "next": None, "previous": None,
+                "results": results}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """ Handle one request """
+
+            protocol_version = "HTTP/1.1"
+            # Send the headers and body together (no Nagle delays)
+            wbufsize = -1
+
+            def log_message(self, *_args):  # pylint: disable=arguments-differ
+                pass
+
+            def _reply(self, status, data):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+
+                url = urlparse(self.path)
+                with server.lock:
+                    server.requests.append((self.command, url.path))
+
+                if self.command == "GET":
+                    if re.match(r".*/api/v3/tasks/$", url.path):
+                        self._reply(200, server._query_tasks(parse_qs(url.query)))
+                        return
+                    self._reply(404, {"detail": "Not found."})
+                    return
+
+                if url.path.endswith("/sync/"):
+                    self._reply(201, {"pulp_href": url.path})
+                    return
+
+                task = server._create_task(url.path)
+                self._reply(202, {"task": task.href})
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+        return Handler
@@ -12,6 +12,7 @@ import setproctitle
 
 from copr_common.helpers import nullcontext
 from copr_common.redis_helpers import get_redis_connection
+from copr_common.worker_manager import publish_worker_event
 
 
 class BackgroundWorker:
@@ -50,12 +51,14 @@ class BackgroundWorker:
 
     def redis_set_worker_flag(self, flag, value=1):
         """
-        Set flag in Reids DB for corresponding worker.  NO-OP if there's no
-        redis connection (when run manually).
+        Set flag in Reids DB for corresponding worker, and notify the
+        WorkerManager.  NO-OP if there's no redis connection (when run
+        manually).
         """
         if not self.has_wm:
             return
         self._redis.hset(self.args.worker_id, flag, value)
+        publish_worker_event(self._redis, self.args.worker_id)
 
     def redis_get_worker_flag(self, flag):
         """
@@ -130,6 +133,7 @@ class BackgroundWorker:
         if 'allocated' not in data:
             self.log.error("too slow box, manager thinks we are dead")
             self._redis.delete(self.args.worker_id)
+            publish_worker_event(self._redis, self.args.worker_id)
             return False
 
         # There's still small race on a very slow box (TOCTOU in manager, the
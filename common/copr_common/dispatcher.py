@@ -13,6 +13,23 @@ from copr_common.redis_helpers import get_redis_connection
 from copr_common.worker_manager import WorkerManager
 
 
+class TaskChanges:
+    """
+    Changes in the frontend task queue, as returned by the
+    Dispatcher.get_frontend_task_changes() method.
+
+    :ivar changed: list of new or modified QueueTask objects
+    :ivar removed: list of task IDs that disappeared from the frontend queue
+    :ivar full: True if ``changed`` is the complete task list (e.g. frontend
+        didn't recognize our previous state), and all the other tasks should
+        be forgotten
+    """
+    def __init__(self, changed=None, removed=None, full=False):
+        self.changed = changed or []
+        self.removed = removed or []
+        self.full = full
+
+
 class Dispatcher(multiprocessing.Process):
     """
     1) Fetch tasks from frontend.
@@ -39,6 +56,12 @@ class Dispatcher(multiprocessing.Process):
     # the new set from frontend after get_frontend_tasks() call
     _previous_task_fetch_ids = set()
 
+    # Dispatchers supporting the incremental queue updates (see the
+    # get_frontend_task_changes() method) still download the full task list
+    # once per this period (in seconds), just to be sure we are in sync with
+    # frontend.
+    full_resync_period = 10*60
+
     def __init__(self, opts):
         super().__init__(name=self.task_type + '-dispatcher')
 
@@ -48,6 +71,9 @@ class Dispatcher(multiprocessing.Process):
         self.frontend_client = None
         # list of applied WorkerLimit instances
         self.limits = []
+        # the last known frontend task list, {task.id: task}
+        self._frontend_tasks = {}
+        self._last_full_resync = 0
 
     @classmethod
     def _update_process_title(cls, msg=None):
@@ -63,6 +89,17 @@ class Dispatcher(multiprocessing.Process):
         """
         raise NotImplementedError
 
+    def get_frontend_task_changes(self):
+        """
+        Get the changes in the frontend task list since the last call to
+        get_frontend_tasks() or get_frontend_task_changes(), as a TaskChanges
+        object.  Return None if the full task list needs to be downloaded
+        again by get_frontend_tasks().  This is an optional optimization for
+        dispatchers with large queues, not implemented by default.
+        """
+        _subclass_can_use = (self)
+        return None
+
     def get_cancel_requests_ids(self):
         """
         Return list of QueueTask IDS that should be canceled.
@@ -83,6 +120,41 @@ class Dispatcher(multiprocessing.Process):
             self.log.info("Got new '%s' tasks: %s", self.task_type, new_job_ids)
         self._previous_task_fetch_ids = job_ids
 
+    def _refresh_tasks(self, worker_manager):
+        """
+        Download the (changes in) frontend task list, and fill the
+        worker_manager queue accordingly.
+        """
+        changes = None
+        if time.time() - self._last_full_resync < self.full_resync_period:
+            changes = self.get_frontend_task_changes()
+
+        if changes is None or changes.full:
+            if changes is None:
+                tasks = self.get_frontend_tasks()
+            else:
+                tasks = changes.changed
+            self._last_full_resync = time.time()
+
+            # Even the empty list replaces the queue (e.g. all the tasks are
+            # finished), otherwise the next changes would re-add stale tasks.
+            worker_manager.clean_tasks()
+            self._frontend_tasks = {task.id: task for task in tasks}
+
+            self._print_added_jobs(tasks)
+            for task in tasks:
+                worker_manager.add_task(task)
+            return
+
+        # Apply the changes to the existing queue, in place
+        for task_id in changes.removed:
+            self._frontend_tasks.pop(task_id, None)
+        for task in changes.changed:
+            self._frontend_tasks[task.id] = task
+
+        self._print_added_jobs(self._frontend_tasks.values())
+        worker_manager.refill_tasks(self._frontend_tasks.values())
+
     def run(self):
         """
         Starts the infinite task dispatching process.
@@ -105,13 +177,7 @@ class Dispatcher(multiprocessing.Process):
             self.log.info("getting %ss from frontend", self.task_type)
             start = time.time()
 
-            tasks = self.get_frontend_tasks()
-            if tasks:
-                worker_manager.clean_tasks()
-
-            self._print_added_jobs(tasks)
-            for task in tasks:
-                worker_manager.add_task(task)
+            self._refresh_tasks(worker_manager)
 
             self._update_process_title("getting cancel requests")
             for task_id in self.get_cancel_requests_ids():
@@ -23,7 +23,7 @@ class SafeRequest:
 
     def __init__(self, auth=None, cert=None, log=None,
                  try_indefinitely=False, timeout=30, attempts=None,
-                 user_agent=None):
+                 user_agent=None, session=None):
         # pylint: disable=too-many-positional-arguments
         self.auth = auth
         self.cert = cert
@@ -43,6 +43,9 @@ class SafeRequest:
         self.attempts = attempts
         self.try_indefinitely = try_indefinitely
 
+        # Optional requests.Session, to re-use the HTTP connections
+        self.session = session
+
         # Use package name and version for the user agent
         self.package_name = 'copr-common'
         self.user_agent = user_agent or "copr-common/{version}".format(
@@ -77,9 +80,12 @@ class SafeRequest:
     def _send_request(self, url, method, data=None, **kwargs):
         files = kwargs.get("files", None)
 
+        # File-like objects are sent as they are (streamed) in the body
+        stream = hasattr(data, "read")
+
         headers = kwargs.get("headers", None) or {}
         headers["User-Agent"] = self.user_agent
-        if not files:
+        if not files and not stream:
             headers["content-type"] = "application/json"
 
         try:
@@ -93,8 +99,12 @@ class SafeRequest:
             req_args["timeout"] = self.timeout
             method = method.lower()
             if method in ["post", "put", "patch"]:
-                req_args["data"] = data if files else json.dumps(data)
-            response = requests.request(method, url, **req_args)
+                req_args["data"] = data if files or stream else json.dumps(data)
+            if stream:
+                # The body could be partially read by the previous attempt
+                data.seek(0)
+            response = (self.session or requests).request(method, url,
+                                                          **req_args)
         except requests.RequestException as ex:
             raise RequestRetryError(
                 "Requests error on {}: {}".format(url, str(ex)))
@@ -10,6 +10,24 @@ import logging
 import subprocess
 
 
+def worker_events_channel(worker_prefix):
+    """
+    Name of the Redis pub/sub channel where the background workers announce
+    their state changes to the WorkerManager (with the given worker_prefix).
+    """
+    return "worker_events::{}".format(worker_prefix)
+
+
+def publish_worker_event(redis, worker_id):
+    """
+    Let the WorkerManager know that the background worker ``worker_id``
+    changed its state (e.g. started, finished, or deleted itself), so the
+    manager doesn't have to wait for the periodic cleanup.
+    """
+    worker_prefix = worker_id.rsplit(':', 1)[0]
+    redis.publish(worker_events_channel(worker_prefix), worker_id)
+
+
 class WorkerLimit:
     """
     Limit for the number of tasks being processed concurrently
@@ -18,14 +36,16 @@ class WorkerLimit:
     that should be processed.  Then WorkerManager is completely responsible for
     sorting out the queue, and behave -> respect the given limits.
 
-    WorkerManager implements really stupid algorithm to respect the limits;  we
-    simply drop the task from queue (and continue to the next task) if it was
-    about to exceed any given limit.  This is the only option at this moment
-    because JobQueue doesn't allow us to skip some task, and return to it later.
-    It is not a problem for Copr dispatchers though because we re-add the
-    dropped tasks to JobQueue anyways -- after the next call to the
-    Dispatcher.get_frontend_tasks() method (see "sleeptime" configuration
-    option).
+    Tasks that would exceed some limit are not dropped from the queue.  The
+    queue is split into sub-queues, one per each "limit signature" (the tuple
+    of group() values across all the limits, e.g. the owner, sandbox,
+    architecture, tag, ...).  Once the first task in a sub-queue is blocked by
+    some limit, the whole sub-queue is parked (all its tasks would be blocked
+    as well), and it is re-activated once a worker matching the blocking group
+    is removed (see worker_removed()), or when the limit statistics are
+    re-calculated (see WorkerManager.refill_tasks()).  Therefore picking the
+    next runnable task doesn't depend on the number of blocked tasks in the
+    queue.
 
     Each Limit object works as a statistic counter for the list of _currently
     processed_ tasks (i.e. not queued tasks!).  And we may want to query the
@@ -48,6 +68,21 @@ class WorkerLimit:
         """ Add worker and it's task to statistics.  """
         raise NotImplementedError
 
+    def worker_removed(self, worker_id):
+        """
+        Remove worker from statistics.  Return the group (see group()) the
+        worker was accounted to, None if it wasn't accounted at all.
+        """
+        raise NotImplementedError
+
+    def group(self, task):
+        """
+        Return a hashable key identifying the group of tasks the limit treats
+        the same way.  The check() result must depend only on this value, and
+        None means that the task isn't limited at all.
+        """
+        raise NotImplementedError
+
     def check(self, task):
         """ Check if the task can be added without crossing the limit. """
         raise NotImplementedError
@@ -88,6 +123,12 @@ class PredicateWorkerLimit(WorkerLimit):
             return
         self._refs[worker_id] = True
 
+    def worker_removed(self, worker_id):
+        return self._refs.pop(worker_id, None)
+
+    def group(self, task):
+        return True if self._predicate(task) else None
+
     def check(self, task):
         if not self._predicate(task):
             return True
@@ -117,6 +158,14 @@ class StringCounter:
         else:
             self._counter[string] = 1
 
+    def remove(self, string):
+        """ Remove one occurrence of string from counter """
+        if string not in self._counter:
+            return
+        self._counter[string] -= 1
+        if not self._counter[string]:
+            del self._counter[string]
+
     def count(self, string):
         """ Return number ``string`` occurrences """
         return self._counter.get(string, 0)
@@ -149,11 +198,24 @@ class HashWorkerLimit(WorkerLimit):
         self._refs = {}
 
     def worker_added(self, worker_id, task):
+        if worker_id in self._refs:
+            # already counted
+            return
         # remember it
         group_name = self._refs[worker_id] = self._hasher(task)
         # count it
         self._groups.add(group_name)
 
+    def worker_removed(self, worker_id):
+        if worker_id not in self._refs:
+            return None
+        group_name = self._refs.pop(worker_id)
+        self._groups.remove(group_name)
+        return group_name
+
+    def group(self, task):
+        return self._hasher(task)
+
     def check(self, task):
         group_name = self._hasher(task)
         return self._groups.count(group_name) < self._limit
@@ -168,22 +230,35 @@ class JobQueue():
     Priority "task" queue for WorkerManager.  Taken from:
     https://docs.python.org/3/library/heapq.html#priority-queue-implementation-notes
     The higher the 'priority' is, the later the task is taken.
+
+    Tasks are stored in per-group sub-heaps (see the ``group`` argument of
+    add_task()), and the top-level heap only references the first task of each
+    active group.  The whole group can be parked (temporarily taken out of the
+    game) by park_task(), and re-activated by unpark_group().
     """
 
     def __init__(self, removed='<removed-task>'):
-        self.prio_queue = []             # list of entries arranged in a heap
+        self.prio_queue = []             # heap of [priority, count, group]
+        self.groups = {}                 # group => heap of entries
+        self.parked = set()              # groups currently not considered
         self.entry_finder = {}           # mapping of tasks to entries
         self.removed = removed           # placeholder for a removed task
         self.counter = itertools.count() # unique sequence count
 
-    def add_task(self, task, priority=0):
-        'Add a new task or update the priority of an existing task'
+    def add_task(self, task, priority=0, group=None):
+        """
+        Add a new task or update the priority of an existing task.  Tasks with
+        the same ``group`` are parked and un-parked together.
+        """
         if repr(task) in self.entry_finder:
             self.remove_task(task)
         count = next(self.counter)
-        entry = [priority, count, task]
+        entry = [priority, count, task, group]
         self.entry_finder[repr(task)] = entry
-        heappush(self.prio_queue, entry)
+        heap = self.groups.setdefault(group, [])
+        heappush(heap, entry)
+        if heap[0] is entry and group not in self.parked:
+            heappush(self.prio_queue, [priority, count, group])
 
     def remove_task(self, task):
         'Mark an existing task as removed.  Raise KeyError if not found.'
@@ -194,17 +269,77 @@ class JobQueue():
         Using task id, drop the task from queue.  Raise KeyError if not found.
         """
         entry = self.entry_finder.pop(task_id)
-        entry[-1] = self.removed
+        entry[2] = self.removed
 
-    def pop_task(self):
-        'Remove and return the lowest priority task. Raise KeyError if empty.'
+    def _head_entry(self):
+        """
+        Find the first task entry in the not-parked groups, and drop the
+        obsoleted items from heaps on the way.  Raise KeyError if empty.
+        """
         while self.prio_queue:
-            _priority, _count, task = heappop(self.prio_queue)
-            if task is not self.removed:
-                del self.entry_finder[repr(task)]
-                return task
+            _priority, count, group = self.prio_queue[0]
+            heap = self.groups.get(group)
+            if group in self.parked or not heap:
+                heappop(self.prio_queue)
+                continue
+
+            if heap[0][2] is self.removed:
+                while heap and heap[0][2] is self.removed:
+                    heappop(heap)
+                if not heap:
+                    del self.groups[group]
+                    continue
+                heappush(self.prio_queue, heap[0][:2] + [group])
+                continue
+
+            if heap[0][1] != count:
+                # the group head was changed in the meantime
+                heappop(self.prio_queue)
+                continue
+
+            return heap[0]
         raise KeyError('pop from an empty priority queue')
 
+    def peek_task(self):
+        """
+        Return the lowest priority task, but keep it in queue.  Raise KeyError
+        if empty.
+        """
+        return self._head_entry()[2]
+
+    def pop_task(self):
+        'Remove and return the lowest priority task. Raise KeyError if empty.'
+        _priority, _count, task, group = self._head_entry()
+        heappop(self.prio_queue)
+        heap = self.groups[group]
+        heappop(heap)
+        if heap:
+            heappush(self.prio_queue, heap[0][:2] + [group])
+        else:
+            del self.groups[group]
+        del self.entry_finder[repr(task)]
+        return task
+
+    def park_task(self, task):
+        """
+        Park the whole group the (queued) ``task`` belongs to.  Return the
+        group.  Raise KeyError if the task is not queued.
+        """
+        group = self.entry_finder[repr(task)][3]
+        self.parked.add(group)
+        return group
+
+    def unpark_group(self, group):
+        """
+        Re-activate the previously parked group of tasks.
+        """
+        if group not in self.parked:
+            return
+        self.parked.remove(group)
+        heap = self.groups.get(group)
+        if heap:
+            heappush(self.prio_queue, heap[0][:2] + [group])
+
 
 class QueueTask:
     """
@@ -252,7 +387,11 @@ class WorkerManager():
             something on background or not (== unexpected failure cleanup).
             Fill float value in seconds.
     :cvar worker_cleanup_period: How often should WorkerManager try to cleanup
-            workers? (value is a period in seconds)
+            all the workers? (value is a period in seconds).  Workers that
+            announce their state change (see publish_worker_event()) are
+            checked immediately.
+    :cvar worker_event_wait: How long (in seconds) we at most block waiting
+            for a worker event, when there's nothing else to do.
     """
 
     # pylint: disable=too-many-instance-attributes
@@ -261,6 +400,7 @@ class WorkerManager():
     worker_timeout_start = 30
     worker_timeout_deadcheck = 3*60
     worker_cleanup_period = 3.0
+    worker_event_wait = 1.0
 
 
     def __init__(self, redis_connection=None, max_workers=8, log=None,
@@ -277,7 +417,12 @@ class WorkerManager():
         # to survive server restarts (we adopt the old background workers).
         self._tracked_workers = set(self.worker_ids())
         self._limits = limits or []
+        # (limit index, limit group) => set of parked JobQueue groups
+        self._parked_groups = {}
         self._last_worker_cleanup = None
+        # Redis pub/sub subscription, see _wait_for_worker_events()
+        self._worker_events = None
+        self._notified_workers = set()
 
     def start_task(self, worker_id, task):
         """
@@ -366,6 +511,36 @@ class WorkerManager():
         for limit in self._limits:
             limit.worker_added(worker_id, task)
 
+    def _task_group(self, task):
+        """
+        Tasks with the same limit signature are either all blocked by some
+        limit, or none of them is.
+        """
+        return tuple(limit.group(task) for limit in self._limits)
+
+    def _park_on_limit(self, task):
+        """
+        Check whether the task may be started without crossing any limit.  If
+        not, park the whole task group until the blocking limit frees some
+        capacity, and return True.
+        """
+        for index, limit in enumerate(self._limits):
+            if limit.check(task):
+                continue
+            self.log.debug("Task '%s' parked, limit info: %s",
+                           task.id, limit.info())
+            group = self.tasks.park_task(task)
+            key = (index, limit.group(task))
+            self._parked_groups.setdefault(key, set()).add(group)
+            return True
+        return False
+
+    def _unpark_all(self):
+        for groups in self._parked_groups.values():
+            for group in groups:
+                self.tasks.unpark_group(group)
+        self._parked_groups = {}
+
     def cancel_request_done(self, task):
         """ Report back to frontend that the cancel request was finished. """
 
@@ -385,7 +560,7 @@ class WorkerManager():
 
         self.log.debug("Adding task %s to queue, priority %s", task_id,
                        task.priority)
-        self.tasks.add_task(task, task.priority)
+        self.tasks.add_task(task, task.priority, self._task_group(task))
 
     def _drop_task_id_safe(self, task_id):
         try:
@@ -402,7 +577,7 @@ class WorkerManager():
         """
         self._drop_task_id_safe(task_id)
         worker_id = self.get_worker_id(task_id)
-        if worker_id not in self.worker_ids():
+        if not self.redis.exists(worker_id):
             self.log.info("Cancel request, worker %s is not running", worker_id)
             return False
         self.log.info("Cancel request, worker %s requested to cancel",
@@ -414,7 +589,26 @@ class WorkerManager():
         """
         Return the redis keys representing workers running on background.
         """
-        return self.redis.keys(self.worker_prefix + ':*')
+        return list(self.redis.scan_iter(match=self.worker_prefix + ':*',
+                                         count=1000))
+
+    def _subscribe_worker_events(self):
+        if self._worker_events:
+            return
+        self._worker_events = self.redis.pubsub(ignore_subscribe_messages=True)
+        self._worker_events.subscribe(worker_events_channel(self.worker_prefix))
+
+    def _wait_for_worker_events(self, timeout):
+        """
+        Block until some background worker announces its state change, or
+        until the ``timeout`` (in seconds) elapses.  The announced workers are
+        checked in the next _cleanup_workers() call.
+        """
+        message = self._worker_events.get_message(timeout=timeout)
+        while message:
+            if message["type"] == "message":
+                self._notified_workers.add(message["data"])
+            message = self._worker_events.get_message(timeout=0)
 
     def run(self, timeout=float('inf')):
         """
@@ -429,6 +623,7 @@ class WorkerManager():
         # the worker_cleanup_period is much shorter period than the timeout and
         # the cleanup is done _several_ times during the run() call.
         self._last_worker_cleanup = 0.0
+        self._subscribe_worker_events()
 
         while True:
             now = start_time if now is None else time.time()
@@ -441,35 +636,27 @@ class WorkerManager():
             worker_count = len(self._tracked_workers)
             if worker_count >= self.max_workers:
                 self.log.debug("Worker count on a limit %s", worker_count)
-                time.sleep(1)
+                self._wait_for_worker_events(self.worker_event_wait)
                 continue
 
             # We can allocate some workers, if there's something to do.
             try:
-                task = self.tasks.pop_task()
+                task = self.tasks.peek_task()
             except KeyError:
                 # Empty queue!
                 if worker_count:
                     # It still makes sense to cycle to finish the workers.
                     self.log.debug("No more tasks, waiting for workers")
-                    time.sleep(1)
+                    self._wait_for_worker_events(self.worker_event_wait)
                     continue
                 # Optimization part, nobody is working now, and there's nothing
                 # to do.  Just simply wait till the end of the cycle.
                 break
 
-            break_on_limit = False
-            for limit in self._limits:
-                # just skip this task, it will be processed in the next
-                # run because we keep re-filling the queue
-                if not limit.check(task):
-                    self.log.debug("Task '%s' skipped, limit info: %s",
-                                   task.id, limit.info())
-                    break_on_limit = True
-                    break
-            if break_on_limit:
+            if self._park_on_limit(task):
                 continue
 
+            self.tasks.pop_task()
             self._start_worker(task, now)
 
         self.log.debug("Reaped %s processes", self._clean_daemon_processes())
@@ -489,12 +676,41 @@ class WorkerManager():
         Remove all tasks from queue.
         """
         self.tasks = JobQueue()
+        self._parked_groups = {}
         for limit in self._limits:
             limit.clear()
 
+    def refill_tasks(self, tasks):
+        """
+        Cheaper alternative to the clean_tasks() and add_task() sequence.  Make
+        sure that exactly the given set of tasks is queued (or processed by
+        some worker), but keep the already queued tasks in place.  The limit
+        statistics are re-calculated, so all the parked task groups are
+        re-activated.
+        """
+        for limit in self._limits:
+            limit.clear()
+        self._unpark_all()
+
+        wanted = set()
+        for task in tasks:
+            task_id = repr(task)
+            wanted.add(task_id)
+            entry = self.tasks.entry_finder.get(task_id)
+            if entry and entry[2] is task:
+                continue
+            self.add_task(task)
+
+        for task_id in set(self.tasks.entry_finder) - wanted:
+            self._drop_task_id_safe(task_id)
+
     def _delete_worker(self, worker_id):
         self.redis.delete(worker_id)
         self._tracked_workers.discard(worker_id)
+        for index, limit in enumerate(self._limits):
+            key = (index, limit.worker_removed(worker_id))
+            for group in self._parked_groups.pop(key, []):
+                self.tasks.unpark_group(group)
 
     def _cleanup_workers(self, now):
         """
@@ -505,60 +721,75 @@ class WorkerManager():
         # This method is called very frequently (several hundreds per second,
         # for each of the attempts to start a worker in the self.run() method).
         # Because the likelihood that some of the background workers changed
-        # state is pretty low, we control the frequency of the cleanup here.
+        # state is pretty low, we control the frequency of the full cleanup
+        # here.  Only the workers that notified us are checked in the meantime.
         now = time.time()
         if now - self._last_worker_cleanup < self.worker_cleanup_period:
-            return
+            if not self._notified_workers:
+                return
+            worker_ids = list(self._notified_workers)
+        else:
+            self.log.debug("Trying to clean old workers")
+            self._last_worker_cleanup = time.time()
+            worker_ids = self.worker_ids()
 
-        self.log.debug("Trying to clean old workers")
-        self._last_worker_cleanup = time.time()
+        self._notified_workers = set()
 
-        for worker_id in self.worker_ids():
-            info = self.redis.hgetall(worker_id)
+        # one round-trip for all the workers
+        pipeline = self.redis.pipeline(transaction=False)
+        for worker_id in worker_ids:
+            pipeline.hgetall(worker_id)
 
-            allocated = info.get('allocated', None)
-            if not allocated:
-                # In worker manager, we _always_ add 'allocated' tag when we
-                # start worker.  So this may only happen when worker is
-                # orphaned for some reason (we gave up with him), and it still
-                # touches the database on background.
-                self.log.info("Missing 'allocated' flag for worker %s", worker_id)
-                self._delete_worker(worker_id)
+        for worker_id, info in zip(worker_ids, pipeline.execute()):
+            if not info and worker_id not in self._tracked_workers:
+                # already cleaned up
                 continue
+            self._cleanup_worker(worker_id, info, now)
+
+    def _cleanup_worker(self, worker_id, info, now):
+        allocated = info.get('allocated', None)
+        if not allocated:
+            # In worker manager, we _always_ add 'allocated' tag when we
+            # start worker.  So this may only happen when worker is
+            # orphaned for some reason (we gave up with him), and it still
+            # touches the database on background.
+            self.log.info("Missing 'allocated' flag for worker %s", worker_id)
+            self._delete_worker(worker_id)
+            return
 
-            allocated = float(allocated)
+        allocated = float(allocated)
 
-            if self.has_worker_ended(worker_id, info):
-                # finished worker
-                self.log.info("Finished worker %s", worker_id)
-                self.finish_task(worker_id, info)
-                self._delete_worker(worker_id)
-                continue
+        if self.has_worker_ended(worker_id, info):
+            # finished worker
+            self.log.info("Finished worker %s", worker_id)
+            self.finish_task(worker_id, info)
+            self._delete_worker(worker_id)
+            return
 
-            if info.get('delete'):
-                self.log.warning("worker %s deleted", worker_id)
-                self._delete_worker(worker_id)
-                continue
+        if info.get('delete'):
+            self.log.warning("worker %s deleted", worker_id)
+            self._delete_worker(worker_id)
+            return
 
-            if not self.has_worker_started(worker_id, info):
-                if now - allocated > self.worker_timeout_start:
-                    # This worker failed to start?
-                    self.log.error("worker %s failed to start", worker_id)
-                    self._delete_worker(worker_id)
-                continue
+        if not self.has_worker_started(worker_id, info):
+            if now - allocated > self.worker_timeout_start:
+                # This worker failed to start?
+                self.log.error("worker %s failed to start", worker_id)
+                self._delete_worker(worker_id)
+            return
 
-            checked = info.get('checked', allocated)
+        checked = info.get('checked', allocated)
 
-            if now - float(checked) > self.worker_timeout_deadcheck:
-                self.log.info("checking worker %s", worker_id)
-                self.redis.hset(worker_id, 'checked', now)
-                if self.is_worker_alive(worker_id, info):
-                    continue
-                self.log.error("dead worker %s", worker_id)
+        if now - float(checked) > self.worker_timeout_deadcheck:
+            self.log.info("checking worker %s", worker_id)
+            self.redis.hset(worker_id, 'checked', now)
+            if self.is_worker_alive(worker_id, info):
+                return
+            self.log.error("dead worker %s", worker_id)
 
-                # The worker could finish in the meantime, make sure we
-                # hgetall() once more.
-                self.redis.hset(worker_id, 'delete', 1)
+            # The worker could finish in the meantime, make sure we
+            # hgetall() once more.
+            self.redis.hset(worker_id, 'delete', 1)
 
     def start_daemon_on_background(self, command, env=None):
         """
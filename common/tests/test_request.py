@@ -1,3 +1,4 @@
+import io
 import logging
 from unittest import TestCase
 from requests import RequestException
@@ -30,3 +31,26 @@ class TestStringMethods(TestCase):
             request = SafeRequest(log=self.log)
             request._send_request(self.url, "post", self.data)
         self.assertTrue(post_req.called)
+
+    @mock.patch("copr_common.request.time.sleep")
+    def test_send_stream_with_session(self, _sleep):
+        session = mock.MagicMock()
+        bodies = []
+
+        def _request(_method, _url, data=None, **_kwargs):
+            bodies.append(data.read())
+            response = mock.MagicMock()
+            response.status_code = 503 if len(bodies) == 1 else 200
+            return response
+
+        session.request.side_effect = _request
+        request = SafeRequest(log=self.log, session=session)
+        stream = io.BytesIO(b"raw body")
+        request.put(self.url, stream,
+                    headers={"Content-Type": "application/octet-stream"})
+
+        # the body was rewound before the second attempt
+        assert bodies == [b"raw body", b"raw body"]
+        kwargs = session.request.call_args[1]
+        assert kwargs["data"] is stream
+        assert "content-type" not in kwargs["headers"]
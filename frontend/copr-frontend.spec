@@ -86,7 +86,6 @@ BuildRequires: python3dist(templated-dictionary)
 BuildRequires: python3dist(flask-caching)
 BuildRequires: python3dist(flask-sqlalchemy)
 BuildRequires: python3dist(flask-session)
-BuildRequires: python3dist(flask-whooshee)
 BuildRequires: python3dist(flask-wtf)
 BuildRequires: python3dist(flask-restx)
 BuildRequires: python3-gobject
@@ -106,11 +105,9 @@ BuildRequires: python3dist(redis)
 BuildRequires: python3dist(requests)
 BuildRequires: python3dist(sphinx)
 BuildRequires: python3dist(sphinxcontrib-httpdomain)
-BuildRequires: python3dist(whoosh)
 BuildRequires: python3dist(wtforms) >= 2.2.1
 BuildRequires: python3dist(python-ldap)
 BuildRequires: python3dist(pyyaml)
-BuildRequires: python3dist(backoff) >= 1.9.0
 BuildRequires: python3dist(pygal)
 BuildRequires: redis
 BuildRequires: modulemd-tools >= 0.6
@@ -141,7 +138,6 @@ Requires: python3dist(flask)
 Requires: python3dist(flask-caching)
 Requires: python3dist(flask-sqlalchemy)
 Requires: python3dist(flask-session)
-Requires: python3dist(flask-whooshee)
 Requires: python3dist(flask-wtf)
 Requires: python3dist(flask-restx)
 Requires: python3-gobject
@@ -164,7 +160,6 @@ Requires: python3dist(templated-dictionary)
 Requires: python3dist(wtforms) >= 2.2.1
 Requires: python3dist(pyzmq)
 Requires: python3dist(python-ldap)
-Requires: python3dist(backoff) >= 1.9.0
 Requires: python3dist(pygal)
 Requires: python3dist(xstatic-bootstrap-scss)
 Requires: python3dist(xstatic-datatables)
@@ -243,8 +238,6 @@ install -d %{buildroot}%{_sharedstatedir}/copr/data/openid_store
 install -d %{buildroot}%{_sharedstatedir}/copr/data/openid_store/associations
 install -d %{buildroot}%{_sharedstatedir}/copr/data/openid_store/nonces
 install -d %{buildroot}%{_sharedstatedir}/copr/data/openid_store/temp
-install -d %{buildroot}%{_sharedstatedir}/copr/data/whooshee
-install -d %{buildroot}%{_sharedstatedir}/copr/data/whooshee/copr_user_whoosheer
 install -d %{buildroot}%{_sharedstatedir}/copr/data/srpm_storage
 install -d %{buildroot}%{_sysconfdir}/cron.hourly
 install -d %{buildroot}%{_sysconfdir}/cron.daily
@@ -255,6 +248,7 @@ install -d %{buildroot}%{_libexecdir}
 install -p -m 755 conf/cron.hourly/copr-frontend* %{buildroot}%{_sysconfdir}/cron.hourly
 install -p -m 755 conf/cron.daily/copr-frontend* %{buildroot}%{_sysconfdir}/cron.daily
 install -p -m 755 coprs_frontend/run/copr_dump_db.sh %{buildroot}%{_libexecdir}
+install -p -m 644 conf/copr-frontend-background-jobs.service %{buildroot}%{_unitdir}
 
 cp -a coprs_frontend/* %{buildroot}%{_datadir}/copr/coprs_frontend
 rm -rf %{buildroot}%{_datadir}/copr/coprs_frontend/tests
@@ -303,15 +297,23 @@ install -m0644 -D conf/copr-frontend.sysusers.conf %{buildroot}%{_sysusersdir}/c
 %post
 /bin/systemctl condrestart httpd.service || :
 %systemd_post fm-consumer@copr_messaging.service
+%systemd_post copr-frontend-background-jobs.service
+if [ $1 -eq 1 ]; then
+    # The Pagure flags and the source deletion depend on it, there's only an
+    # hourly cron fallback.  See doc/maintenance/upgrade_notes.rst.
+    /bin/systemctl enable copr-frontend-background-jobs.service >/dev/null 2>&1 || :
+fi
 
 
 %preun
 %systemd_preun fm-consumer@copr_messaging.service
+%systemd_preun copr-frontend-background-jobs.service
 
 
 %postun
 /bin/systemctl condrestart httpd.service || :
 %systemd_postun_with_restart fm-consumer@copr_messaging.service
+%systemd_postun_with_restart copr-frontend-background-jobs.service
 
 
 %files
@@ -328,8 +330,6 @@ install -m0644 -D conf/copr-frontend.sysusers.conf %{buildroot}%{_sysusersdir}/c
 %defattr(-, copr-fe, copr-fe, -)
 %dir %{_sharedstatedir}/copr/data
 %dir %{_sharedstatedir}/copr/data/openid_store
-%dir %{_sharedstatedir}/copr/data/whooshee
-%dir %{_sharedstatedir}/copr/data/whooshee/copr_user_whoosheer
 %dir %{_sharedstatedir}/copr/data/srpm_storage
 
 %ghost %{_sharedstatedir}/copr/data/copr.db
@@ -350,6 +350,7 @@ install -m0644 -D conf/copr-frontend.sysusers.conf %{buildroot}%{_sysusersdir}/c
 %config(noreplace) %{_sysconfdir}/cron.hourly/copr-frontend-optional
 %config(noreplace) %{_sysconfdir}/cron.daily/copr-frontend-optional
 %{_libexecdir}/copr_dump_db.sh
+%{_unitdir}/copr-frontend-background-jobs.service
 %exclude_files flavor
 %exclude_files devel
 %{_sysusersdir}/copr-frontend.conf
@@ -0,0 +1,36 @@
+"""
+Add background_job table
+
+Revision ID: 3b8f1d6e9a24
+Revises: e2a9b7c4d6f1
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8f1d6e9a24'
+down_revision = 'e2a9b7c4d6f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'background_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_type', sa.String(length=50), nullable=False),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.Column('created_on', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0',
+                  nullable=False),
+        sa.Column('run_after', sa.Integer(), server_default='0',
+                  nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('background_job')
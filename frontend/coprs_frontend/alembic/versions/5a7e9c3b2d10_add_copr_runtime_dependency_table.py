@@ -0,0 +1,49 @@
+"""
+Add copr_runtime_dependency table
+
+Revision ID: 5a7e9c3b2d10
+Revises: b4f2c1d9e8a7
+Create Date: 2026-10-18 00:00:00.000000
+
+The table is filled by the 'copr-frontend resolve-runtime-dependencies'
+command, see doc/maintenance/upgrade_notes.rst.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a7e9c3b2d10'
+down_revision = 'b4f2c1d9e8a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'copr_runtime_dependency',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('copr_id', sa.Integer(), nullable=False),
+        sa.Column('dependency', sa.Text(), nullable=False),
+        sa.Column('dependency_copr_id', sa.Integer(), nullable=True),
+        sa.Column('missing', sa.Boolean(), server_default='0',
+                  nullable=False),
+        sa.ForeignKeyConstraint(['copr_id'], ['copr.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['dependency_copr_id'], ['copr.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_copr_runtime_dependency_copr_id'),
+                    'copr_runtime_dependency', ['copr_id'], unique=False)
+    op.create_index(op.f('ix_copr_runtime_dependency_dependency_copr_id'),
+                    'copr_runtime_dependency', ['dependency_copr_id'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_copr_runtime_dependency_dependency_copr_id'),
+                  table_name='copr_runtime_dependency')
+    op.drop_index(op.f('ix_copr_runtime_dependency_copr_id'),
+                  table_name='copr_runtime_dependency')
+    op.drop_table('copr_runtime_dependency')
@@ -0,0 +1,76 @@
+"""
+Add package_scm_source table
+
+Revision ID: 5d2c8e7f4a61
+Revises: 3b8f1d6e9a24
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+import json
+import re
+from urllib.parse import urlparse
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2c8e7f4a61'
+down_revision = '3b8f1d6e9a24'
+branch_labels = None
+depends_on = None
+
+
+def _normalize(url):
+    # keep in sync with helpers.normalize_git_clone_url()
+    if not url:
+        return None
+    parsed = urlparse(re.sub(r'(\.git)?/*$', '', url))
+    return parsed.netloc + parsed.path
+
+
+def upgrade():
+    table = op.create_table(
+        'package_scm_source',
+        sa.Column('package_id', sa.Integer(), nullable=False),
+        sa.Column('clone_url', sa.Text(), nullable=False),
+        sa.Column('committish', sa.Text(), nullable=False),
+        sa.Column('subdirectory', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['package_id'], ['package.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('package_id'),
+    )
+    op.create_index(op.f('ix_package_scm_source_clone_url'),
+                    'package_scm_source', ['clone_url'], unique=False)
+
+    conn = op.get_bind()
+    packages = conn.execute(sa.text(
+        "SELECT id, source_json FROM package "
+        "WHERE source_json LIKE '%clone_url%'"))
+
+    rows = []
+    for package_id, source_json in packages:
+        try:
+            source = json.loads(source_json)
+        except ValueError:
+            continue
+        if not isinstance(source, dict):
+            continue
+        clone_url = _normalize(source.get("clone_url"))
+        if not clone_url:
+            continue
+        rows.append({
+            "package_id": package_id,
+            "clone_url": clone_url,
+            "committish": source.get("committish") or "",
+            "subdirectory": source.get("subdirectory") or "",
+        })
+
+    for i in range(0, len(rows), 1000):
+        op.bulk_insert(table, rows[i:i+1000])
+
+
+def downgrade():
+    op.drop_index(op.f('ix_package_scm_source_clone_url'),
+                  table_name='package_scm_source')
+    op.drop_table('package_scm_source')
@@ -0,0 +1,35 @@
+"""
+Materialize build status and finished columns
+
+Revision ID: b4f2c1d9e8a7
+Revises: e31b4af2468c
+Create Date: 2026-10-18 00:00:00.000000
+
+The columns are filled by the 'copr-frontend backfill-build-status' command,
+see doc/maintenance/upgrade_notes.rst.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4f2c1d9e8a7'
+down_revision = 'e31b4af2468c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('build', sa.Column('status', sa.Integer(), nullable=True))
+    op.add_column('build', sa.Column('finished', sa.Boolean(), nullable=True))
+    op.create_index('build_copr_id_status_id', 'build',
+                    ['copr_id', 'status', 'id'], unique=False)
+    op.create_index('build_finished', 'build', ['finished'], unique=False)
+
+
+def downgrade():
+    op.drop_index('build_finished', table_name='build')
+    op.drop_index('build_copr_id_status_id', table_name='build')
+    op.drop_column('build', 'finished')
+    op.drop_column('build', 'status')
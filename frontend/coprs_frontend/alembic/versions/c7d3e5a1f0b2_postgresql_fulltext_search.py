@@ -0,0 +1,52 @@
+"""
+Full-text search in PostgreSQL instead of Whoosh
+
+Revision ID: c7d3e5a1f0b2
+Revises: 5a7e9c3b2d10
+Create Date: 2026-10-18 00:00:00.000000
+
+The copr.search_vector column is filled by the 'copr-frontend update-indexes'
+command (see doc/maintenance/upgrade_notes.rst), and then updated
+automatically.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d3e5a1f0b2'
+down_revision = '5a7e9c3b2d10'
+branch_labels = None
+depends_on = None
+
+
+TRIGRAM_INDEXES = [
+    ("copr_name_trgm", "copr", "name"),
+    ("package_name_trgm", "package", "name"),
+    ("user_username_trgm", "user", "username"),
+    ("group_name_trgm", "group", "name"),
+]
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column('copr', sa.Column('search_vector', postgresql.TSVECTOR(),
+                                    nullable=True))
+    op.create_index('copr_search_vector', 'copr', ['search_vector'],
+                    unique=False, postgresql_using='gin')
+    for name, table, column in TRIGRAM_INDEXES:
+        op.create_index(name, table, [column], unique=False,
+                        postgresql_using='gin',
+                        postgresql_ops={column: 'gin_trgm_ops'})
+    op.drop_column('copr', 'latest_indexed_data_update')
+
+
+def downgrade():
+    op.add_column('copr', sa.Column('latest_indexed_data_update',
+                                    sa.Integer(), nullable=True))
+    for name, table, _ in TRIGRAM_INDEXES:
+        op.drop_index(name, table_name=table)
+    op.drop_index('copr_search_vector', table_name='copr')
+    op.drop_column('copr', 'search_vector')
@@ -0,0 +1,61 @@
+"""
+Add latest_build_chroot table
+
+Revision ID: e2a9b7c4d6f1
+Revises: c7d3e5a1f0b2
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9b7c4d6f1'
+down_revision = 'c7d3e5a1f0b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'latest_build_chroot',
+        sa.Column('copr_dir_id', sa.Integer(), nullable=False),
+        sa.Column('package_id', sa.Integer(), nullable=False),
+        sa.Column('mock_chroot_id', sa.Integer(), nullable=False),
+        sa.Column('build_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['copr_dir_id'], ['copr_dir.id'],
+                                ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['package_id'], ['package.id'],
+                                ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['mock_chroot_id'], ['mock_chroot.id'],
+                                ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['build_id'], ['build.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('copr_dir_id', 'package_id', 'mock_chroot_id'),
+    )
+
+    op.execute("""
+        INSERT INTO latest_build_chroot
+            (copr_dir_id, package_id, mock_chroot_id, build_id)
+        SELECT build.copr_dir_id, build.package_id, build_chroot.mock_chroot_id,
+               max(build.id)
+        FROM build
+        JOIN build_chroot ON build_chroot.build_id = build.id
+        WHERE build.copr_dir_id IS NOT NULL
+          AND build.package_id IS NOT NULL
+        GROUP BY build.copr_dir_id, build.package_id, build_chroot.mock_chroot_id
+    """)
+
+    op.create_index(op.f('ix_latest_build_chroot_package_id'),
+                    'latest_build_chroot', ['package_id'], unique=False)
+    op.create_index(op.f('ix_latest_build_chroot_build_id'),
+                    'latest_build_chroot', ['build_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_latest_build_chroot_build_id'),
+                  table_name='latest_build_chroot')
+    op.drop_index(op.f('ix_latest_build_chroot_package_id'),
+                  table_name='latest_build_chroot')
+    op.drop_table('latest_build_chroot')
@@ -0,0 +1,62 @@
+"""
+Fill the materialized Build.status and Build.finished columns.
+"""
+
+import click
+from sqlalchemy.orm import joinedload
+
+from coprs import db, models
+
+
+@click.command()
+@click.option(
+    "--batch-size",
+    type=int,
+    metavar="N",
+    show_default=True,
+    default=1000,
+    help="Process (and commit) N builds at once.",
+)
+@click.option(
+    "--all/--missing-only", "recalculate_all",
+    default=False,
+    help="Re-calculate the status for all the builds, not only for those "
+         "that have none stored yet."
+)
+def backfill_build_status(batch_size, recalculate_all):
+    """
+    Calculate the Build.status and Build.finished values from the build
+    chroots, and store them into the database.  Needs to be run once after
+    the database migration that added these columns.
+    """
+    return backfill_build_status_function(batch_size, recalculate_all)
+
+
+def backfill_build_status_function(batch_size, recalculate_all=False):
+    """
+    Store the status of builds in batches of BATCH_SIZE builds
+    """
+    counter = 0
+    last_id = 0
+    while True:
+        query = (
+            models.Build.query
+            .options(joinedload(models.Build.build_chroots))
+            .filter(models.Build.id > last_id)
+            .order_by(models.Build.id)
+        )
+        if not recalculate_all:
+            query = query.filter(models.Build.status.is_(None))
+
+        builds = query.limit(batch_size).all()
+        if not builds:
+            break
+
+        for build in builds:
+            build.update_status()
+        last_id = builds[-1].id
+        counter += len(builds)
+        db.session.commit()
+        print("Updated {} builds (last id={})".format(counter, last_id))
+
+    print("Updated {} builds".format(counter))
@@ -0,0 +1,22 @@
+"""
+Move the download counters buffered in Redis to the database.
+"""
+
+import click
+from coprs.logic.stat_logic import CounterStatLogic
+
+
+@click.command()
+def flush_counter_stats():
+    """
+    Store the download counter increments buffered in Redis (e.g. by the
+    .repo file downloads) into the counter_stat table.
+    """
+    flush_counter_stats_function()
+
+
+def flush_counter_stats_function():
+    """
+    Flush the counters, and report how many of them were updated
+    """
+    print("Flushed {} counters".format(CounterStatLogic.flush_buffered()))
@@ -0,0 +1,56 @@
+"""
+Process the queued background jobs, see BackgroundJobsLogic.
+"""
+
+import time
+
+import click
+
+from coprs import app
+from coprs.logic.background_jobs_logic import BackgroundJobsLogic
+
+
+@click.command()
+@click.option(
+    "--loop/--once",
+    default=False,
+    help="Keep waiting for new jobs (--loop), or exit once the queue is "
+         "empty (--once, default).",
+)
+@click.option(
+    "--sleep",
+    type=int,
+    metavar="SECONDS",
+    show_default=True,
+    default=2,
+    help="With --loop, check the queue every SECONDS when it is empty.",
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    metavar="N",
+    show_default=True,
+    default=100,
+    help="Process (and commit) N jobs at once.",
+)
+def process_background_jobs(loop, sleep, batch_size):
+    """
+    Run the side-effects of the database changes (e.g. the Pagure flag
+    updates), queued in the background_job table.
+    """
+    process_background_jobs_function(loop, sleep, batch_size)
+
+
+def process_background_jobs_function(loop, sleep, batch_size):
+    """
+    Process the jobs in batches of BATCH_SIZE, wait for new jobs with LOOP
+    """
+    while True:
+        processed = BackgroundJobsLogic.process(batch_size)
+        if processed:
+            app.logger.info("Processed %s background jobs", processed)
+        if processed >= batch_size:
+            continue
+        if not loop:
+            break
+        time.sleep(sleep)
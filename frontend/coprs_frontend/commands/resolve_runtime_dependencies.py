@@ -0,0 +1,33 @@
+"""
+Pre-calculate the transitive runtime dependencies of all projects.
+"""
+
+import click
+from coprs import db, models
+from coprs.logic.complex_logic import ComplexLogic
+
+
+@click.command()
+def resolve_runtime_dependencies():
+    """
+    Re-calculate the resolved transitive runtime dependencies of all the
+    projects (normally they are updated automatically when a project
+    changes).  Needs to be run once after the database migration that added
+    the copr_runtime_dependency table.
+    """
+    resolve_runtime_dependencies_function()
+
+
+def resolve_runtime_dependencies_function():
+    """
+    Resolve the dependencies of all projects with some runtime_dependencies
+    """
+    copr_ids = [
+        copr_id for copr_id, in db.session.query(models.Copr.id).filter(
+            models.Copr.deleted.is_(False),
+            models.Copr.runtime_dependencies.isnot(None),
+            models.Copr.runtime_dependencies != "")
+    ]
+    ComplexLogic.update_runtime_dependencies([], copr_ids)
+    db.session.commit()
+    print("Resolved runtime dependencies of {} projects".format(len(copr_ids)))
@@ -1,36 +1,52 @@
+"""
+Re-calculate the full-text search documents for all the projects.
+"""
+
 import click
-import whoosh
-from flask_whooshee import Whooshee
-from coprs import app
-from coprs.whoosheers import CoprWhoosheer, WhoosheeStamp
-from coprs.logic import coprs_logic
+
+from coprs import app, db, models
+from coprs.logic.search_logic import SearchLogic
+
 
 @click.command()
-def update_indexes():
+@click.option(
+    "--batch-size",
+    type=int,
+    metavar="N",
+    show_default=True,
+    default=1000,
+    help="Process (and commit) N projects at once.",
+)
+def update_indexes(batch_size):
     """
-    recreates whoosh indexes for all projects
+    Recreates the search documents for all projects.  The documents are
+    updated automatically together with the projects, so this is only needed
+    once after the database migration, or after a search-logic change.
     """
-    index = Whooshee.get_or_create_index(app, CoprWhoosheer)
-
-    # Our index is huge, if necessary, tweak some performance options
-    # https://whoosh.readthedocs.io/en/latest/batch.html
-    writer = index.writer(procs=4, limitmb=128, multisegment=True)
-    writer.schema = CoprWhoosheer.schema
-
-    app.logger.info("Building cache")
-    coprs = coprs_logic.CoprsLogic.get_multiple(
-        include_unlisted_on_hp=False).all()
-    for i, copr in enumerate(coprs):
-        if i%1000 == 0:
-            app.logger.info("Building cache [%s/%s] - %s",
-                            i, len(coprs), copr.full_name)
-        CoprWhoosheer.insert_copr(writer, copr)
-
-    # Commit changes but don't merge them with the existing index.
-    # Instead, build a new index from scratch.
-    # https://whoosh.readthedocs.io/en/latest/indexing.html#id1
-    app.logger.info("Running commit")
-    writer.commit(mergetype=whoosh.writing.CLEAR)
-
-    app.logger.info("Creating timestamp")
-    WhoosheeStamp.store()
+    return update_indexes_function(batch_size)
+
+
+def update_indexes_function(batch_size):
+    """
+    Update the search documents in batches of BATCH_SIZE projects
+    """
+    counter = 0
+    last_id = 0
+    while True:
+        copr_ids = [
+            copr_id for copr_id, in
+            db.session.query(models.Copr.id)
+            .filter(models.Copr.id > last_id)
+            .order_by(models.Copr.id)
+            .limit(batch_size)
+        ]
+        if not copr_ids:
+            break
+
+        SearchLogic.update_coprs(copr_ids)
+        db.session.commit()
+        last_id = copr_ids[-1]
+        counter += len(copr_ids)
+        app.logger.info("Updated %s projects (last id=%s)", counter, last_id)
+
+    app.logger.info("Updated %s projects", counter)
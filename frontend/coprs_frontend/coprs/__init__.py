@@ -6,14 +6,12 @@ import flask
 
 from werkzeug.routing import RequestRedirect
 from flask_sqlalchemy import SQLAlchemy
-from flask_sqlalchemy.track_modifications import models_committed
 from contextlib import contextmanager
 try:
     from flask_caching import Cache
 except ImportError:
     from flask_cache import Cache
 from flask_session import Session
-from flask_whooshee import Whooshee
 
 from coprs.request import get_request_class
 from redis import StrictRedis
@@ -70,8 +68,6 @@ def db_session_scope():
         db_session.rollback()
         raise
 
-whooshee = Whooshee(app)
-
 profiler_enabled = bool(app.config.get('PROFILER', False))
 try:
     # needs to be installed using pip3
@@ -103,7 +99,7 @@ def setup_profiler(flask_app, enabled):
 import coprs.filters
 import coprs.log
 from coprs.log import setup_log
-import coprs.whoosheers
+import coprs.logic.search_logic
 
 cache = Cache(app, config={
     'CACHE_REDIS_HOST': app.config["REDIS_HOST"],
@@ -245,8 +241,6 @@ app.jinja_env.lstrip_blocks = True
 
 setup_profiler(app, profiler_enabled)
 
-models_committed.connect(coprs.whoosheers.CoprWhoosheer.on_commit, sender=app)
-
 # Serve static files from system-wide RPM files
 @app.route('/system_static/<component>/<path:filename>')
 @app.route('/system_static/<path:filename>')
@@ -7,7 +7,6 @@ class Config(object):
     DATA_DIR = os.path.join(os.path.dirname(__file__), "../../data")
     DATABASE = os.path.join(DATA_DIR, "copr.db")
     OPENID_STORE = os.path.join(DATA_DIR, "openid_store")
-    WHOOSHEE_DIR = os.path.join(DATA_DIR, "whooshee")
     SECRET_KEY = "THISISNOTASECRETATALL"
     BACKEND_PASSWORD = "thisisbackend"
     BACKEND_BASE_URL = "http://copr-be-dev.cloud.fedoraproject.org"
@@ -143,6 +142,10 @@ class Config(object):
     REDIS_HOST = "localhost"
     REDIS_PORT = "6379"
 
+    # Redis database for the download counters buffered between the
+    # 'flush-counter-stats' runs
+    COUNTER_STAT_REDIS_DB = 2
+
     # Caching templates
     # https://flask-caching.readthedocs.io/en/latest/
     # To enable caching set `CACHE_TYPE` to "redis". To disable it (e.g. for
@@ -240,7 +243,6 @@ class UnitTestConfig(Config):
     CSRF_ENABLED = False
     DATABASE = os.path.abspath("tests/data/copr.db")
     OPENID_STORE = os.path.abspath("tests/data/openid_store")
-    WHOOSHEE_DIR = os.path.abspath("tests/data/whooshee")
 
     # SQLAlchemy
     SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.abspath(DATABASE)
@@ -568,6 +568,18 @@ def get_parsed_git_url(url):
     return urlparse(url)
 
 
+def normalize_git_clone_url(url):
+    """
+    Return the clone URL in the form used for comparing the repositories (and
+    stored in the package_scm_source table), i.e. host and path without the
+    scheme, trailing slashes and the .git suffix.
+    """
+    parsed = get_parsed_git_url(url)
+    if not parsed:
+        return None
+    return parsed.netloc + parsed.path
+
+
 class SubdirMatch(object):
     def __init__(self, subdir):
         if not subdir:
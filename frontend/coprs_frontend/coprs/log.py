@@ -44,6 +44,9 @@ class FlaskUserFilter(logging.Filter):
 
     @staticmethod
     def _backend():
+        if not flask.has_request_context():
+            # e.g. 'copr-frontend' commands
+            return None
         auth = flask.request.authorization
         if auth and auth.password == app.config["BACKEND_PASSWORD"]:
             return "backend: {0}".format(flask.request.remote_addr)
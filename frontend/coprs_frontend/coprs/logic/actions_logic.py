@@ -1,7 +1,7 @@
 import json
 import time
 
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, update
 from sqlalchemy.exc import IntegrityError
 
 from copr_common.enums import ActionTypeEnum, BackendResultEnum
@@ -76,6 +76,45 @@ class ActionsLogic(object):
         db.session.add(action)
         return action
 
+    @classmethod
+    def update_states_from_dicts(cls, upd_dicts):
+        """
+        Bulk variant of update_state_from_dict(), UPD_DICTS is a dictionary
+        {action_id: upd_dict}.  The actions are grouped by the new values, and
+        each group is updated by a single UPDATE statement.  Return the list
+        of the updated (existing) action IDs.
+        """
+        existing = [
+            action_id for action_id, in
+            db.session.query(models.Action.id)
+            .filter(models.Action.id.in_(upd_dicts.keys()))
+        ]
+
+        now = time.time()
+        groups = {}
+        for action_id in existing:
+            upd_dict = upd_dicts[action_id]
+            values = {}
+            for attr in ["result", "message"]:
+                value = upd_dict.get(attr, None)
+                if value:
+                    values[attr] = value
+            if upd_dict.get('result', None) in [BackendResultEnum("success"),
+                                                BackendResultEnum("failure")]:
+                values["ended_on"] = now
+            if values:
+                key = tuple(sorted(values.items()))
+                groups.setdefault(key, []).append(action_id)
+
+        for values, action_ids in groups.items():
+            db.session.execute(
+                update(models.Action)
+                .where(models.Action.id.in_(action_ids))
+                .values(dict(values))
+                .execution_options(synchronize_session="fetch")
+            )
+        return existing
+
     @classmethod
     def send_createrepo(cls, copr, dirnames=None, chroots=None, devel=None,
                         priority=None, reason=None):
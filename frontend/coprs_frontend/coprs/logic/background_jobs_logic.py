@@ -0,0 +1,101 @@
+"""
+Queue of the side-effects that don't have to block the HTTP request, e.g. the
+Pagure flag updates after a build state change.  The jobs are stored in the
+background_job table in the same transaction as the change itself, and they
+are processed by the 'copr-frontend process-background-jobs' command.
+"""
+
+import json
+import time
+
+from sqlalchemy import delete
+
+from coprs import app
+from coprs import db
+from coprs import models
+
+
+log = app.logger
+
+
+class BackgroundJobsLogic:
+    """
+    Add and process the background jobs
+    """
+
+    # Give up the failing job after this number of attempts
+    MAX_ATTEMPTS = 5
+    # Seconds to wait before the first re-try, the delay doubles each time
+    RETRY_DELAY = 60
+
+    @classmethod
+    def add(cls, job_type, **data):
+        """
+        Queue a new JOB_TYPE job, DATA are the keyword arguments for the job
+        handler (JSON-serializable).
+        """
+        job = models.BackgroundJob(
+            job_type=job_type,
+            data=json.dumps(data, sort_keys=True),
+            created_on=int(time.time()),
+        )
+        db.session.add(job)
+        return job
+
+    @staticmethod
+    def _handlers():
+        # pylint: disable=import-outside-toplevel,cyclic-import
+        from coprs.logic.builds_logic import BuildsLogic
+        return {
+            "pagure_flag": BuildsLogic.pagure_flag_by_id,
+            "delete_local_source": BuildsLogic.delete_storage_tmpdir,
+        }
+
+    @classmethod
+    def process(cls, limit=100):
+        """
+        Run (at most LIMIT of) the jobs that are due, and return the number
+        of processed jobs.  The same jobs (same type and arguments, e.g. the
+        Pagure flag for one build queued by several state changes) are run
+        only once.  Concurrently running processors skip each other's jobs.
+        """
+        now = int(time.time())
+        jobs = (
+            models.BackgroundJob.query
+            .filter(models.BackgroundJob.run_after <= now)
+            .order_by(models.BackgroundJob.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+        groups = {}
+        for job in jobs:
+            groups.setdefault((job.job_type, job.data), []).append(job)
+
+        handlers = cls._handlers()
+        done_ids = []
+        for (job_type, data), same_jobs in groups.items():
+            try:
+                handlers[job_type](**json.loads(data))
+            except Exception:  # pylint: disable=broad-except
+                retry = same_jobs.pop(0)
+                retry.attempts += 1
+                if retry.attempts < cls.MAX_ATTEMPTS:
+                    log.exception("Background job %s (%s) failed, re-trying "
+                                  "later", retry.id, job_type)
+                    retry.run_after = now + cls.RETRY_DELAY * 2 ** (retry.attempts - 1)
+                else:
+                    log.exception("Background job %s (%s) failed, giving up",
+                                  retry.id, job_type)
+                    done_ids.append(retry.id)
+            done_ids += [job.id for job in same_jobs]
+
+        if done_ids:
+            db.session.execute(
+                delete(models.BackgroundJob)
+                .where(models.BackgroundJob.id.in_(done_ids))
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+        return len(jobs)
@@ -2,14 +2,11 @@
 Methods for working with build Batches.
 """
 
-import contextlib
 import anytree
-import backoff
 
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.sql import text
 from coprs import app, db, cache
 from coprs.helpers import WorkList
+from coprs.logic.helpers import LOCK_BUILD_BATCH, advisory_xact_lock
 from coprs.models import Batch, Build
 from coprs.exceptions import BadRequest
 import coprs.logic.builds_logic as bl
@@ -18,36 +15,6 @@ import coprs.logic.builds_logic as bl
 log = app.logger
 
 
-@backoff.on_exception(backoff.expo, SQLAlchemyError, max_time=20, logger=log)
-def _lock_table(table):
-    # It seems that every database has different locking commands and we
-    # don't care about anything else than PostgreSQL.
-    if db.engine.name != "postgresql":
-        return
-
-    # EXCLUSIVE mode locks the whole table for write operations
-    # (while reading is not blocked) until the end of the transaction
-    # (commit / rollback)
-    with db.engine.connect() as connection:
-        connection.execute(text("LOCK TABLE {} IN EXCLUSIVE MODE;".format(
-            # https://docs.sqlalchemy.org/en/13/core/internals.html#sqlalchemy.sql.compiler.IdentifierPreparer.quote
-            db.engine.dialect.identifier_preparer.quote(table)
-        )))
-
-
-@contextlib.contextmanager
-def locked_table(table_name, reason="not specified"):
-    """
-    Create a sub-transaction with locked table (PG only).  Use with with.
-    """
-    with db.session.begin_nested():
-        log.debug("Locking table %s (%s)", table_name, reason)
-        _lock_table(table_name)
-        log.debug("Lock acquired (%s)", reason)
-        yield
-    log.debug("Lock released (%s)", reason)
-
-
 class BatchesLogic:
     """ Batch logic entrypoint """
 
@@ -61,26 +28,26 @@ class BatchesLogic:
         """
 
         # We don't want to create a new batch if one already exists, but there's
-        # the concurrency problem so we need to lock the build instance for
-        # writing.
-        build = db.session.get(Build, build_id)
+        # the concurrency problem so we need to lock the build instance.  The
+        # concurrent requests for the same build wait here till we commit, and
+        # then they (re-)load the build with the batch assigned.
+        log.debug("Locking build %s for batch assignment", build_id)
+        advisory_xact_lock(LOCK_BUILD_BATCH, build_id)
+        build = db.session.get(Build, build_id, populate_existing=True)
         if not build:
             raise BadRequest("Build {} doesn't exist".format(build_id))
 
+        # Somewhat pedantically, the query for 'build.finished' and
+        # 'build.batch.finished' is still a bit racy (backend workers may
+        # asynchronously make the build/batch finished, and we may still
+        # assign some new build to a just finished batch).  See #2107.
         error = build.batching_user_error(requestor, modify)
         if error:
             raise BadRequest(error)
 
-        # Somewhat pedantically, we _should_ lock the batch (if exists)
-        # here because the query for 'build.finished' and
-        # 'build.batch.finished' is a bit racy (backend workers may
-        # asynchronously make the build/batch finished, and we may still
-        # assign some new build to a just finished batch).
-        # Or #2107 can happen.
-        with locked_table("batch", "for_build_id={}".format(build_id)):
-            if not build.batch:
-                build.batch = Batch()
-                db.session.add(build.batch)
+        if not build.batch:
+            build.batch = Batch()
+            db.session.add(build.batch)
 
         return build.batch
 
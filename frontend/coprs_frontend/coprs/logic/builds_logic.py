@@ -1,5 +1,6 @@
 import tempfile
 import shutil
+import itertools
 import json
 import os
 import pprint
@@ -9,7 +10,11 @@ import requests
 from sqlalchemy.sql import text
 from sqlalchemy.sql.expression import not_
 from sqlalchemy.orm import joinedload, selectinload, load_only, contains_eager
-from sqlalchemy import func, desc, or_, and_
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import func, desc, or_, and_, case, literal, select, union_all
+from sqlalchemy import delete, insert, inspect, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.event import listens_for
 from sqlalchemy.sql import false,true
 from werkzeug.utils import secure_filename
 from sqlalchemy import bindparam, Integer, String
@@ -37,6 +42,7 @@ from coprs.exceptions import (
 from coprs.logic import coprs_logic
 from coprs.logic import users_logic
 from coprs.logic.actions_logic import ActionsLogic
+from coprs.logic.background_jobs_logic import BackgroundJobsLogic
 from coprs.logic.dist_git_logic import DistGitLogic
 from coprs.models import BuildChroot
 from coprs.logic.coprs_logic import MockChrootsLogic
@@ -44,7 +50,11 @@ from coprs.logic.packages_logic import PackagesLogic
 from coprs.logic.batches_logic import BatchesLogic
 from coprs.measure import checkpoint
 
-from .helpers import get_graph_parameters
+from .helpers import (
+    LOCK_PACKAGE_REBUILD,
+    advisory_xact_lock,
+    get_graph_parameters,
+)
 log = app.logger
 
 
@@ -209,40 +219,134 @@ class BuildsLogic(object):
             res = connection.execute(query, params)
         return res.first().result
 
+    @classmethod
+    def get_jobs_buckets(cls, start, step, steps, with_pending=True):
+        """
+        Count the pending and running jobs in STEPS consecutive time buckets
+        of STEP seconds, beginning at START.  For each bucket, the numbers are
+        the same as get_pending_jobs_bucket() and get_running_jobs_bucket()
+        return, but all the buckets are calculated by a single query.
+
+        Each job is a time interval (e.g. from submitted_on to started_on for
+        pending jobs).  The database only groups the jobs by the first and the
+        last bucket they overlap, and the per-bucket numbers are then summed
+        up from these (usually few) groups.
+        """
+        end = start + steps * step
+
+        def _first_bucket(column):
+            return case((column <= start, 0),
+                        else_=(column - start) // step)
+
+        def _last_bucket(column):
+            # NULL means "still in this state", i.e. up to the last bucket
+            return case((column.is_(None), steps - 1),
+                        else_=(column - start - 1) // step)
+
+        running_query = (
+            select(
+                literal("running").label("kind"),
+                _first_bucket(models.BuildChroot.started_on).label("first"),
+                _last_bucket(models.BuildChroot.ended_on).label("last"))
+            .where(models.BuildChroot.started_on < end)
+            .where(or_(models.BuildChroot.ended_on > start,
+                       and_(models.BuildChroot.ended_on.is_(None),
+                            models.BuildChroot.status == StatusEnum("running"))))
+        )
+        queries = [running_query]
+
+        if with_pending:
+            pending_query = (
+                select(
+                    literal("pending").label("kind"),
+                    _first_bucket(models.Build.submitted_on).label("first"),
+                    _last_bucket(models.BuildChroot.started_on).label("last"))
+                .select_from(models.BuildChroot)
+                .join(models.Build,
+                      models.Build.id == models.BuildChroot.build_id)
+                .where(models.Build.submitted_on < end)
+                .where(or_(models.BuildChroot.started_on > start,
+                           and_(models.BuildChroot.started_on.is_(None),
+                                models.BuildChroot.status == StatusEnum("pending"))))
+                .where(not_(models.Build.canceled))
+            )
+            queries.append(pending_query)
+
+        jobs = union_all(*queries).subquery()
+        query = (
+            select(jobs.c.kind, jobs.c.first, jobs.c.last, func.count())
+            .group_by(jobs.c.kind, jobs.c.first, jobs.c.last)
+        )
+
+        # difference arrays, +1 where the interval starts, -1 after it ends
+        diffs = {"pending": [0] * (steps + 1), "running": [0] * (steps + 1)}
+        for kind, first, last, count in db.session.execute(query):
+            first = max(first, 0)
+            last = min(last, steps - 1)
+            if first > last:
+                continue
+            diffs[kind][first] += count
+            diffs[kind][last + 1] -= count
+
+        result = {}
+        for kind, diff in diffs.items():
+            result[kind] = list(itertools.accumulate(diff[:steps]))
+        return result
+
     @classmethod
     def get_cached_graph_data(cls, params):
-        data = {
-            "pending": [],
-            "running": [],
-        }
+        """
+        Return the BuildsStatistics cached for the graph PARAMS, as
+        a {time: (pending, running)} dictionary.
+        """
         result = models.BuildsStatistics.query\
             .filter(models.BuildsStatistics.stat_type == params["type"])\
             .filter(models.BuildsStatistics.time >= params["start"])\
             .filter(models.BuildsStatistics.time <= params["end"])\
             .order_by(models.BuildsStatistics.time)
-
-        for row in result:
-            data["pending"].append(row.pending)
-            data["running"].append(row.running)
-
-        return data
+        return {row.time: (row.pending, row.running) for row in result}
+
+    @classmethod
+    def get_graph_data(cls, params, with_pending=True):
+        """
+        Return {"pending": [...], "running": [...]} with numbers for each of the
+        graph steps.  The numbers are taken from the BuildsStatistics cache,
+        the missing ones are calculated (at once) and cached.
+        """
+        cached = cls.get_cached_graph_data(params)
+        times = [params["start"] + i * params["step"]
+                 for i in range(params["steps"])]
+        missing = [stamp for stamp in times if stamp not in cached]
+
+        if missing:
+            first = missing[0]
+            steps = (missing[-1] - first) // params["step"] + 1
+            buckets = cls.get_jobs_buckets(first, params["step"], steps,
+                                           with_pending=with_pending)
+            statistics = []
+            for stamp in missing:
+                i = (stamp - first) // params["step"]
+                cached[stamp] = (buckets["pending"][i], buckets["running"][i])
+                statistics.append(models.BuildsStatistics(
+                    time=stamp,
+                    stat_type=params["type"],
+                    pending=cached[stamp][0],
+                    running=cached[stamp][1],
+                ))
+            cls.cache_graph_data(statistics)
+
+        return {
+            "pending": [cached[stamp][0] for stamp in times],
+            "running": [cached[stamp][1] for stamp in times],
+        }
 
     @classmethod
     def get_task_graph_data(cls, type):
         data = [["pending"], ["running"], ["avg running"], ["time"]]
         params = get_graph_parameters(type)
-        cached_data = cls.get_cached_graph_data(params)
-        data[0].extend(cached_data["pending"])
-        data[1].extend(cached_data["running"])
-
-        for i in range(len(data[0]) - 1, params["steps"]):
-            step_start = params["start"] + i * params["step"]
-            step_end = step_start + params["step"]
-            pending = cls.get_pending_jobs_bucket(step_start, step_end)
-            running = cls.get_running_jobs_bucket(step_start, step_end)
-            data[0].append(pending)
-            data[1].append(running)
-            cls.cache_graph_data(type, time=step_start, pending=pending, running=running)
+        graph_data = cls.get_graph_data(params)
+        data[0].extend(graph_data["pending"])
+        data[1].extend(graph_data["running"])
 
         running_total = 0
         for i in range(1, params["steps"] + 1):
@@ -259,34 +363,17 @@ class BuildsLogic(object):
     def get_small_graph_data(cls, type):
         data = [[""]]
         params = get_graph_parameters(type)
-        cached_data = cls.get_cached_graph_data(params)
-        data[0].extend(cached_data["running"])
-
-        for i in range(len(data[0]) - 1, params["steps"]):
-            step_start = params["start"] + i * params["step"]
-            step_end = step_start + params["step"]
-            running = cls.get_running_jobs_bucket(step_start, step_end)
-            data[0].append(running)
-            cls.cache_graph_data(type, time=step_start, running=running)
-
+        graph_data = cls.get_graph_data(params, with_pending=False)
+        data[0].extend(graph_data["running"])
         return data
 
     @classmethod
-    def cache_graph_data(cls, type, time, pending=0, running=0):
-        result = models.BuildsStatistics.query\
-                .filter(models.BuildsStatistics.stat_type == type)\
-                .filter(models.BuildsStatistics.time == time).first()
-        if result:
-            return
-
+    def cache_graph_data(cls, statistics):
+        """
+        Store the list of calculated BuildsStatistics, in one transaction
+        """
         try:
-            cached_data = models.BuildsStatistics(
-                time = time,
-                stat_type = type,
-                running = running,
-                pending = pending
-            )
-            db.session.add(cached_data)
+            db.session.add_all(statistics)
             db.session.commit()
         except IntegrityError: # other process already calculated the graph data and cached it
             db.session.rollback()
@@ -453,6 +540,52 @@ class BuildsLogic(object):
             query = query.filter(models.Build.is_background == (true() if background else false()))
         return query
 
+    @classmethod
+    def get_pending_srpm_build_task_rows(cls):
+        """
+        Cheap variant of get_pending_srpm_build_tasks(data_type="for_backend"),
+        no ORM objects are constructed.  Return the list of (build_id,
+        is_background, batch_id) tuples.
+        """
+        return (
+            db.session.query(
+                models.Build.id,
+                models.Build.is_background,
+                models.Build.batch_id,
+            )
+            .join(models.Copr)
+            .filter(models.Build.canceled == false())
+            .filter(models.Build.source_status.in_(
+                cls._todo_states("for_backend")))
+            .order_by(models.Build.is_background.asc(), models.Build.id.asc())
+            .all()
+        )
+
+    @classmethod
+    def get_pending_build_task_rows(cls):
+        """
+        Cheap variant of get_pending_build_tasks(data_type="for_backend"), no
+        ORM objects are constructed.  Return the list of (build_chroot_id,
+        build_id, mock_chroot_id, tags_raw, is_background, batch_id) tuples.
+        """
+        return (
+            db.session.query(
+                models.BuildChroot.id,
+                models.BuildChroot.build_id,
+                models.BuildChroot.mock_chroot_id,
+                models.BuildChroot.tags_raw,
+                models.Build.is_background,
+                models.Build.batch_id,
+            )
+            .join(models.Build)
+            .join(models.CoprDir)
+            .filter(models.Build.canceled == false())
+            .filter(models.BuildChroot.status.in_(
+                cls._todo_states("for_backend")))
+            .order_by(models.Build.is_background.asc(), models.Build.id.asc())
+            .all()
+        )
+
     @classmethod
     def get_build_task(cls, task_id):
         try:
@@ -994,6 +1127,11 @@ class BuildsLogic(object):
         (only submitted_by string).
         """
 
+        # Serialize the concurrent rebuilds of the same package (e.g. one
+        # event delivered to multiple consumers), so the builds are submitted
+        # in order.  Rebuilds of other packages are not blocked.
+        advisory_xact_lock(LOCK_PACKAGE_REBUILD, package.id)
+
         source_dict = package.source_json_dict
         source_dict.update(source_dict_update)
         source_json = json.dumps(source_dict)
@@ -1052,17 +1190,24 @@ class BuildsLogic(object):
     def delete_local_source(cls, build):
         """
         Deletes the locally stored data for build purposes.  This is typically
-        uploaded srpm file, uploaded spec file or webhook POST content.
+        uploaded srpm file, uploaded spec file or webhook POST content.  The
+        directory is removed by a background job.
         """
         # is it hosted on the copr frontend?
         data = json.loads(build.source_json)
         if 'tmp' in data:
-            tmp = data["tmp"]
-            storage_path = app.config["STORAGE_DIR"]
-            try:
-                shutil.rmtree(os.path.join(storage_path, tmp))
-            except OSError:
-                log.exception("Can't remove tmpdir '%s'", tmp)
+            BackgroundJobsLogic.add("delete_local_source", tmp=data["tmp"])
+
+    @classmethod
+    def delete_storage_tmpdir(cls, tmp):
+        """
+        Remove the TMP directory from STORAGE_DIR, see delete_local_source().
+        """
+        storage_path = app.config["STORAGE_DIR"]
+        try:
+            shutil.rmtree(os.path.join(storage_path, tmp))
+        except OSError:
+            log.exception("Can't remove tmpdir '%s'", tmp)
 
 
     @classmethod
@@ -1198,6 +1343,117 @@ class BuildsLogic(object):
         cls.process_update_callback(build)
         db.session.add(build)
 
+    @classmethod
+    def update_states_from_dicts(cls, upd_dicts):
+        """
+        Bulk variant of update_state_from_dict(), UPD_DICTS is a dictionary
+        {build_id: upd_dict}.  The simple (and most frequent) build chroot
+        state changes, e.g. to "running", are grouped by the target state and
+        done by a single UPDATE statement per group.  Return the list of the
+        updated (existing) build IDs.
+        """
+        builds = (
+            models.Build.query
+            .options(selectinload(models.Build.build_chroots)
+                     .joinedload(models.BuildChroot.mock_chroot),
+                     joinedload(models.Build.copr),
+                     joinedload(models.Build.package))
+            .filter(models.Build.id.in_(upd_dicts.keys()))
+            .all()
+        )
+
+        by_status = {}
+        for build in builds:
+            upd_dict = upd_dicts[build.id]
+            build_chroot = cls._simple_state_change(build, upd_dict)
+            if build_chroot:
+                by_status.setdefault(upd_dict["status"], []).append(
+                    (build_chroot, upd_dict))
+            else:
+                cls.update_state_from_dict(build, upd_dict)
+
+        for status, changes in by_status.items():
+            cls._update_chroot_states(status, changes)
+
+        return [build.id for build in builds]
+
+    @classmethod
+    def _simple_state_change(cls, build, upd_dict):
+        """
+        Return the BuildChroot if the UPD_DICT only moves it to a non-final
+        state (no results to store, no package to assign, etc.), else None.
+        """
+        if "chroot" not in upd_dict or "status" not in upd_dict:
+            return None
+        if str(upd_dict.get("task_id")) == str(build.task_id):
+            return None
+        if upd_dict["status"] in cls.terminal_states:
+            return None
+        if not build.package and upd_dict.get("pkg_name"):
+            return None
+        matching = [ch for ch in build.build_chroots
+                    if ch.name == upd_dict["chroot"]]
+        if len(matching) != 1:
+            return None
+        return matching[0]
+
+    @classmethod
+    def _update_chroot_states(cls, status, changes):
+        """
+        Move the build chroots in CHANGES, list of (build_chroot, upd_dict)
+        pairs, to the STATUS (see update_state_from_dict() for the semantics).
+        """
+        table = models.BuildChroot.__table__
+        now = time.time()
+
+        status_ids = []
+        params = []
+        for build_chroot, upd_dict in changes:
+            if build_chroot.status not in cls.terminal_states:
+                status_ids.append(build_chroot.id)
+
+            result_dir = upd_dict.get("result_dir", "")
+            started_on = build_chroot.started_on
+            if status == StatusEnum("starting"):
+                started_on = upd_dict.get("started_on") or now
+            if (result_dir, started_on) != (build_chroot.result_dir,
+                                            build_chroot.started_on):
+                params.append({"b_id": build_chroot.id,
+                               "b_result_dir": result_dir,
+                               "b_started_on": started_on})
+                set_committed_value(build_chroot, "result_dir", result_dir)
+                set_committed_value(build_chroot, "started_on", started_on)
+
+        if status_ids:
+            db.session.execute(
+                update(table)
+                .where(table.c.id.in_(status_ids))
+                .values(status=status)
+            )
+        if params:
+            db.session.execute(
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(result_dir=bindparam("b_result_dir"),
+                        started_on=bindparam("b_started_on")),
+                params,
+            )
+
+        status_ids = set(status_ids)
+        for build_chroot, upd_dict in changes:
+            build = build_chroot.build
+            # Keep the loaded objects in sync with the database, and store
+            # the re-calculated Build.status.
+            if build_chroot.id in status_ids:
+                set_committed_value(build_chroot, "status", status)
+            for attr in ["built_packages", "srpm_url", "pkg_version"]:
+                value = upd_dict.get(attr, None)
+                if value:
+                    setattr(build, attr, value)
+            build.update_status()
+            cls.process_update_callback(build)
+            db.session.add(build)
+
     @classmethod
     def process_update_callback(cls, build):
         parsed_git_url = helpers.get_parsed_git_url(build.copr.scm_repo_url)
@@ -1207,12 +1463,30 @@ class BuildsLogic(object):
         if build.update_callback == 'pagure_flag_pull_request':
             api_url = 'https://{0}/api/0/{1}/pull-request/{2}/flag'.format(
                 parsed_git_url.netloc, parsed_git_url.path, build.scm_object_id)
-            return cls.pagure_flag(build, api_url)
 
         elif build.update_callback == 'pagure_flag_commit':
             api_url = 'https://{0}/api/0/{1}/c/{2}/flag'.format(
                 parsed_git_url.netloc, parsed_git_url.path, build.scm_object_id)
-            return cls.pagure_flag(build, api_url)
+
+        else:
+            return
+
+        if build.id is None:
+            # the job needs the ID of the just created build
+            db.session.flush()
+        BackgroundJobsLogic.add("pagure_flag", build_id=build.id,
+                                api_url=api_url)
+
+    @classmethod
+    def pagure_flag_by_id(cls, build_id, api_url):
+        """
+        The "pagure_flag" background job, report the current state of the
+        build to Pagure.
+        """
+        build = db.session.get(models.Build, build_id)
+        if not build:
+            return
+        cls.pagure_flag(build, api_url)
 
     @classmethod
     def pagure_flag(cls, build, api_url):
@@ -1472,12 +1746,10 @@ class BuildsLogic(object):
 
     @classmethod
     def filter_is_finished(cls, query, is_finished):
-        # todo: check that ended_on is set correctly for all cases
-        # e.g.: failed dist-git import, cancellation
-        if is_finished:
-            return query.join(models.BuildChroot).filter(models.BuildChroot.ended_on.isnot(None))
-        else:
-            return query.join(models.BuildChroot).filter(models.BuildChroot.ended_on.is_(None))
+        """
+        Filter the builds by the (materialized) Build.finished column
+        """
+        return query.filter(models.Build.finished.is_(bool(is_finished)))
 
     @classmethod
     def filter_by_group_name(cls, query, group_name):
@@ -1710,17 +1982,154 @@ class BuildChrootResultsLogic:
         return query.filter(models.BuildChrootResult.arch == arch)
 
 
+LATEST_BUILD_CHROOT_SESSION_KEY = "copr_latest_build_chroot_changed"
+
+
+@listens_for(db.session, "before_flush")
+def schedule_latest_build_chroot_update(session, _flush_context, _instances):
+    """
+    Remember the changes affecting the LatestBuildChroot table.  New
+    BuildChroots (or BuildChroots of Builds moved to a different Package or
+    CoprDir) may become the latest ones.  If a referenced Build is deleted
+    or moved, the latest BuildChroots for its Package need to be found again.
+    """
+    build_chroots = set()
+    stale_build_ids = set()
+
+    for obj in session.new:
+        if isinstance(obj, models.BuildChroot):
+            build_chroots.add(obj)
+
+    for obj in session.dirty:
+        if not isinstance(obj, models.Build):
+            continue
+        attrs = inspect(obj).attrs
+        if any(attrs[name].history.has_changes()
+               for name in ["package", "package_id", "copr_dir", "copr_dir_id"]):
+            build_chroots.update(obj.build_chroots)
+            stale_build_ids.add(obj.id)
+
+    for obj in session.deleted:
+        if isinstance(obj, models.Build):
+            stale_build_ids.add(obj.id)
+        elif isinstance(obj, models.BuildChroot):
+            stale_build_ids.add(obj.build_id)
+
+    stale_build_ids.discard(None)
+    packages = set()
+    if stale_build_ids:
+        packages = set(
+            session.query(models.LatestBuildChroot.copr_dir_id,
+                          models.LatestBuildChroot.package_id)
+            .filter(models.LatestBuildChroot.build_id.in_(stale_build_ids))
+            .distinct()
+        )
+
+    if build_chroots or packages:
+        pending = session.info.setdefault(LATEST_BUILD_CHROOT_SESSION_KEY,
+                                          (set(), set()))
+        pending[0].update(build_chroots)
+        pending[1].update(packages)
+
+
+@listens_for(db.session, "after_flush_postexec")
+def update_latest_build_chroot(session, _flush_context):
+    """
+    Update the LatestBuildChroot table according to the changes collected in
+    before_flush.
+    """
+    pending = session.info.pop(LATEST_BUILD_CHROOT_SESSION_KEY, None)
+    if not pending:
+        return
+    build_chroots, packages = pending
+    build_chroots = [bch for bch in build_chroots
+                     if not (inspect(bch).deleted or inspect(bch).detached)]
+    BuildsMonitorLogic.update_latest_build_chroots(build_chroots, packages)
+
+
 class BuildsMonitorLogic(object):
+    @classmethod
+    def update_latest_build_chroots(cls, build_chroots, packages):
+        """
+        Maintain the LatestBuildChroot table.  The latest BuildChroots for
+        the PACKAGES, a set of (copr_dir_id, package_id) pairs, are searched
+        again in the build table.  The BUILD_CHROOTS only replace the current
+        LatestBuildChroot entries if they belong to newer builds.
+        """
+        table = models.LatestBuildChroot.__table__
+        packages = {pair for pair in packages if None not in pair}
+        if packages:
+            pairs = tuple_(table.c.copr_dir_id, table.c.package_id)
+            db.session.execute(delete(table).where(pairs.in_(packages)))
+            latest = (
+                select(models.Build.copr_dir_id, models.Build.package_id,
+                       models.BuildChroot.mock_chroot_id,
+                       func.max(models.Build.id))
+                .join(models.BuildChroot,
+                      models.BuildChroot.build_id == models.Build.id)
+                .where(tuple_(models.Build.copr_dir_id, models.Build.package_id)
+                       .in_(packages))
+                .group_by(models.Build.copr_dir_id, models.Build.package_id,
+                          models.BuildChroot.mock_chroot_id)
+            )
+            db.session.execute(
+                insert(table).from_select(
+                    ["copr_dir_id", "package_id", "mock_chroot_id", "build_id"],
+                    latest))
+
+        candidates = {}
+        for build_chroot in build_chroots:
+            build = build_chroot.build
+            if build.copr_dir_id is None or build.package_id is None:
+                # not yet imported
+                continue
+            if (build.copr_dir_id, build.package_id) in packages:
+                # already up-to-date
+                continue
+            key = (build.copr_dir_id, build.package_id,
+                   build_chroot.mock_chroot_id)
+            candidates[key] = max(build.id, candidates.get(key, 0))
+
+        if not candidates:
+            return
+
+        # SQLite is used in the unit-tests only
+        dialect = postgresql
+        if db.engine.dialect.name == "sqlite":
+            dialect = sqlite
+
+        # A single upsert, so concurrent transactions can neither insert the
+        # same row twice, nor overwrite a newer build with an older one.
+        # Sorted, so concurrent transactions lock the rows in the same order.
+        values = [
+            {"copr_dir_id": copr_dir_id, "package_id": package_id,
+             "mock_chroot_id": mock_chroot_id, "build_id": build_id}
+            for (copr_dir_id, package_id, mock_chroot_id), build_id
+            in sorted(candidates.items())
+        ]
+        stmt = dialect.insert(table).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.copr_dir_id, table.c.package_id,
+                            table.c.mock_chroot_id],
+            set_={"build_id": stmt.excluded.build_id},
+            where=table.c.build_id < stmt.excluded.build_id,
+        )
+        db.session.execute(stmt)
+
     @classmethod
     def package_build_chroots_query(cls, copr_dir, mock_chroot_ids):
         """
-        Return an SQL query returning all BuildChroots assigned to given CoprDir
-        (copr_dir) and MockChroot's (mock_chroot_ids).  The output is sorted by
-        Package.name, and then by Build.id (so callers can easily skip the
-        uninteresting entries).
+        Return an SQL query returning the latest BuildChroots assigned to given
+        CoprDir (copr_dir) and MockChroot's (mock_chroot_ids).  The output is
+        sorted by Package.name, and then by Build.id.
         """
         return (
             models.BuildChroot.query
+            .join(models.LatestBuildChroot, and_(
+                models.LatestBuildChroot.build_id == models.BuildChroot.build_id,
+                models.LatestBuildChroot.mock_chroot_id == models.BuildChroot.mock_chroot_id,
+            ))
+            .filter(models.LatestBuildChroot.copr_dir_id == copr_dir.id)
             .join(models.BuildChroot.build)
             .join(models.Build.package)
             .options(
@@ -1830,20 +2239,20 @@ class BuildsMonitorLogic(object):
         """
         Query the BuildChroot for given list of package IDs, and mock chroot IDs
         """
+        # the latest build across all the CoprDirs
         builds_ids = (
-            models.Build.query.join(models.BuildChroot)
-                  .filter(models.Build.package_id.in_(pkg_ids))
-                  .filter(models.BuildChroot.mock_chroot_id.in_(mock_chroot_ids))
-                  .with_entities(
-                      models.Build.package_id.label('package_id'),
-                      func.max(models.Build.id).label('build_id').label("build_id"),
-                      models.BuildChroot.mock_chroot_id,
-                  )
-                  .group_by(
-                      models.Build.package_id,
-                      models.BuildChroot.mock_chroot_id,
-                  )
-                  .subquery()
+            db.session.query(
+                models.LatestBuildChroot.package_id.label("package_id"),
+                func.max(models.LatestBuildChroot.build_id).label("build_id"),
+                models.LatestBuildChroot.mock_chroot_id,
+            )
+            .filter(models.LatestBuildChroot.package_id.in_(pkg_ids))
+            .filter(models.LatestBuildChroot.mock_chroot_id.in_(mock_chroot_ids))
+            .group_by(
+                models.LatestBuildChroot.package_id,
+                models.LatestBuildChroot.mock_chroot_id,
+            )
+            .subquery()
         )
 
         return (models.BuildChroot.query
@@ -1,8 +1,10 @@
 # coding: utf-8
 
+import copy
 import os
 import datetime
 import time
+import uuid
 import fnmatch
 import flask
 import sqlalchemy
@@ -42,6 +44,50 @@ def unpin_projects_on_delete(copr, deleted, oldvalue, event):
     PinnedCoprsLogic.delete_by_copr(copr)
 
 
+RUNTIME_DEPS_SESSION_KEY = "copr_runtime_dependencies_changed"
+
+
+@sqlalchemy.event.listens_for(db.session, "before_flush")
+def schedule_runtime_dependencies_update(session, _flush_context, _instances):
+    """
+    Remember the projects which affect the resolved runtime dependencies, so
+    we can re-calculate them once the changes are flushed.
+    """
+    coprs = set()
+    copr_ids = set()
+    for copr in session.new:
+        if isinstance(copr, Copr):
+            coprs.add(copr)
+
+    for copr in session.dirty:
+        if not isinstance(copr, Copr):
+            continue
+        attrs = sqlalchemy.inspect(copr).attrs
+        if any(attrs[name].history.has_changes()
+               for name in ["runtime_dependencies", "deleted", "name"]):
+            coprs.add(copr)
+
+    for copr in session.deleted:
+        if isinstance(copr, Copr):
+            copr_ids.add(copr.id)
+
+    if coprs or copr_ids:
+        pending = session.info.setdefault(RUNTIME_DEPS_SESSION_KEY, (set(), set()))
+        pending[0].update(coprs)
+        pending[1].update(copr_ids)
+
+
+@sqlalchemy.event.listens_for(db.session, "after_flush_postexec")
+def update_runtime_dependencies(session, _flush_context):
+    """
+    Re-calculate the runtime dependencies scheduled in before_flush, the new
+    CoprRuntimeDependency rows are stored by the next flush (commit).
+    """
+    pending = session.info.pop(RUNTIME_DEPS_SESSION_KEY, None)
+    if pending:
+        ComplexLogic.update_runtime_dependencies(*pending)
+
+
 class ComplexLogic(object):
     """
     Used for manipulation which affects multiply models
@@ -52,8 +98,10 @@ class ComplexLogic(object):
     def get_transitive_runtime_dependencies(cls, copr):
         """Get a list of runtime dependencies (build transitively from
         dependencies' dependencies). Returns three lists, one with Copr
-        dependencies, one with list of non-existing Copr dependencies
-        and one with URLs to external dependencies.
+        dependencies, one with URLs to external dependencies and one with
+        list of non-existing Copr dependencies.
+
+        The pre-calculated CoprRuntimeDependency items are used, if available.
 
         :type copr: models.Copr
         :rtype: List[models.Copr], List[str], List[str]
@@ -62,15 +110,96 @@ class ComplexLogic(object):
         if not copr:
             return [], [], []
 
+        resolved = []
+        if copr.id is not None:
+            resolved = (
+                models.CoprRuntimeDependency.query
+                .filter(models.CoprRuntimeDependency.copr_id == copr.id)
+                .options(sqlalchemy.orm.joinedload(
+                    models.CoprRuntimeDependency.dependency_copr))
+                .order_by(models.CoprRuntimeDependency.id)
+                .all()
+            )
+
+        if not resolved:
+            # Not yet calculated, or there are no dependencies at all.
+            return cls.resolve_transitive_runtime_dependencies(copr)
+
+        internal_deps, external_deps, non_existing = [], [], []
+        for dep in resolved:
+            if dep.dependency_copr:
+                internal_deps.append(dep.dependency_copr)
+            elif dep.missing:
+                non_existing.append(dep.dependency)
+            else:
+                external_deps.append(dep.dependency)
+        return internal_deps, external_deps, non_existing
+
+    @classmethod
+    def update_runtime_dependencies(cls, coprs, copr_ids=None):
+        """
+        Re-calculate the CoprRuntimeDependency items for the given projects
+        (objects or IDs), and for all the projects which (even transitively)
+        depend on them.  Doesn't commit.
+        """
+        # pylint: disable=too-many-locals
+        crd = models.CoprRuntimeDependency
+        ids = set(copr_ids or [])
+        ids.update(copr.id for copr in coprs)
+
+        # follow the reverse edges
+        dependents = db.session.query(crd.copr_id).filter(
+            crd.dependency_copr_id.in_(ids))
+        ids.update(copr_id for copr_id, in dependents)
+
+        # projects which depend on a project of the same name, that didn't
+        # exist before
+        names = set(copr.name for copr in coprs)
+        if names:
+            missing = db.session.query(crd.copr_id).filter(
+                crd.missing.is_(True),
+                sqlalchemy.or_(*[crd.dependency.endswith("/" + name)
+                                 for name in names]))
+            ids.update(copr_id for copr_id, in missing)
+
+        if not ids:
+            return
+
+        db.session.query(crd).filter(crd.copr_id.in_(ids)).delete(
+            synchronize_session=False)
+
+        for copr in models.Copr.query.filter(models.Copr.id.in_(ids)):
+            if copr.deleted:
+                continue
+            internal_deps, external_deps, non_existing = \
+                cls.resolve_transitive_runtime_dependencies(copr, with_urls=True)
+            for dep_copr, dependency in internal_deps:
+                db.session.add(crd(copr_id=copr.id, dependency=dependency,
+                                   dependency_copr_id=dep_copr.id))
+            for dependency in external_deps:
+                db.session.add(crd(copr_id=copr.id, dependency=dependency))
+            for dependency in non_existing:
+                db.session.add(crd(copr_id=copr.id, dependency=dependency,
+                                   missing=True))
+
+    @classmethod
+    def resolve_transitive_runtime_dependencies(cls, copr, with_urls=False):
+        """
+        Walk through the runtime dependency graph of the project (querying the
+        database for each copr:// dependency), return the same lists as
+        get_transitive_runtime_dependencies().  If with_urls=True, the first
+        list items are (copr, repo_url) pairs.
+        """
+
         wlist = helpers.WorkList([copr])
-        internal_deps = set()
+        internal_deps = {}
         non_existing = set()
         external_deps = set()
 
         while not wlist.empty:
             analyzed_copr = wlist.pop()
 
-            for dep in analyzed_copr.runtime_deps:
+            for dep in sorted(analyzed_copr.runtime_deps):
                 try:
                     copr_dep = cls.get_copr_by_repo(dep)
                 except exceptions.ObjectNotFound:
@@ -83,10 +212,12 @@ class ComplexLogic(object):
                 if copr == copr_dep:
                     continue
                 # check transitive dependencies
-                internal_deps.add(copr_dep)
+                internal_deps.setdefault(copr_dep, dep)
                 wlist.schedule(copr_dep)
 
-        return list(internal_deps), list(external_deps), list(non_existing)
+        if with_urls:
+            internal_deps = list(internal_deps.items())
+        return list(internal_deps), sorted(external_deps), sorted(non_existing)
 
     @classmethod
     def delete_copr(cls, copr, admin_action=False):
@@ -592,7 +723,164 @@ class ProjectForking(object):
         return clazz(**arguments)
 
 
+CONFIG_VERSION_SESSION_KEY = "copr_config_version_changed"
+
+
+@sqlalchemy.event.listens_for(db.session, "after_flush")
+def schedule_config_version_bump(session, _flush_context):
+    """
+    Remember the projects with changed configuration (the project itself, its
+    chroots, directories or the resolved runtime dependencies).  The versions
+    are bumped once the changes are committed.
+    """
+    copr_ids = session.info.setdefault(CONFIG_VERSION_SESSION_KEY, set())
+    changed = set(session.new) | set(session.deleted)
+    changed |= {obj for obj in session.dirty
+                if session.is_modified(obj, include_collections=False)}
+    for obj in changed:
+        if isinstance(obj, Copr):
+            copr_ids.add(obj.id)
+        elif isinstance(obj, (models.CoprChroot, models.CoprDir,
+                              models.CoprRuntimeDependency)):
+            copr_ids.add(obj.copr_id)
+
+
+@sqlalchemy.event.listens_for(db.session, "after_commit")
+def bump_config_versions(session):
+    """ Invalidate the configuration cached for the changed projects """
+    copr_ids = session.info.pop(CONFIG_VERSION_SESSION_KEY, None)
+    if copr_ids:
+        ConfigVersionLogic.bump(copr_ids - {None})
+
+
+@sqlalchemy.event.listens_for(db.session, "after_rollback")
+def forget_config_versions(session):
+    """ Nothing changed """
+    session.info.pop(CONFIG_VERSION_SESSION_KEY, None)
+
+
+class ConfigVersionLogic:
+    """
+    Each project has a "configuration version", a random token which changes
+    whenever the project, or its chroots or directories, are modified.  Data
+    generated from the project configuration can be cached under a key
+    containing the version (no explicit invalidation needed).
+    """
+
+    @staticmethod
+    def _key(copr_id):
+        return "copr_config_version_{}".format(copr_id)
+
+    # How long the data cached by cached() live, even if no related project
+    # changes.  This is a safety net for the changes we don't track (e.g. the
+    # mock chroot EOL), and for the "remaining days" counters.
+    CACHE_TIMEOUT = 60*60
+
+    @classmethod
+    def get(cls, copr_id):
+        """
+        Return the current configuration version of the project
+        """
+        return cls.get_many([copr_id])[copr_id]
+
+    @classmethod
+    def get_many(cls, copr_ids):
+        """
+        Return the {copr_id: version} dictionary for the given projects.  The
+        versions are None if caching is disabled.
+        """
+        copr_ids = list(copr_ids)
+        if not copr_ids:
+            return {}
+        keys = [cls._key(copr_id) for copr_id in copr_ids]
+        versions = dict(zip(copr_ids, cache.get_many(*keys)))
+        missing = [copr_id for copr_id, version in versions.items()
+                   if version is None]
+        if missing:
+            for copr_id in missing:
+                cache.add(cls._key(copr_id), uuid.uuid4().hex, timeout=0)
+            keys = [cls._key(copr_id) for copr_id in missing]
+            versions.update(zip(missing, cache.get_many(*keys)))
+        return versions
+
+    @classmethod
+    def bump(cls, copr_ids):
+        """
+        Change the configuration version of the given projects
+        """
+        if copr_ids:
+            cache.delete_many(*[cls._key(copr_id) for copr_id in copr_ids])
+
+    @classmethod
+    def cached(cls, key, copr, generate):
+        """
+        Return the data generated by GENERATE() from the COPR configuration,
+        cached under KEY until the project changes.  GENERATE() returns the
+        (data, dependencies) pair, where dependencies is the list of other
+        projects the data depend on; the data are re-generated when any of
+        them changes, too.
+        """
+        entry = cache.get(key)
+        if entry:
+            versions = cls.get_many(entry["versions"])
+            if versions == entry["versions"]:
+                return entry["data"]
+
+        # Read the version before generating, so the concurrent changes
+        # rather invalidate the entry immediately.
+        version = cls.get(copr.id)
+        data, dependencies = generate()
+        if version is None:
+            # caching disabled
+            return data
+
+        versions = cls.get_many(dep.id for dep in dependencies)
+        versions[copr.id] = version
+        cache.set(key, {"versions": versions, "data": data},
+                  timeout=cls.CACHE_TIMEOUT)
+        return data
+
+
 class BuildConfigLogic(object):
+    # How long the build config snapshots live.  The snapshot is invalidated
+    # by the project change, but the copr:// repositories also depend on the
+    # configuration of the other projects.
+    SNAPSHOT_TIMEOUT = 10*60
+
+    # In-process snapshots, {key: (expiration, config)}
+    _snapshots = {}
+    _snapshots_max = 1000
+
+    @classmethod
+    def get_build_config(cls, coprdir, chroot_id):
+        """
+        Cached variant of generate_build_config().  The snapshots are kept in
+        two tiers, in-process and in Redis.  They are identified by the
+        configuration version of the project, so any project change makes
+        them obsolete.
+        """
+        version = ConfigVersionLogic.get(coprdir.copr_id)
+        if version is None:
+            # caching disabled
+            return cls.generate_build_config(coprdir, chroot_id)
+
+        key = "build_config_{}_{}_{}".format(coprdir.id, chroot_id, version)
+        now = time.time()
+
+        snapshot = cls._snapshots.get(key)
+        if snapshot and snapshot[0] > now:
+            return copy.deepcopy(snapshot[1])
+
+        config = cache.get(key)
+        if config is None:
+            config = cls.generate_build_config(coprdir, chroot_id)
+            cache.set(key, config, timeout=cls.SNAPSHOT_TIMEOUT)
+
+        if len(cls._snapshots) >= cls._snapshots_max:
+            cls._snapshots.clear()
+        cls._snapshots[key] = (now + cls.SNAPSHOT_TIMEOUT, config)
+        return copy.deepcopy(config)
+
     @classmethod
     def generate_build_config(cls, coprdir, chroot_id):
         """ Return dict with proper build config contents """
@@ -737,7 +1025,8 @@ class ReposLogic:
     def repos_for_copr(cls, copr,  copr_repo_dl_stat):
         """
         Return a `dict` containing repository information for all chroots in
-        a given `copr` project
+        a given `copr` project.  Pass `copr_repo_dl_stat=None` if the download
+        statistics are not needed (they are not calculated then).
         """
         repos_groups = {}
         for chroot in copr.enable_permissible_copr_chroots:
@@ -766,7 +1055,8 @@ class ReposLogic:
 
             arch = chroot.mock_chroot.arch
             repo["arch_list"].append(arch)
-            repo["rpm_dl_stat"][arch] = cls._rpms_dl_stat(chroot)
+            if copr_repo_dl_stat is not None:
+                repo["rpm_dl_stat"][arch] = cls._rpms_dl_stat(chroot)
             if chroot.delete_after_days is not None:
                 repo["expirations"][arch] = chroot.delete_after_days
 
@@ -789,7 +1079,8 @@ class ReposLogic:
             "logo": cls._logo(mc),
             "arch_list": [],
             "repo_file": "{}-{}.repo".format(copr.repo_id, mc.name_release),
-            "dl_stat": copr_repo_dl_stat[mc.name_release],
+            "dl_stat": (None if copr_repo_dl_stat is None
+                        else copr_repo_dl_stat[mc.name_release]),
             "rpm_dl_stat": {},
             "delete_reason": None,
             "expirations": {},
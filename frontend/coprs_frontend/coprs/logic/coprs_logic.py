@@ -33,7 +33,7 @@ from coprs import models
 from coprs import logic
 from coprs.exceptions import MalformedArgumentException, BadRequest
 from coprs.logic import users_logic
-from coprs.whoosheers import CoprWhoosheer
+from coprs.logic.search_logic import SearchLogic
 from coprs.helpers import fix_protocol_for_backend, clone_sqlalchemy_instance
 
 from coprs.logic.actions_logic import ActionsLogic
@@ -281,8 +281,11 @@ class CoprsLogic(object):
             query = query.filter(models.Package.name.ilike(value))
 
         if fulltext:
-            query = query.whooshee_search(
-                fulltext, whoosheer=CoprWhoosheer, order_by_relevance=100)
+            query = SearchLogic.filter_fulltext(query, fulltext)
+            relevance = SearchLogic.relevance(fulltext)
+            if relevance is not None:
+                query = query.order_by(None).order_by(
+                    relevance, desc(models.Copr.created_on))
 
         return query
 
@@ -1,6 +1,29 @@
 # coding: utf-8
 import time
 
+from sqlalchemy import func, select
+
+from coprs import db
+
+
+# Namespaces (the first key) of the advisory locks, see advisory_xact_lock()
+LOCK_PACKAGE_REBUILD = 1
+LOCK_BUILD_BATCH = 2
+
+
+def advisory_xact_lock(namespace, object_id, session=None):
+    """
+    Take the (NAMESPACE, OBJECT_ID) advisory lock, and keep it till the end of
+    the current transaction (commit or rollback).  Blocks while the lock is
+    held by another transaction.  Unlike LOCK TABLE, this only serializes the
+    transactions working with the same object.  PostgreSQL only, no-op with
+    other databases.
+    """
+    session = session or db.session
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    session.execute(select(func.pg_advisory_xact_lock(namespace, object_id)))
+
 
 def get_graph_parameters(type):
     if type == "10min":
@@ -2,8 +2,10 @@ import json
 from typing import List, Optional
 
 from sqlalchemy import bindparam, Integer, func, or_
+from sqlalchemy import delete, inspect, insert
+from sqlalchemy.event import listens_for
 from sqlalchemy.sql import true, text
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import contains_eager, selectinload
 
 from coprs import app
 from coprs import db
@@ -18,6 +20,45 @@ from copr_common.enums import StatusEnum
 
 log = app.logger
 
+SCM_SOURCE_SESSION_KEY = "copr_package_scm_source_changed"
+
+
+@listens_for(db.session, "before_flush")
+def schedule_scm_source_update(session, _flush_context, _instances):
+    """
+    Remember the packages with new (or changed) source, and the deleted
+    packages.  New packages don't have their IDs yet, so we keep the objects.
+    """
+    packages = set()
+    deleted_ids = set()
+    for obj in session.new:
+        if isinstance(obj, models.Package):
+            packages.add(obj)
+
+    for obj in session.dirty:
+        if isinstance(obj, models.Package):
+            if inspect(obj).attrs.source_json.history.has_changes():
+                packages.add(obj)
+
+    for obj in session.deleted:
+        if isinstance(obj, models.Package):
+            deleted_ids.add(obj.id)
+
+    if packages or deleted_ids:
+        pending = session.info.setdefault(SCM_SOURCE_SESSION_KEY, (set(), set()))
+        pending[0].update(packages)
+        pending[1].update(deleted_ids)
+
+
+@listens_for(db.session, "after_flush_postexec")
+def update_scm_sources(session, _flush_context):
+    """
+    Update the package_scm_source rows scheduled in before_flush
+    """
+    pending = session.info.pop(SCM_SOURCE_SESSION_KEY, None)
+    if pending:
+        PackagesLogic.update_scm_sources(*pending)
+
 
 class PackagesLogic(object):
 
@@ -176,47 +217,88 @@ class PackagesLogic(object):
         return package
 
     @classmethod
-    def _normalize_git_clone_url(cls, clone_url):
-        normalized = clone_url.rstrip("/")
-        return normalized.removesuffix(".git")
+    def update_scm_sources(cls, packages, deleted_ids=None):
+        """
+        Re-calculate the package_scm_source rows for the given PACKAGES
+        (objects), and drop the rows of the DELETED_IDS packages.
+        """
+        table = models.PackageScmSource.__table__
+        ids = set(deleted_ids or [])
+        ids.update(package.id for package in packages)
+        ids.discard(None)
+        if not ids:
+            return
+
+        rows = []
+        for package in packages:
+            if package.id in (deleted_ids or []):
+                continue
+            try:
+                source = package.source_json_dict
+            except ValueError:
+                source = {}
+            if not isinstance(source, dict):
+                continue
+            clone_url = helpers.normalize_git_clone_url(source.get("clone_url"))
+            if not clone_url:
+                continue
+            rows.append({
+                "package_id": package.id,
+                "clone_url": clone_url,
+                "committish": source.get("committish") or "",
+                "subdirectory": source.get("subdirectory") or "",
+            })
+
+        db.session.execute(delete(table).where(table.c.package_id.in_(ids)))
+        if rows:
+            db.session.execute(insert(table), rows)
+
+    @classmethod
+    def get_by_clone_url(cls, clone_url):
+        """
+        Return the query for (Package, PackageScmSource) pairs of the packages
+        built from the CLONE_URL repository, with webhook rebuilds enabled.
+        """
+        return (
+            db.session.query(models.Package, models.PackageScmSource)
+            .join(models.PackageScmSource,
+                  models.PackageScmSource.package_id == models.Package.id)
+            .join(models.Package.copr)
+            .options(contains_eager(models.Package.copr))
+            .filter(models.PackageScmSource.clone_url
+                    == helpers.normalize_git_clone_url(clone_url))
+            .filter(models.Package.webhook_rebuild == true())
+        )
 
     @classmethod
     def get_for_webhook_rebuild(
         cls, copr_id, webhook_secret, clone_url, commits, ref_type, ref, pkg_name: Optional[str]
     ) -> List[Package]:
-        clone_url_stripped = cls._normalize_git_clone_url(clone_url)
-
-        packages = (models.Package.query.join(models.Copr)
-                    .filter(models.Copr.webhook_secret == webhook_secret)
-                    .filter(models.Package.source_type == helpers.BuildSourceEnum("scm"))
-                    .filter(models.Package.copr_id == copr_id)
-                    .filter(models.Package.webhook_rebuild == true())
-                    .filter(models.Package.source_json.contains(clone_url_stripped)))
+        rows = (cls.get_by_clone_url(clone_url)
+                .filter(models.Copr.webhook_secret == webhook_secret)
+                .filter(models.Package.source_type == helpers.BuildSourceEnum("scm"))
+                .filter(models.Package.copr_id == copr_id))
 
         result = []
-        for package in packages:
-            package_clone_url = package.source_json_dict.get('clone_url', '')
-            package_clone_url_stripped = cls._normalize_git_clone_url(package_clone_url)
-
-            if package_clone_url_stripped != clone_url_stripped:
-                continue
-
+        for package, scm_source in rows:
             if not package.copr.active_copr_chroots:
                 continue
 
-            if cls._belongs_to_package(package, commits, ref_type, ref, pkg_name):
+            if cls._belongs_to_package(package, scm_source, commits, ref_type,
+                                       ref, pkg_name):
                 result.append(package)
 
         return result
 
     @classmethod
     def _belongs_to_package(
-        cls, package: Package, commits, ref_type: str, ref: str, pkg_name: Optional[str]
+        cls, package: Package, scm_source, commits, ref_type: str, ref: str,
+        pkg_name: Optional[str]
     ) -> bool:
         if ref_type == "tag":
             return cls._tag_belongs_to_package(package, ref, pkg_name)
 
-        return cls.commits_belong_to_package(package, commits, ref)
+        return cls.commits_belong_to_package(scm_source, commits, ref)
 
     @staticmethod
     def _ref_matches_copr_pkgname(ref: str, copr_pkg_name: str) -> bool:
@@ -257,14 +339,17 @@ class PackagesLogic(object):
         return cls._ref_matches_copr_pkgname(ref, package.name)
 
     @classmethod
-    def commits_belong_to_package(cls, package: Package, commits, ref: str) -> bool:
-        committish = package.source_json_dict.get("committish") or ''
+    def commits_belong_to_package(cls, scm_source, commits, ref: str) -> bool:
+        """
+        True if any of the COMMITS pushed to REF changes the package sources,
+        SCM_SOURCE is the PackageScmSource of the package.
+        """
+        committish = scm_source.committish
         if committish and not ref.endswith(committish):
             return False
 
+        sm = helpers.SubdirMatch(scm_source.subdirectory)
         for commit in commits:
-            subdir = package.source_json_dict.get('subdirectory')
-            sm = helpers.SubdirMatch(subdir)
             changed = set()
             for ch in ['added', 'removed', 'modified']:
                 changed |= set(commit.get(ch, []))
@@ -0,0 +1,238 @@
+"""
+Full-text search for projects.
+
+Each project has a pre-computed search document in the copr.search_vector
+column.  On PostgreSQL it is a weighted tsvector (GIN-indexed), with SQLite
+(unit tests) we store the space-separated list of tokens instead and search
+with LIKE.  The document is updated in the same transaction as the Copr,
+Package or CoprChroot changes that affect it, see the session hooks below.
+"""
+
+import re
+
+import sqlalchemy
+from sqlalchemy import bindparam, false, func, update
+
+from coprs import db
+from coprs import models
+
+
+SEARCH_SESSION_KEY = "copr_search_changed"
+
+# The tsvector configuration, we don't want any stemming or stop-words for
+# project/package names.
+TS_CONFIG = "simple"
+
+# Copr attributes which are part of the search document
+COPR_SEARCH_ATTRS = ["name", "description", "instructions", "user_id",
+                     "group_id"]
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """
+    Split the TEXT into lowercase alphanumeric tokens, e.g. "copr-dev" becomes
+    ["copr", "dev"].  The same tokenizer is used for documents and queries so
+    the dialects behave the same.
+    """
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _is_postgresql():
+    return db.engine.dialect.name == "postgresql"
+
+
+@sqlalchemy.event.listens_for(db.session, "before_flush")
+def schedule_search_update(session, _flush_context, _instances):
+    """
+    Remember the projects which need to have their search document updated.
+    New objects don't have their IDs yet, so we keep the objects themselves.
+    """
+    objects = set()
+    copr_ids = set()
+
+    for obj in session.new:
+        if isinstance(obj, (models.Copr, models.Package, models.CoprChroot)):
+            objects.add(obj)
+
+    for obj in session.dirty:
+        if isinstance(obj, models.Copr):
+            attrs = sqlalchemy.inspect(obj).attrs
+            if any(attrs[name].history.has_changes()
+                   for name in COPR_SEARCH_ATTRS):
+                objects.add(obj)
+        elif isinstance(obj, models.Package):
+            if sqlalchemy.inspect(obj).attrs.name.history.has_changes():
+                objects.add(obj)
+        elif isinstance(obj, models.CoprChroot):
+            if sqlalchemy.inspect(obj).attrs.deleted.history.has_changes():
+                objects.add(obj)
+
+    for obj in session.deleted:
+        if isinstance(obj, (models.Package, models.CoprChroot)):
+            copr_ids.add(obj.copr_id)
+
+    if objects or copr_ids:
+        pending = session.info.setdefault(SEARCH_SESSION_KEY, (set(), set()))
+        pending[0].update(objects)
+        pending[1].update(copr_ids)
+
+
+@sqlalchemy.event.listens_for(db.session, "after_flush_postexec")
+def update_search(session, _flush_context):
+    """
+    Re-calculate the search documents for the projects scheduled in
+    before_flush.
+    """
+    pending = session.info.pop(SEARCH_SESSION_KEY, None)
+    if not pending:
+        return
+
+    objects, copr_ids = pending
+    for obj in objects:
+        if isinstance(obj, models.Copr):
+            copr_ids.add(obj.id)
+        else:
+            copr_ids.add(obj.copr_id)
+    copr_ids.discard(None)
+    SearchLogic.update_coprs(copr_ids)
+
+
+class SearchLogic:
+    """
+    Maintain and query the project search documents
+    """
+
+    @classmethod
+    def get_documents(cls, copr_ids):
+        """
+        Return {copr_id: {"name": ..., "owner": ..., ...}} with the tokens of
+        each weighted part of the search document.
+        """
+        documents = {}
+        query = (
+            db.session.query(models.Copr.id, models.Copr.name,
+                             models.Copr.description, models.Copr.instructions,
+                             models.User.username, models.Group.name)
+            .outerjoin(models.User, models.Copr.user_id == models.User.id)
+            .outerjoin(models.Group, models.Copr.group_id == models.Group.id)
+            .filter(models.Copr.id.in_(copr_ids))
+        )
+        for copr_id, name, description, instructions, username, group in query:
+            owner = "@" + group if group else username
+            documents[copr_id] = {
+                "name": tokenize(name),
+                "owner": tokenize(owner),
+                "packages": [],
+                "chroots": [],
+                "text": tokenize(description) + tokenize(instructions),
+            }
+
+        query = (
+            db.session.query(models.Package.copr_id, models.Package.name)
+            .filter(models.Package.copr_id.in_(copr_ids))
+        )
+        for copr_id, name in query:
+            documents[copr_id]["packages"] += tokenize(name)
+
+        query = (
+            db.session.query(models.CoprChroot.copr_id,
+                             models.MockChroot.os_release,
+                             models.MockChroot.os_version,
+                             models.MockChroot.arch)
+            .join(models.MockChroot)
+            .filter(models.CoprChroot.copr_id.in_(copr_ids))
+            .filter(models.CoprChroot.deleted.isnot(True))
+        )
+        for copr_id, os_release, os_version, arch in query:
+            documents[copr_id]["chroots"] += tokenize(
+                "{}-{}-{}".format(os_release, os_version, arch))
+
+        return documents
+
+    @classmethod
+    def update_coprs(cls, copr_ids):
+        """
+        Re-calculate the search documents for the given projects, in the
+        current transaction.
+        """
+        copr_ids = list(copr_ids)
+        if not copr_ids:
+            return
+
+        with db.session.no_autoflush:
+            documents = cls.get_documents(copr_ids)
+        if not documents:
+            return
+
+        params = []
+        for copr_id, document in documents.items():
+            params.append({
+                "b_id": copr_id,
+                "b_name": " ".join(document["name"]),
+                "b_other": " ".join(document["owner"] + document["packages"]),
+                "b_chroots": " ".join(document["chroots"]),
+                "b_text": " ".join(document["text"]),
+            })
+
+        if _is_postgresql():
+            def _weighted(param, weight):
+                return func.setweight(
+                    func.to_tsvector(TS_CONFIG, bindparam(param)), weight)
+            vector = (_weighted("b_name", "A")
+                      .op("||")(_weighted("b_other", "B"))
+                      .op("||")(_weighted("b_chroots", "C"))
+                      .op("||")(_weighted("b_text", "D")))
+        else:
+            for param in params:
+                param["b_document"] = " {} ".format(" ".join(
+                    [param["b_name"], param["b_other"], param["b_chroots"],
+                     param["b_text"]]))
+            vector = bindparam("b_document")
+
+        # The Copr model is mapped to a join, update the public table directly
+        table = models.Copr.__table__.left
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(search_vector=vector),
+            params,
+        )
+
+    @classmethod
+    def filter_fulltext(cls, query, fulltext):
+        """
+        Filter the Copr QUERY to projects matching all the words in FULLTEXT
+        (prefix match).
+        """
+        tokens = tokenize(fulltext)
+        if not tokens:
+            return query.filter(false())
+
+        column = models.Copr.search_vector
+        if _is_postgresql():
+            return query.filter(column.op("@@")(cls._tsquery(tokens)))
+
+        for token in tokens:
+            query = query.filter(column.like("% {}%".format(token)))
+        return query
+
+    @classmethod
+    def relevance(cls, fulltext):
+        """
+        Return the ORDER BY clause sorting the FULLTEXT search results by
+        relevance, or None if the database can not do this.
+        """
+        tokens = tokenize(fulltext)
+        if not tokens or not _is_postgresql():
+            return None
+        return func.ts_rank(models.Copr.search_vector,
+                            cls._tsquery(tokens)).desc()
+
+    @staticmethod
+    def _tsquery(tokens):
+        return func.to_tsquery(
+            TS_CONFIG, " & ".join(token + ":*" for token in tokens))
@@ -1,16 +1,34 @@
 from collections import defaultdict
 
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 
+from copr_common.redis_helpers import get_redis_connection
 from coprs import app
 from coprs import db
 from coprs.models import CounterStat
 from coprs import helpers, models
 
 
+# Redis hash with the not-yet-flushed counter increments, field names are
+# "<counter_type>|<counter_name>", see CounterStatLogic.buffer_incr()
+REDIS_COUNTERS_KEY = "copr-counter-stat"
+
+
 class CounterStatLogic(object):
 
+    @staticmethod
+    def redis():
+        """
+        Redis connection for the buffered counters
+        """
+        return get_redis_connection({
+            "redis_host": app.config["REDIS_HOST"],
+            "redis_port": app.config["REDIS_PORT"],
+            "redis_db": app.config["COUNTER_STAT_REDIS_DB"],
+        })
+
     @classmethod
     def get(cls, name):
         """
@@ -52,6 +70,94 @@ class CounterStatLogic(object):
             update({"counter": CounterStat.counter + count})
         db.session.commit()
 
+    @classmethod
+    def incr_many(cls, counters):
+        """
+        Increment multiple counters by a single INSERT ... ON CONFLICT DO UPDATE
+        statement, missing counters are created.  The `counters` argument is
+        a dict `{name: (counter_type, count)}`.  Doesn't commit.
+        """
+        if not counters:
+            return
+
+        # SQLite is used in the unit-tests only
+        dialect = postgresql
+        if db.engine.dialect.name == "sqlite":
+            dialect = sqlite
+
+        # Sorted, so concurrent transactions lock the rows in the same order
+        values = [
+            {"name": name, "counter_type": counter_type, "counter": count}
+            for name, (counter_type, count) in sorted(counters.items())
+        ]
+        stmt = dialect.insert(CounterStat).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CounterStat.name],
+            set_={"counter": CounterStat.counter + stmt.excluded.counter},
+        )
+        db.session.execute(stmt)
+
+    @classmethod
+    def buffer_incr(cls, name, counter_type, count=1):
+        """
+        Increment the counter in Redis only, without touching the database.
+        The increments are moved to the database by flush_buffered().
+        """
+        field = "{0}|{1}".format(counter_type, name)
+        cls.redis().hincrby(REDIS_COUNTERS_KEY, field, count)
+
+    @classmethod
+    def get_buffered(cls, counter_type, names_list):
+        """
+        Return the `{name: count}` dict of the not-yet-flushed increments
+        """
+        names_list = list(names_list)
+        if not names_list:
+            return {}
+        fields = ["{0}|{1}".format(counter_type, name) for name in names_list]
+        pending = cls.redis().hmget(REDIS_COUNTERS_KEY, fields)
+
+        result = {}
+        for name, count in zip(names_list, pending):
+            if count and int(count):
+                result[name] = int(count)
+        return result
+
+    @classmethod
+    def flush_buffered(cls):
+        """
+        Move the counter increments buffered in Redis to the database, and
+        commit.  Return the number of flushed counters.
+        """
+        redis = cls.redis()
+        # Pop the increments atomically before touching the database, so
+        # the hits buffered meanwhile are kept for the next run, and a crash
+        # after the commit can not count the same hits twice.
+        pipeline = redis.pipeline()
+        pipeline.hgetall(REDIS_COUNTERS_KEY)
+        pipeline.delete(REDIS_COUNTERS_KEY)
+        buffered, _ = pipeline.execute()
+        if not buffered:
+            return 0
+
+        counters = {}
+        for field, count in buffered.items():
+            counter_type, name = field.split("|", 1)
+            counters[name] = (counter_type, int(count))
+
+        try:
+            cls.incr_many(counters)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Return the increments back to Redis for the next run.
+            pipeline = redis.pipeline()
+            for field, count in buffered.items():
+                pipeline.hincrby(REDIS_COUNTERS_KEY, field, int(count))
+            pipeline.execute()
+            raise
+        return len(counters)
+
     @classmethod
     def get_copr_repo_dl_stat(cls, copr):
         # chroot -> stat_name
@@ -73,6 +179,11 @@ class CounterStatLogic(object):
         for stat in stats:
             repo_dl_stats[chroot_by_stat_name[stat.name]] = stat.counter
 
+        buffered = cls.get_buffered(helpers.CounterStatType.REPO_DL,
+                                    chroot_by_stat_name.keys())
+        for stat_name, count in buffered.items():
+            repo_dl_stats[chroot_by_stat_name[stat_name]] += count
+
         return repo_dl_stats
 
     @classmethod
@@ -108,6 +219,7 @@ def handle_be_stat_message(stat_data):
     """
     app.logger.debug('Got stat data: {}'.format(stat_data))
 
+    counters = {}
     hits = stat_data['hits']
     for key_str, count in hits.items():
         stat_type, key_string = key_str.split("|", 1)
@@ -126,4 +238,7 @@ def handle_be_stat_message(stat_data):
             stat_type=stat_type,
             key_string=key_string,
         )
-        CounterStatLogic.incr(stat_name, stat_type, count)
+        _, previous = counters.get(stat_name, (stat_type, 0))
+        counters[stat_name] = (stat_type, previous + count)
+
+    CounterStatLogic.incr_many(counters)
@@ -21,7 +21,9 @@ import modulemd_tools.yaml
 
 from sqlalchemy import outerjoin, text
 from sqlalchemy.ext.associationproxy import association_proxy
-from sqlalchemy.orm import column_property, validates
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import column_property, deferred, object_session, validates
 from sqlalchemy.event import listens_for
 from libravatar import libravatar_url
 
@@ -47,9 +49,13 @@ from coprs.helpers import JSONEncodedDict, ChrootDeletionStatus
 # - too-few-public-methods: models are often very trivial classes
 # pylint: disable=too-few-public-methods
 
-class CoprSearchRelatedData(object):
-    def get_search_related_copr_id(self):
-        raise NotImplementedError
+def _trigram_index(name, column):
+    """
+    GIN index for the ILIKE '%text%' queries (PostgreSQL pg_trgm), a normal
+    index with other databases.
+    """
+    return db.Index(name, column, postgresql_using="gin",
+                    postgresql_ops={column: "gin_trgm_ops"})
 
 
 class _UserPublic(db.Model, helpers.Serializer):
@@ -57,6 +63,9 @@ class _UserPublic(db.Model, helpers.Serializer):
     Represents user of the copr frontend
     """
     __tablename__ = "user"
+    __table_args__ = (
+        _trigram_index("user_username_trgm", "username"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -331,6 +340,9 @@ class _CoprPublic(db.Model, helpers.Serializer):
                  unique=True,
                  postgresql_where=_user_unique_where,
                  sqlite_where=_user_unique_where),
+        _trigram_index("copr_name_trgm", "name"),
+        db.Index("copr_search_vector", "search_vector",
+                 postgresql_using="gin"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -363,8 +375,8 @@ class _CoprPublic(db.Model, helpers.Serializer):
 
     unlisted_on_hp = db.Column(db.Boolean, default=False, nullable=False)
 
-    # information for search index updating
-    latest_indexed_data_update = db.Column(db.Integer)
+    # pre-computed full-text search document, see coprs.logic.search_logic
+    search_vector = db.Column(TSVECTOR().with_variant(db.Text(), "sqlite"))
 
     # builds and the project are immune against deletion
     persistent = db.Column(db.Boolean, default=False, nullable=False, server_default="0")
@@ -436,7 +448,7 @@ class _CoprPrivate(db.Model, helpers.Serializer):
     scm_api_auth_json = db.Column(db.Text)
 
 
-class Copr(db.Model, helpers.Serializer, CoprSearchRelatedData):
+class Copr(db.Model, helpers.Serializer):
     """
     Represents private a single copr (personal repo with builds, mock chroots,
     etc.).
@@ -450,6 +462,9 @@ class Copr(db.Model, helpers.Serializer, CoprSearchRelatedData):
         _CoprPrivate.__table__.c.copr_id
     )
 
+    # not needed unless searching
+    search_vector = deferred(_CoprPublic.__table__.c.search_vector)
+
     # relations
     user = db.relationship("User", backref=db.backref("coprs"))
     group = db.relationship("Group", backref=db.backref("groups"))
@@ -697,9 +712,6 @@ class Copr(db.Model, helpers.Serializer, CoprSearchRelatedData):
                     .filter(Action.action_type == ActionTypeEnum("fork"))
                     .filter(Action.new_value == self.full_name).all())
 
-    def get_search_related_copr_id(self):
-        return self.id
-
     @property
     def enable_net(self):
         return self.build_enable_net
@@ -785,6 +797,32 @@ class Copr(db.Model, helpers.Serializer, CoprSearchRelatedData):
         return projects.split()
 
 
+class CoprRuntimeDependency(db.Model):
+    """
+    One item of the resolved (transitive) runtime dependencies of a project,
+    see ComplexLogic.get_transitive_runtime_dependencies().  The items are
+    re-calculated whenever the Copr.runtime_dependencies of the project, or of
+    any project it (transitively) depends on, is changed.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    copr_id = db.Column(db.Integer,
+                        db.ForeignKey("copr.id", ondelete="CASCADE"),
+                        nullable=False, index=True)
+    # the repository as specified in Copr.runtime_dependencies
+    dependency = db.Column(db.Text, nullable=False)
+    # the project the copr:// repository points to, NULL for the external
+    # repositories and the non-existing projects
+    dependency_copr_id = db.Column(db.Integer,
+                                   db.ForeignKey("copr.id", ondelete="CASCADE"),
+                                   index=True)
+    # copr:// repository, but the project doesn't exist
+    missing = db.Column(db.Boolean, default=False, server_default="0",
+                        nullable=False)
+
+    dependency_copr = db.relationship("Copr", foreign_keys=[dependency_copr_id])
+
+
 class CoprPermission(db.Model, helpers.Serializer):
     """
     Association class for Copr<->Permission relation
@@ -888,7 +926,7 @@ class CoprDir(db.Model):
             return "{}-{}".format(self.copr.user.name, self.name)
 
 
-class Package(db.Model, helpers.Serializer, CoprSearchRelatedData):
+class Package(db.Model, helpers.Serializer):
     """
     Represents a single package in a project_dir.
     """
@@ -896,6 +934,7 @@ class Package(db.Model, helpers.Serializer, CoprSearchRelatedData):
     __table_args__ = (
         db.Index('package_copr_id_name', 'copr_id', 'name', unique=True),
         db.Index('package_webhook_sourcetype', 'webhook_rebuild', 'source_type'),
+        _trigram_index("package_name_trgm", "name"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -987,9 +1026,6 @@ class Package(db.Model, helpers.Serializer, CoprSearchRelatedData):
 
         return package_dict
 
-    def get_search_related_copr_id(self):
-        return self.copr.id
-
 
     @property
     def chroot_denylist(self):
@@ -1147,6 +1183,12 @@ class Build(db.Model, helpers.Serializer):
     # the info that the build was resubmitted
     resubmitted_from_id = db.Column(db.Integer)
 
+    # Materialized values of the `status` and `finished` properties, so we can
+    # filter and sort the builds in SQL.  These are kept up-to-date by the
+    # before_flush hook (see update_status()), NULL means "not yet computed".
+    _status = db.Column("status", db.Integer)
+    _finished = db.Column("finished", db.Boolean)
+
     __table_args__ = (
         db.Index('build_canceled', "canceled"),
         db.Index('build_order', "is_background", "id"),
@@ -1156,11 +1198,17 @@ class Build(db.Model, helpers.Serializer):
         db.Index('build_copr_id_package_id', "copr_id", "package_id"),
         db.Index("build_copr_id_build_id", "copr_id", "id", unique=True),
         db.Index("build_id_desc_per_copr_dir", id.desc(), "copr_dir_id"),
+        db.Index("build_copr_id_status_id", "copr_id", "status", "id"),
+        db.Index("build_finished", "finished"),
     )
 
     _cached_status = None
     _cached_status_set = None
 
+    # Set to True when source_status, canceled or any of the build_chroots
+    # changes, until the materialized _status and _finished are re-calculated.
+    _status_outdated = False
+
     @property
     def group_name(self):
         return self.copr.group.name
@@ -1335,9 +1383,10 @@ class Build(db.Model, helpers.Serializer):
         return StatusEnum(self.source_status)
 
     @property
-    def status(self):
+    def computed_status(self):
         """
-        Return build status.
+        Calculate the build status from source_status and the build_chroots
+        states.  Prefer the `status` attribute, this is expensive.
         """
         if self.canceled:
             return StatusEnum("canceled")
@@ -1373,6 +1422,20 @@ class Build(db.Model, helpers.Serializer):
 
         return None
 
+    @hybrid_property
+    def status(self):
+        """
+        Return build status.
+        """
+        if self._status_outdated or self._status is None:
+            return self.computed_status
+        return self._status
+
+    @status.expression
+    def status(cls):
+        # pylint: disable=no-self-argument
+        return cls._status
+
     @property
     def state(self):
         """
@@ -1421,7 +1484,7 @@ class Build(db.Model, helpers.Serializer):
         return False
 
     @property
-    def finished(self):
+    def computed_finished(self):
         """
         Find out if this build is in finished state.
 
@@ -1434,6 +1497,28 @@ class Build(db.Model, helpers.Serializer):
             return StatusEnum(self.source_status) in helpers.FINISHED_STATES
         return all([chroot.finished for chroot in self.build_chroots])
 
+    @hybrid_property
+    def finished(self):
+        """
+        Find out if this build is in finished state, see computed_finished.
+        """
+        if self._status_outdated or self._finished is None:
+            return self.computed_finished
+        return self._finished
+
+    @finished.expression
+    def finished(cls):
+        # pylint: disable=no-self-argument
+        return cls._finished
+
+    def update_status(self):
+        """
+        Re-calculate the materialized status and finished columns.
+        """
+        self._status = self.computed_status
+        self._finished = self.computed_finished
+        self._status_outdated = False
+
     @property
     def blocked(self):
         """
@@ -1462,6 +1547,9 @@ class Build(db.Model, helpers.Serializer):
         result["src_pkg"] = result["pkgs"]
         del result["pkgs"]
         del result["copr_id"]
+        # materialized columns, we provide "state" below
+        result.pop("status", None)
+        result.pop("finished", None)
 
         result['source_type'] = helpers.BuildSourceEnum(result['source_type'])
         result["state"] = self.state
@@ -2259,6 +2347,70 @@ class BuildChrootResult(db.Model, helpers.Serializer):
     )
 
 
+class LatestBuildChroot(db.Model):
+    """
+    The latest Build (the highest Build.id) in each CoprDir, for each Package
+    and MockChroot.  Together with build_id, the mock_chroot_id points to the
+    corresponding BuildChroot.  Maintained by BuildsMonitorLogic, so the
+    package monitor doesn't need to go through all the builds.
+    """
+
+    __tablename__ = "latest_build_chroot"
+
+    copr_dir_id = db.Column(
+        db.Integer, db.ForeignKey("copr_dir.id", ondelete="CASCADE"),
+        primary_key=True)
+    package_id = db.Column(
+        db.Integer, db.ForeignKey("package.id", ondelete="CASCADE"),
+        primary_key=True, index=True)
+    mock_chroot_id = db.Column(
+        db.Integer, db.ForeignKey("mock_chroot.id", ondelete="CASCADE"),
+        primary_key=True)
+    build_id = db.Column(
+        db.Integer, db.ForeignKey("build.id", ondelete="CASCADE"),
+        nullable=False, index=True)
+
+
+class PackageScmSource(db.Model):
+    """
+    The normalized SCM source of a Package (see
+    helpers.normalize_git_clone_url()), so the packages to be rebuilt upon a
+    push event are found by an indexed lookup.  Maintained by PackagesLogic
+    whenever Package.source_json changes.
+    """
+
+    __tablename__ = "package_scm_source"
+
+    package_id = db.Column(
+        db.Integer, db.ForeignKey("package.id", ondelete="CASCADE"),
+        primary_key=True)
+    clone_url = db.Column(db.Text, nullable=False, index=True)
+    committish = db.Column(db.Text, nullable=False, default="")
+    subdirectory = db.Column(db.Text, nullable=False, default="")
+
+
+class BackgroundJob(db.Model):
+    """
+    A side-effect of some database change (e.g. setting the Pagure flag, or
+    removing the uploaded sources) which doesn't need to block the HTTP
+    request.  Processed (and removed) by BackgroundJobsLogic.process().
+    """
+
+    __tablename__ = "background_job"
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    # JSON-encoded arguments for the job handler
+    data = db.Column(db.Text, nullable=False)
+    # time of queueing the job as returned by int(time.time())
+    created_on = db.Column(db.Integer, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0,
+                         server_default="0")
+    # don't (re-)try the job sooner than this, int(time.time())
+    run_after = db.Column(db.Integer, nullable=False, default=0,
+                          server_default="0")
+
+
 class LegalFlag(db.Model, helpers.Serializer):
     id = db.Column(db.Integer, primary_key=True)
     # message from user who raised the flag (what he thinks is wrong)
@@ -2391,6 +2543,10 @@ class Group(db.Model, helpers.Serializer):
     Represents FAS groups and their aliases in Copr
     """
 
+    __table_args__ = (
+        _trigram_index("group_name_trgm", "name"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(127))
 
@@ -2699,3 +2855,51 @@ def insert_fedora_distgit(*args, **kwargs):
         clone_package_uri="{namespace}/rpms/{pkgname}",
         default_namespace="",
     ))
+
+
+def _outdate_build_status(build):
+    if isinstance(build, Build):
+        build._status_outdated = True  # pylint: disable=protected-access
+
+
+@listens_for(Build.source_status, "set")
+@listens_for(Build.canceled, "set")
+def build_state_changed(target, _value, _oldvalue, _initiator):
+    """ Build.status needs to be re-calculated """
+    _outdate_build_status(target)
+
+
+@listens_for(BuildChroot.status, "set")
+def build_chroot_state_changed(target, _value, _oldvalue, _initiator):
+    """ Build.status needs to be re-calculated """
+    session = object_session(target)
+    if session is None:
+        _outdate_build_status(target.build)
+        return
+    # The lazy-load of build mustn't flush the half-modified chroot.
+    with session.no_autoflush:
+        _outdate_build_status(target.build)
+
+
+@listens_for(BuildChroot.build, "set")
+def build_chroot_moved(_target, value, oldvalue, _initiator):
+    """ BuildChroot added or removed, re-calculate Build.status """
+    _outdate_build_status(value)
+    _outdate_build_status(oldvalue)
+
+
+@listens_for(db.session, "before_flush")
+def update_builds_status(session, _flush_context, _instances):
+    """
+    Store the re-calculated Build.status and Build.finished values to database
+    before the modified builds (or build chroots) are flushed.
+    """
+    builds = set()
+    for obj in itertools.chain(session.new, session.dirty):
+        if isinstance(obj, BuildChroot):
+            obj = obj.build
+        if isinstance(obj, Build) and obj._status_outdated:  # pylint: disable=protected-access
+            builds.add(obj)
+
+    for build in builds:
+        build.update_status()
@@ -1,3 +1,4 @@
+import base64
 import json
 import flask
 import wtforms
@@ -101,6 +102,7 @@ class PaginationForm(wtforms.Form):
     order = wtforms.StringField("Order by", validators=[wtforms.validators.Optional()])
     order_type = wtforms.SelectField("Order type", validators=[wtforms.validators.Optional()],
                                      choices=[("ASC", "ASC"), ("DESC", "DESC")], default="ASC")
+    cursor = wtforms.StringField("Cursor", validators=[wtforms.validators.Optional()])
 
 
 def get_copr(ownername=None, projectname=None):
@@ -111,11 +113,18 @@ def get_copr(ownername=None, projectname=None):
 
 
 class Paginator(object):
+    """
+    Paginate the query results.  Either by LIMIT/OFFSET, or by the opaque
+    `cursor` (keyset pagination) which is much faster for the large offsets.
+    The cursor for the next page is returned in `meta["next_cursor"]`, if
+    the page is full.
+    """
     LIMIT = None
     OFFSET = 0
     ORDER = "id"
 
-    def __init__(self, query, model, limit=None, offset=None, order=None, order_type=None, **kwargs):
+    def __init__(self, query, model, limit=None, offset=None, order=None, order_type=None,
+                 cursor=None, **kwargs):
         self.query = query
         self.model = model
         self.limit = limit or self.LIMIT
@@ -128,15 +137,16 @@ class Paginator(object):
                 self.order_type = 'DESC'
             if self.order == 'name':
                 self.order_type = 'ASC'
+        self.cursor = cursor or None
+        self.next_cursor = None
+        if self.cursor:
+            # the cursor already points to the right place
+            self.offset = 0
 
     def get(self):
         return self.paginate_query(self.query)
 
-    def paginate_query(self, query):
-        """
-        Return `self.query` with all pagination parameters (limit, offset,
-        order) but do not run it.
-        """
+    def _order_attr(self):
         order_attr = getattr(self.model, self.order, None)
         if not order_attr:
             msg = "Cannot order by {}, {} doesn't have such property".format(
@@ -148,25 +158,104 @@ class Paginator(object):
         if not isinstance(order_attr, InstrumentedAttribute):
             raise CoprHttpException("Cannot order by {}".format(self.order))
 
+        return order_attr
+
+    def _order_by(self, order_attr):
         order_fun = (lambda x: x)
         if self.order_type == 'ASC':
             order_fun = sqlalchemy.asc
         elif self.order_type == 'DESC':
             order_fun = sqlalchemy.desc
 
-        return (query.order_by(order_fun(order_attr))
+        # The ID makes the order stable, even if the order_attr values repeat
+        clauses = [order_fun(order_attr)]
+        if self.order != "id":
+            clauses.append(order_fun(self.model.id))
+        return clauses
+
+    def _cursor_supported(self, order_attr):
+        """
+        The (order_attr, id) comparison doesn't work with NULL values, so the
+        cursor is only available when ordering by a NOT NULL column.
+        """
+        if self.order == "id":
+            return True
+        columns = getattr(order_attr.property, "columns", [])
+        return len(columns) == 1 and not columns[0].nullable
+
+    def _cursor_filter(self, order_attr):
+        if not self._cursor_supported(order_attr):
+            raise BadRequest("Cursor pagination is not supported for "
+                             "order={}, use offset".format(self.order))
+        try:
+            order, value, last_id = json.loads(
+                base64.urlsafe_b64decode(self.cursor.encode("ascii")))
+        except (ValueError, TypeError) as ex:
+            raise BadRequest("Invalid pagination cursor") from ex
+        if order != self.order:
+            raise BadRequest("The pagination cursor was created for "
+                             "order={}".format(order))
+
+        if self.order == "id":
+            key, last = self.model.id, last_id
+        else:
+            key = sqlalchemy.tuple_(order_attr, self.model.id)
+            last = sqlalchemy.tuple_(value, last_id)
+
+        if self.order_type == "DESC":
+            return key < last
+        return key > last
+
+    def _set_next_cursor(self, items):
+        """
+        Remember the cursor pointing right after the last item
+        """
+        self.next_cursor = None
+        if not self.limit or len(items) < self.limit:
+            return
+        if not self._cursor_supported(self._order_attr()):
+            # NULLs would be skipped by the cursor filter, use offset
+            return
+
+        last = items[-1]
+        value = getattr(last, self.order)
+        if value is None or not isinstance(value, (int, float, str)):
+            # Nothing we could compare to, use offset
+            return
+        data = json.dumps([self.order, value, last.id]).encode("utf-8")
+        self.next_cursor = base64.urlsafe_b64encode(data).decode("ascii")
+
+    def paginate_query(self, query):
+        """
+        Return `self.query` with all pagination parameters (limit, offset,
+        order, cursor) but do not run it.
+        """
+        order_attr = self._order_attr()
+        if self.cursor:
+            query = query.filter(self._cursor_filter(order_attr))
+
+        return (query.order_by(*self._order_by(order_attr))
                 .limit(self.limit)
                 .offset(self.offset))
 
     @property
     def meta(self):
-        return {k: getattr(self, k) for k in ["limit", "offset", "order", "order_type"]}
+        return {k: getattr(self, k) for k in ["limit", "offset", "order", "order_type",
+                                              "cursor", "next_cursor"]}
+
+    def all(self):
+        """
+        Return the list of objects on this page
+        """
+        items = list(self.get())
+        self._set_next_cursor(items)
+        return items
 
     def map(self, fun):
-        return [fun(x) for x in self.get()]
+        return [fun(x) for x in self.all()]
 
     def to_dict(self):
-        return [x.to_dict() for x in self.get()]
+        return [x.to_dict() for x in self.all()]
 
 
 class SubqueryPaginator(Paginator):
@@ -179,12 +268,15 @@ class SubqueryPaginator(Paginator):
     def __init__(self, query, subquery, *args, **kwargs):
         super().__init__(query, *args, **kwargs)
         self.pk = getattr(self.model, "id")
-        self.subquery = subquery.with_entities(self.pk)
+        # Only the paginator's ordering applies, otherwise the cursor wouldn't
+        # match the order of the results.
+        self.subquery = subquery.with_entities(self.pk).order_by(None)
 
     def get(self):
         subquery = self.paginate_query(self.subquery).subquery()
-        query = self.query.filter(self.pk.in_(subquery))
-        return query.all()
+        query = self.query.filter(self.pk.in_(sqlalchemy.select(subquery)))
+        query = query.order_by(None)
+        return query.order_by(*self._order_by(self._order_attr())).all()
 
 
 class ListPaginator(Paginator):
@@ -198,6 +290,9 @@ class ListPaginator(Paginator):
     It isn't efficient, it isn't pretty. Please use `Paginator` if you can.
     """
     def get(self):
+        if self.cursor:
+            raise BadRequest("Cursor pagination is not supported here")
+
         objects = self.query
         reverse = self.order_type != "ASC"
 
@@ -215,6 +310,9 @@ class ListPaginator(Paginator):
 
         return objects[self.offset : limit]
 
+    def _set_next_cursor(self, items):
+        self.next_cursor = None
+
 
 def set_defaults(formdata, form_class):
     """
@@ -152,15 +152,6 @@ class ListBuild(Resource):
         """
         copr = get_copr(ownername, projectname)
 
-        # WORKAROUND
-        # We can't filter builds by status directly in the database, because we
-        # use a logic in Build.status property to determine a build status.
-        # Therefore if we want to filter by `status`, we need to query all builds
-        # and filter them in the application and then return the desired number.
-        limit = kwargs["limit"]
-        paginator_limit = None if status else kwargs["limit"]
-        del kwargs["limit"]
-
         # Loading relationships straight away makes running `to_dict` somewhat
         # faster, which adds up over time, and  brings a significant speedup for
         # large projects
@@ -174,15 +165,16 @@ class ListBuild(Resource):
         subquery = query.filter(models.Build.copr == copr)
         if packagename:
             subquery = BuildsLogic.filter_by_package_name(subquery, packagename)
+        if status:
+            try:
+                subquery = subquery.filter(models.Build.status == StatusEnum(status))
+            except KeyError as ex:
+                raise BadRequest("Unknown build status '{0}'".format(status)) from ex
 
-        paginator = SubqueryPaginator(query, subquery, models.Build, limit=paginator_limit, **kwargs)
+        paginator = SubqueryPaginator(query, subquery, models.Build, **kwargs)
 
         builds = paginator.map(to_dict)
 
-        if status:
-            builds = [b for b in builds if b["state"] == status][:limit]
-            paginator.limit = limit
-
         return {"items": builds, "meta": paginator.meta}
 
 
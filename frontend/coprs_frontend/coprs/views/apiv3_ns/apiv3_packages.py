@@ -157,7 +157,7 @@ class PackageGetList(Resource):
         copr = get_copr(ownername, projectname)
         query = PackagesLogic.get_all(copr.id)
         paginator = Paginator(query, models.Package, **kwargs)
-        packages = paginator.get().all()
+        packages = paginator.all()
 
         if len(packages) > MAX_PACKAGES_WITHOUT_PAGINATION:
             raise ApiError("Too many packages, please use pagination. "
@@ -13,13 +13,13 @@ from coprs.logic.coprs_logic import (
 )
 
 from coprs.logic.complex_logic import (
-    ComplexLogic
+    ComplexLogic,
+    ConfigVersionLogic,
+    ReposLogic,
 )
 
 from coprs.views.apiv3_ns import api
 
-from coprs import cache
-from coprs.logic.complex_logic import ReposLogic
 from coprs.logic.stat_logic import CounterStatLogic
 from coprs.helpers import (
     get_stat_name,
@@ -35,19 +35,27 @@ apiv3_rpmrepo_ns = Namespace("rpmrepo", description="RPM Repo")
 api.add_namespace(apiv3_rpmrepo_ns)
 
 
-@cache.memoize(timeout=2*60)
 def get_project_rpmrepo_metadata(copr):
     """
     Get the copr-related JSON data with available
     chroots/directories/external/etc.  This is parsed by DNF5 copr plugin.
-    We cache (memoize) this for several minutes because generating the data can
-    be relatively DB demanding (for rather larger dependency trees).
+    We cache this until the project (or any of its dependencies) changes
+    because generating the data can be relatively DB demanding (for rather
+    larger dependency trees).
+    """
+    return ConfigVersionLogic.cached(
+        "rpmrepo_metadata_{}".format(copr.id), copr,
+        lambda: _generate_project_rpmrepo_metadata(copr))
+
+
+def _generate_project_rpmrepo_metadata(copr):
+    """
+    Return the (data, dependencies) pair for get_project_rpmrepo_metadata()
     """
 
     # pylint: disable=too-many-locals
 
-    repo_dl_stat = CounterStatLogic.get_copr_repo_dl_stat(copr)
-    repos_info = ReposLogic.repos_for_copr(copr, repo_dl_stat)
+    repos_info = ReposLogic.repos_for_copr(copr, None)
 
     data = {
         "results_url": "/".join([app.config["BACKEND_BASE_URL"], "results"]),
@@ -135,7 +143,7 @@ def get_project_rpmrepo_metadata(copr):
             }
         })
 
-    return data
+    return data, internal_deps
 
 
 @apiv3_rpmrepo_ns.route("/<ownername>/<dirname>/<name_release>")
@@ -151,5 +159,5 @@ class RpmRepo(Resource):
             copr_dir=copr.main_dir,
             name_release=name_release,
         )
-        CounterStatLogic.incr(name=name, counter_type=CounterStatType.REPO_DL)
+        CounterStatLogic.buffer_incr(name=name, counter_type=CounterStatType.REPO_DL)
         return get_project_rpmrepo_metadata(copr)
@@ -227,6 +227,16 @@ order_type = String(
     example="DESC",
 )
 
+cursor = String(
+    description="Opaque cursor, taken from the 'next_cursor' of the previous "
+                "page (use instead of offset)",
+)
+
+next_cursor = String(
+    description="Cursor pointing to the next page, if there is one (not "
+                "available when ordering by a nullable column)",
+)
+
 
 build_enable_net = Boolean(
     description="Enable networking for the builds",
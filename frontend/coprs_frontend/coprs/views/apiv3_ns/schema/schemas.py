@@ -161,9 +161,15 @@ class PaginationMeta(ParamsSchema):
     offset: Integer = fields.offset
     order: String = fields.order
     order_type: String = fields.order_type
+    cursor: String = fields.cursor
 
 
-_pagination_meta_model = PaginationMeta.get_cls().model()
+@dataclass
+class PaginationMetaResponse(PaginationMeta):
+    next_cursor: String = fields.next_cursor
+
+
+_pagination_meta_model = PaginationMetaResponse.get_cls().model()
 
 
 @dataclass
@@ -1,6 +1,8 @@
+import uuid
+
 import flask
 from copr_common.enums import StatusEnum, ActionTypeEnum, StorageEnum, FailTypeEnum
-from coprs import db, app
+from coprs import db, app, cache
 from coprs import models
 from coprs.logic import actions_logic
 from coprs.logic.builds_logic import BuildsLogic
@@ -25,7 +27,7 @@ def send_frontend_version(response):
     setup the version according to our needs.
     For the backend counterpart, see the `MIN_FE_BE_API` constant.
     """
-    response.headers['Copr-FE-BE-API-Version'] = '9'
+    response.headers['Copr-FE-BE-API-Version'] = '10'
     return response
 
 
@@ -114,9 +116,8 @@ def dist_git_upload_completed():
 
     build.source_status = final_source_status
     db.session.add(build)
-    db.session.commit()
-
     BuildsLogic.delete_local_source(build)
+    db.session.commit()
     return flask.jsonify({"updated": True})
 
 
@@ -187,7 +188,7 @@ def get_build_record(task, for_backend=False):
     if modules:
         build_record["modules"] = {'toggle': modules}
 
-    build_config = BuildConfigLogic.generate_build_config(
+    build_config = BuildConfigLogic.get_build_config(
         task.build.copr_dir, task.mock_chroot.name)
     build_record["repos"] = build_config.get("repos")
     build_record["buildroot_pkgs"] = build_config.get("additional_packages")
@@ -376,6 +377,152 @@ def pending_jobs():
     return streamed_json(_stream())
 
 
+# How long we remember the pending-jobs-delta snapshots, in seconds
+PENDING_JOBS_SNAPSHOT_TIMEOUT = 3600
+
+
+def _pending_jobs_snapshot_key(token):
+    return "pending-jobs-snapshot-{}".format(token)
+
+
+def _pending_job_fingerprint(background, tags_raw=None, chroot_tags_raw=None):
+    """
+    Summary of the task attributes that may change while the task is still in
+    the queue, and that are important to Backend (see get_build_record()).
+    """
+    return (bool(background), tags_raw, chroot_tags_raw)
+
+
+def _pending_jobs_full():
+    """
+    Return the full build queue (see pending_jobs()), and the corresponding
+    snapshot (task_id => fingerprint) for the subsequent delta requests.
+    """
+    args = {"data_type": "for_backend"}
+    records = []
+    snapshot = {}
+
+    cache_batches = set()
+    for build in BuildsLogic.get_pending_srpm_build_tasks(**args):
+        cache_batches.add(build.batch)
+        if build.blocked:
+            continue
+        record = get_srpm_build_record(build, for_backend=True)
+        snapshot[record["task_id"]] = _pending_job_fingerprint(
+            build.is_background)
+        records.append(record)
+
+    for build_chroot in BuildsLogic.get_pending_build_tasks(**args):
+        cache_batches.add(build_chroot.build.batch)
+        if build_chroot.build.blocked:
+            continue
+        record = get_build_record(build_chroot, for_backend=True)
+        snapshot[record["task_id"]] = _pending_job_fingerprint(
+            build_chroot.build.is_background,
+            build_chroot.tags_raw,
+            build_chroot.mock_chroot.tags_raw,
+        )
+        records.append(record)
+
+    return records, snapshot
+
+
+def _pending_jobs_changes(previous):
+    """
+    Compare the current build queue with the ``previous`` snapshot.  Only the
+    task IDs and fingerprints are queried for the whole queue, the (more
+    expensive) task records are generated only for the new or changed tasks.
+    Return the list of changed records, removed task IDs, and the new snapshot.
+    """
+    mock_chroots = {mch.id: mch for mch in models.MockChroot.query.all()}
+    blocked_batches = {}
+
+    def _blocked(batch_id):
+        if batch_id is None:
+            return False
+        if batch_id not in blocked_batches:
+            batch = db.session.get(models.Batch, batch_id)
+            blocked_batches[batch_id] = bool(batch and batch.blocked)
+        return blocked_batches[batch_id]
+
+    snapshot = {}
+    changed_builds = []
+    for build_id, background, batch_id in \
+            BuildsLogic.get_pending_srpm_build_task_rows():
+        if _blocked(batch_id):
+            continue
+        task_id = str(build_id)
+        snapshot[task_id] = _pending_job_fingerprint(background)
+        if previous.get(task_id) != snapshot[task_id]:
+            changed_builds.append(build_id)
+
+    changed_build_chroots = []
+    for bch_id, build_id, mock_chroot_id, tags_raw, background, batch_id in \
+            BuildsLogic.get_pending_build_task_rows():
+        if _blocked(batch_id):
+            continue
+        mock_chroot = mock_chroots[mock_chroot_id]
+        task_id = "{}-{}".format(build_id, mock_chroot.name)
+        snapshot[task_id] = _pending_job_fingerprint(
+            background, tags_raw, mock_chroot.tags_raw)
+        if previous.get(task_id) != snapshot[task_id]:
+            changed_build_chroots.append(bch_id)
+
+    args = {"data_type": "for_backend"}
+    records = []
+    if changed_builds:
+        for build in BuildsLogic.get_pending_srpm_build_tasks(**args).filter(
+                models.Build.id.in_(changed_builds)):
+            record = get_srpm_build_record(build, for_backend=True)
+            if record["task_id"] in snapshot:
+                records.append(record)
+
+    if changed_build_chroots:
+        for build_chroot in BuildsLogic.get_pending_build_tasks(**args).filter(
+                models.BuildChroot.id.in_(changed_build_chroots)):
+            record = get_build_record(build_chroot, for_backend=True)
+            if record["task_id"] in snapshot:
+                records.append(record)
+
+    removed = list(set(previous) - set(snapshot))
+    return records, removed, snapshot
+
+
+@backend_ns.route("/pending-jobs-delta/")
+@backend_ns.route("/pending-jobs-delta/<token>/")
+def pending_jobs_delta(token=None):
+    """
+    Incremental variant of the /pending-jobs/ route.  Return the tasks that
+    were added (or changed) and removed since the ``token`` was generated,
+    together with a new token for the subsequent call.  When no token is
+    given, or when we don't remember it anymore, the full queue is returned
+    (and the "full" flag is set).
+    """
+    previous = None
+    if token:
+        previous = cache.get(_pending_jobs_snapshot_key(token))
+        # Each token is used only once, don't waste the Redis memory.
+        cache.delete(_pending_jobs_snapshot_key(token))
+
+    if previous is None:
+        app.logger.info("Generating the full build queue")
+        changed, snapshot = _pending_jobs_full()
+        removed = []
+    else:
+        changed, removed, snapshot = _pending_jobs_changes(previous)
+
+    new_token = uuid.uuid4().hex
+    cache.set(_pending_jobs_snapshot_key(new_token), snapshot,
+              timeout=PENDING_JOBS_SNAPSHOT_TIMEOUT)
+
+    return flask.jsonify({
+        "token": new_token,
+        "full": previous is None,
+        "changed": changed,
+        "removed": removed,
+    })
+
+
 @backend_ns.route("/get-build-task/<int:build_id>-<chroot>/")
 @backend_ns.route("/get-build-task/<int:build_id>-<chroot>")
 def get_build_task(build_id, chroot):
@@ -418,17 +565,11 @@ def update():
         for obj in request_data[typ]:
             to_update[obj["id"]] = obj
 
-        existing = {}
-        for obj in logic_cls.get_by_ids(to_update.keys()).all():
-            existing[obj.id] = obj
-
-        non_existing_ids = list(set(to_update.keys()) - set(existing.keys()))
-
-        for i, obj in existing.items():
-            logic_cls.update_state_from_dict(obj, to_update[i])
+        existing_ids = logic_cls.update_states_from_dicts(to_update)
+        non_existing_ids = list(set(to_update.keys()) - set(existing_ids))
 
         db.session.commit()
-        result.update({"updated_{0}_ids".format(typ): list(existing.keys()),
+        result.update({"updated_{0}_ids".format(typ): existing_ids,
                        "non_existing_{0}_ids".format(typ): non_existing_ids})
 
     return flask.jsonify(result)
@@ -4,7 +4,6 @@ Set of general Copr Frontend Flask routes.
 
 import os
 import time
-import subprocess
 import json
 from itertools import groupby
 import base64
@@ -19,7 +18,6 @@ from markupsafe import Markup
 
 from copr_common.enums import CreaterepoReason
 from coprs import app
-from coprs import cache
 from coprs import db
 from coprs import exceptions
 from coprs import forms
@@ -31,7 +29,11 @@ from coprs.logic.stat_logic import CounterStatLogic
 from coprs.logic.webhooks_logic import WebhooksLogic
 from coprs.mail import send_mail, LegalFlagMessage, PermissionRequestMessage, PermissionChangeMessage
 
-from coprs.logic.complex_logic import ComplexLogic, ReposLogic
+from coprs.logic.complex_logic import (
+    ComplexLogic,
+    ConfigVersionLogic,
+    ReposLogic,
+)
 from coprs.logic.outdated_chroots_logic import OutdatedChrootsLogic
 from coprs.repos import (
     pre_process_repo_url,
@@ -937,12 +939,28 @@ def render_generate_repo_file(copr_dir, name_release, arch=None):
         copr_dir=copr_dir,
         name_release=name_release,
     )
-    CounterStatLogic.incr(name=name, counter_type=CounterStatType.REPO_DL)
-    db.session.commit()
-    return render_generate_repo_file_cached(copr_dir, name_release, arch=arch)
+    CounterStatLogic.buffer_incr(name=name, counter_type=CounterStatType.REPO_DL)
+
+    # The .repo file is cached until the project (or its dependency) changes
+    key = "repo_file_{}_{}_{}".format(copr_dir.id, name_release, arch)
+    response_content = ConfigVersionLogic.cached(
+        key, copr_dir.copr,
+        lambda: _generate_repo_file_content(copr_dir, name_release, arch))
+
+    response = flask.make_response(response_content)
+
+    response.mimetype = "text/plain"
+    response.headers["Content-Disposition"] = \
+        "filename={0}.repo".format(copr_dir.repo_name)
+
+    return response
+
 
-@cache.memoize(timeout=5*60)
-def render_generate_repo_file_cached(copr_dir, name_release, arch=None):
+def _generate_repo_file_content(copr_dir, name_release, arch=None):
+    """
+    Return the (repo file content, dependencies) pair for
+    render_generate_repo_file()
+    """
     copr = copr_dir.copr
 
     # redirect the aliased chroot only if it is not enabled yet
@@ -1022,13 +1040,7 @@ def render_generate_repo_file_cached(copr_dir, name_release, arch=None):
             "on a Copr project {0} but that doesn't exist.".format(dep[7:])
         )
 
-    response = flask.make_response(response_content)
-
-    response.mimetype = "text/plain"
-    response.headers["Content-Disposition"] = \
-        "filename={0}.repo".format(copr_dir.repo_name)
-
-    return response
+    return response_content, internal_deps
 
 
 @coprs_ns.route("/<username>/<coprname>/monitor/")
@@ -1118,9 +1130,3 @@ def copr_fork_post(copr):
 @req_with_copr
 def copr_forks(copr):
     return flask.render_template("coprs/detail/forks.html", copr=copr)
-
-
-@coprs_ns.route("/update_search_index/", methods=["POST"])
-def copr_update_search_index():
-    subprocess.call(['/usr/share/copr/coprs_frontend/manage.py', 'update-indexes-quick', '1'])
-    return "OK"
@@ -19,8 +19,7 @@ def ping():
 def increment(counter_type, name):
     app.logger.debug(flask.request.remote_addr)
 
-    CounterStatLogic.incr(name, counter_type)
-    db.session.commit()
+    CounterStatLogic.buffer_incr(name, counter_type)
     return "", 201
 
 
@@ -26,8 +26,6 @@ import commands.alter_user
 import commands.add_user
 import commands.dump_user
 import commands.update_indexes
-import commands.update_indexes_quick
-import commands.update_indexes_required
 import commands.get_admins
 import commands.fail_build
 import commands.rawhide_to_release
@@ -38,6 +36,10 @@ import commands.delete_outdated_chroots
 import commands.eol_lifeless_rolling_chroots
 import commands.clean_expired_projects
 import commands.clean_old_builds
+import commands.backfill_build_status
+import commands.flush_counter_stats
+import commands.process_background_jobs
+import commands.resolve_runtime_dependencies
 import commands.delete_orphans
 import commands.fixup_unnoticed_chroots
 import commands.chroots_template
@@ -79,10 +81,8 @@ commands_list =	[
     "add_user",
     "dump_user",
 
-    # Whooshee indexes
+    # Search indexes
     "update_indexes",
-    "update_indexes_quick",
-    "update_indexes_required",
 
     # Other
     "get_admins",
@@ -95,6 +95,10 @@ commands_list =	[
     "eol_lifeless_rolling_chroots",
     "clean_expired_projects",
     "clean_old_builds",
+    "backfill_build_status",
+    "flush_counter_stats",
+    "process_background_jobs",
+    "resolve_runtime_dependencies",
     "delete_orphans",
     "delete_dirs",
     "warning_banner",
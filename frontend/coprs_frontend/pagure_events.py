@@ -1,6 +1,5 @@
 #!/usr/bin/python3
 
-import json
 import pprint
 import sys
 import os
@@ -9,8 +8,6 @@ from urllib.parse import urlparse
 
 import munch
 
-from sqlalchemy.sql import text
-
 from copr_common.request import SafeRequest, RequestError
 
 sys.path.append(
@@ -23,7 +20,7 @@ from coprs import db, app, models
 from coprs.exceptions import BadRequest
 from coprs.logic.coprs_logic import CoprDirsLogic
 from coprs.logic.builds_logic import BuildsLogic
-from coprs.logic.complex_logic import ComplexLogic
+from coprs.logic.packages_logic import PackagesLogic
 from coprs import helpers
 
 
@@ -54,35 +51,29 @@ def get_repeatedly(url):
 
 
 class ScmPackage(object):
-    def __init__(self, db_row):
-        self.source_json_dict = json.loads(db_row.source_json)
-        self.clone_url = self.source_json_dict.get('clone_url') or ''
-        self.committish = self.source_json_dict.get('committish') or ''
-        self.subdirectory = self.source_json_dict.get('subdirectory') or ''
-
-        self.package = ComplexLogic.get_package_by_id(db_row.id)
-        self.copr = self.package.copr
+    def __init__(self, package, scm_source):
+        self.package = package
+        self.copr = package.copr
+        self.committish = scm_source.committish
+        self.subdirectory = scm_source.subdirectory
 
     def build(self, source_dict_update, copr_dir, update_callback,
               scm_object_type, scm_object_id, scm_object_url, agent_url):
-
-        if db.engine.url.drivername != 'sqlite':
-            db.session.execute(text('LOCK TABLE build IN EXCLUSIVE MODE'))
-
         return BuildsLogic.rebuild_package(
             self.package, source_dict_update, copr_dir, update_callback,
             scm_object_type, scm_object_id, scm_object_url, submitted_by=agent_url)
 
     @classmethod
     def get_candidates_for_rebuild(cls, clone_url):
-        rows = models.Package.query \
-            .join(models.Copr) \
+        """
+        Packages built from the CLONE_URL repository, with the webhook
+        rebuilds enabled.
+        """
+        rows = PackagesLogic.get_by_clone_url(clone_url) \
             .filter(models.Copr.deleted.is_(False)) \
-            .filter(models.Package.source_type.in_(SUPPORTED_SOURCE_TYPES)) \
-            .filter(models.Package.webhook_rebuild) \
-            .filter(models.Package.source_json.ilike('%' + clone_url + '%'))
+            .filter(models.Package.source_type.in_(SUPPORTED_SOURCE_TYPES))
 
-        return [ScmPackage(row) for row in rows]
+        return [ScmPackage(package, scm_source) for package, scm_source in rows]
 
 
     def is_dir_in_commit(self, changed_files):
@@ -274,14 +265,13 @@ class build_on_fedmsg_loop():
                     pkg.package.id
             )
             log.info('Considering package: {}, source_json: {}'
-                        .format(package, pkg.source_json_dict))
+                        .format(package, pkg.package.source_json))
 
             if not pkg.copr.active_copr_chroots:
                 log.info("No active chroots in this project, skipped.")
                 continue
 
-            if (git_compare_urls(pkg.clone_url, event_info.base_clone_url)
-                    and (not pkg.committish or event_info.branch_to.endswith(pkg.committish))
+            if ((not pkg.committish or event_info.branch_to.endswith(pkg.committish))
                     and pkg.is_dir_in_commit(changed_files)):
 
                 log.info('\t -> accepted.')
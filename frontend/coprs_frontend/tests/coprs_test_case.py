@@ -20,6 +20,10 @@ from coprs import models
 from coprs import cache
 from coprs.logic.coprs_logic import BranchesLogic, CoprChrootsLogic
 from coprs.logic.dist_git_logic import DistGitLogic
+from coprs.logic.stat_logic import (
+    CounterStatLogic,
+    REDIS_COUNTERS_KEY,
+)
 
 from tests.request_test_api import WebUIRequests, API3Requests, BackendRequests
 from tests.lib.pagure_pull_requests import PullRequestTrigger
@@ -91,6 +95,7 @@ class CoprsTestCase(object):
 
         self.app.config = self.original_config.copy()
         cache.clear()
+        CounterStatLogic.redis().delete(REDIS_COUNTERS_KEY)
         self.context.pop()
 
     @staticmethod
@@ -8,7 +8,7 @@ import json
 import pytest
 
 from bs4 import BeautifulSoup
-from copr_common.enums import BuildSourceEnum
+from copr_common.enums import BuildSourceEnum, StatusEnum
 from coprs.logic.builds_logic import BuildChrootResultsLogic
 
 from tests.coprs_test_case import CoprsTestCase, TransactionDecorator
@@ -314,3 +314,60 @@ class TestAPIv3BuildsResults(CoprsTestCase):
         result = self.tc.get(endpoint)
         assert result.is_json
         assert result.json["fedora-18-x86_64"] == built_packages
+
+
+class TestAPIv3BuildsList(CoprsTestCase):
+    """
+    Tests related to listing builds
+    """
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots",
+                             "f_builds", "f_db")
+    def test_list_builds_by_status(self):
+        """
+        The status filter is done in SQL, and the pagination still works
+        """
+        def _list(**params):
+            params.update({"ownername": "user1", "projectname": "foocopr"})
+            return self.tc.get("/api_3/build/list", query_string=params)
+
+        result = _list(status="succeeded")
+        assert [b["id"] for b in result.json["items"]] == [self.b1.id]
+
+        result = _list(status="importing")
+        assert [b["id"] for b in result.json["items"]] == [self.b2.id]
+
+        self.b1.source_status = StatusEnum("importing")
+        self.db.session.commit()
+        result = _list(status="importing", limit=1)
+        assert [b["id"] for b in result.json["items"]] == [self.b1.id]
+        assert result.json["meta"]["limit"] == 1
+        result = _list(status="importing", limit=1, offset=1)
+        assert [b["id"] for b in result.json["items"]] == [self.b2.id]
+        result = _list(status="importing", order_type="DESC")
+        assert [b["id"] for b in result.json["items"]] == [self.b2.id,
+                                                           self.b1.id]
+
+        result = _list(status="foo")
+        assert result.status_code == 400
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots",
+                             "f_builds", "f_db")
+    def test_list_builds_cursor(self):
+        """
+        The keyset pagination works with the subquery paginator, too
+        """
+        params = {"ownername": "user1", "projectname": "foocopr", "limit": 1}
+        result = self.tc.get("/api_3/build/list", query_string=params)
+        assert [b["id"] for b in result.json["items"]] == [self.b1.id]
+        assert result.json["meta"]["order_type"] == "ASC"
+
+        params["cursor"] = result.json["meta"]["next_cursor"]
+        result = self.tc.get("/api_3/build/list", query_string=params)
+        assert [b["id"] for b in result.json["items"]] == [self.b2.id]
+        assert result.json["meta"]["offset"] == 0
+
+        params["cursor"] = result.json["meta"]["next_cursor"]
+        result = self.tc.get("/api_3/build/list", query_string=params)
+        assert result.json["items"] == []
+        assert result.json["meta"]["next_cursor"] is None
@@ -31,6 +31,61 @@ class TestApiv3Projects(CoprsTestCase):
         assert [p["id"] for p in projects3] == [3, 1, 2]
         assert projects3 == list(reversed(projects2))
 
+    @pytest.mark.parametrize("order, expected", [
+        ("order=id&order_type=DESC", [3, 2, 1]),
+        ("order=name&order_type=DESC", [2, 1, 3]),
+        ("order=name&order_type=ASC", [3, 1, 2]),
+    ])
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_db")
+    def test_get_project_list_cursor(self, order, expected):
+        """ Walk through the projects with the keyset pagination """
+        url = "/api_3/project/list?limit=2&" + order
+        seen = []
+        pages = 0
+        while url:
+            response = self.tc.get(url)
+            assert response.status_code == 200
+            seen += [p["id"] for p in response.json["items"]]
+            pages += 1
+            cursor = response.json["meta"]["next_cursor"]
+            url = None
+            if cursor:
+                url = "/api_3/project/list?limit=2&{0}&cursor={1}".format(
+                    order, cursor)
+        assert seen == expected
+        assert pages == 2
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_db")
+    def test_get_project_list_invalid_cursor(self):
+        response = self.tc.get("/api_3/project/list?limit=1&order=name")
+        cursor = response.json["meta"]["next_cursor"]
+        assert cursor
+
+        response = self.tc.get("/api_3/project/list?cursor=" + cursor)
+        assert response.status_code == 400
+        assert "order=name" in response.json["error"]
+
+        response = self.tc.get("/api_3/project/list?cursor=foo")
+        assert response.status_code == 400
+        assert "Invalid pagination cursor" in response.json["error"]
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_db")
+    def test_get_project_list_nullable_order(self):
+        """ No cursor for the nullable columns, the offset still works """
+        url = "/api_3/project/list?limit=2&order=description"
+        response = self.tc.get(url)
+        assert response.status_code == 200
+        assert len(response.json["items"]) == 2
+        assert response.json["meta"]["next_cursor"] is None
+
+        response = self.tc.get(url + "&offset=2")
+        assert response.status_code == 200
+        assert len(response.json["items"]) == 1
+
+        response = self.tc.get(url + "&cursor=foo")
+        assert response.status_code == 400
+        assert "use offset" in response.json["error"]
+
     def test_get_project_packit_forge_projects_allowed(self, f_users, f_coprs,
                                                         f_mock_chroots, f_db):
         """
@@ -79,7 +134,6 @@ class TestApiv3Projects(CoprsTestCase):
         copr = self.db.session.get(self.models.Copr, copr_id)
         data = copy.deepcopy(copr.__dict__)
         data.pop("_sa_instance_state")
-        data.pop("latest_indexed_data_update")
         return data
 
     @pytest.mark.usefixtures("f_u1_ts_client", "f_mock_chroots", "f_db")
@@ -182,7 +236,7 @@ class TestApiv3Projects(CoprsTestCase):
         for item in [
             "created_on", "deleted", "scm_api_auth_json", "scm_api_type",
             "scm_repo_url", "id", "name", "user_id", "group_id",
-            "webhook_secret", "forked_from_id", "latest_indexed_data_update",
+            "webhook_secret", "forked_from_id", "search_vector",
             "copr_id", "persistent", "playground", "storage",
         ]:
             should_test.remove(item)
@@ -1,5 +1,9 @@
 from datetime import datetime, timedelta
+from unittest import mock
+
 import pytest
+
+from coprs.views.apiv3_ns import apiv3_rpmrepo
 from tests.coprs_test_case import (
     CoprsTestCase,
     TransactionDecorator,
@@ -88,3 +92,36 @@ class TestApiRPMRepo(CoprsTestCase):
         for dirname in ['test', 'test:pr:11']:
             repodata = self.tc.get(f"/api_3/rpmrepo/user1/{dirname}/fedora-18/")
             assert repodata.json == DIRS
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_db")
+    def test_apiv3_rpmrepo_cache_invalidated(self):
+        url = "/api_3/rpmrepo/{0}/{1}/fedora-18/".format(self.u2.name,
+                                                         self.c3.name)
+        generate = apiv3_rpmrepo._generate_project_rpmrepo_metadata
+        with mock.patch(
+                "coprs.views.apiv3_ns.apiv3_rpmrepo."
+                "_generate_project_rpmrepo_metadata",
+                wraps=generate) as patched:
+            assert "priority" not in str(self.tc.get(url).json)
+            self.tc.get(url)
+            assert patched.call_count == 1
+
+            # the change is visible immediately
+            self.c3.repo_priority = 42
+            self.db.session.commit()
+            repodata = self.tc.get(url).json
+            assert repodata["repos"]["fedora-18"]["arch"]["x86_64"]["opts"] \
+                == {"priority": 42}
+            assert patched.call_count == 2
+
+            # change in the (runtime) dependency invalidates the cache, too
+            self.c1.description = "changed"
+            self.db.session.commit()
+            self.tc.get(url)
+            assert patched.call_count == 3
+
+            # unrelated project
+            self.c2.description = "changed"
+            self.db.session.commit()
+            self.tc.get(url)
+            assert patched.call_count == 3
@@ -0,0 +1,34 @@
+"""
+Tests for 'backfill-build-status'
+"""
+
+import pytest
+
+from copr_common.enums import StatusEnum
+from commands.backfill_build_status import backfill_build_status_function
+from tests.coprs_test_case import CoprsTestCase
+
+
+class TestBackfillBuildStatus(CoprsTestCase):
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots",
+                             "f_builds", "f_db")
+    def test_backfill(self, capsys):
+        build = self.models.Build
+        self.db.session.query(build).update({build._status: None,
+                                             build._finished: None})
+        self.db.session.commit()
+        self.db.session.expire_all()
+        assert build.query.filter(build.status.is_(None)).count() == 4
+
+        backfill_build_status_function(batch_size=3)
+        assert "Updated 4 builds" in capsys.readouterr().out
+
+        statuses = dict(self.db.session.query(build.id, build.status))
+        assert statuses == {
+            self.b1.id: StatusEnum("succeeded"),
+            self.b2.id: StatusEnum("importing"),
+            self.b3.id: StatusEnum("importing"),
+            self.b4.id: StatusEnum("pending"),
+        }
+        assert self.db.session.query(build.id).filter(
+            build.finished.is_(True)).all() == [(self.b1.id,)]
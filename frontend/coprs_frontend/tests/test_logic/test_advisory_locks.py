@@ -0,0 +1,173 @@
+"""
+Test the advisory locks (coprs.logic.helpers.advisory_xact_lock) used instead
+of the LOCK TABLE statements.
+"""
+
+import os
+import threading
+import time
+from unittest import mock
+
+import pytest
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
+
+import coprs
+from coprs import models
+from coprs.logic.batches_logic import BatchesLogic
+from coprs.logic.builds_logic import BuildsLogic
+from coprs.logic.helpers import (
+    LOCK_BUILD_BATCH,
+    LOCK_PACKAGE_REBUILD,
+    advisory_xact_lock,
+)
+
+from tests.coprs_test_case import CoprsTestCase
+
+
+# A scratch database, the tests create the tables and delete all the data in
+# them, e.g. postgresql://copr-fe@localhost/copr_test
+POSTGRESQL_URL = os.environ.get("COPR_TEST_POSTGRESQL_URL")
+
+
+class TestAdvisoryLocks(CoprsTestCase):
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_db")
+    def test_rebuild_locks_package(self):
+        packages = [
+            models.Package(copr=copr, name="foo", source_type=8,
+                           source_json='{"clone_url": "https://x.org/foo"}')
+            for copr in [self.c1, self.c2]
+        ]
+        self.db.session.add_all(packages)
+        self.db.session.commit()
+
+        with mock.patch("coprs.logic.builds_logic.advisory_xact_lock") as lock:
+            for package in packages + packages[:1]:
+                BuildsLogic.rebuild_package(package)
+
+        # the same package always gets the same key, different packages don't
+        assert lock.call_args_list == [
+            mock.call(LOCK_PACKAGE_REBUILD, package.id)
+            for package in packages + packages[:1]
+        ]
+        assert packages[0].id != packages[1].id
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots",
+                             "f_builds", "f_db")
+    def test_batch_locks_build(self):
+        with mock.patch("coprs.logic.batches_logic.advisory_xact_lock") as lock:
+            BatchesLogic.get_batch_or_create(self.b2.id, self.u1)
+        lock.assert_called_once_with(LOCK_BUILD_BATCH, self.b2.id)
+
+    def test_lock_keys(self):
+        session = mock.MagicMock()
+        session.get_bind.return_value.dialect.name = "postgresql"
+        advisory_xact_lock(LOCK_PACKAGE_REBUILD, 42, session=session)
+        [statement], _ = session.execute.call_args
+        compiled = statement.compile(dialect=postgresql.dialect())
+        assert "pg_advisory_xact_lock" in str(compiled)
+        assert list(compiled.params.values()) == [LOCK_PACKAGE_REBUILD, 42]
+        assert LOCK_PACKAGE_REBUILD != LOCK_BUILD_BATCH
+
+    def test_noop_without_postgresql(self):
+        # no exception, nothing happens with SQLite
+        advisory_xact_lock(LOCK_PACKAGE_REBUILD, 1)
+
+
+@pytest.mark.skipif(not POSTGRESQL_URL,
+                    reason="COPR_TEST_POSTGRESQL_URL not set")
+class TestConcurrentRebuilds(CoprsTestCase):
+    """
+    Run BuildsLogic.rebuild_package() concurrently, in separate sessions, in
+    a real PostgreSQL database.
+    """
+
+    def setup_method(self, method):
+        self.engine = sqlalchemy.create_engine(POSTGRESQL_URL)
+        with self.engine.begin() as connection:
+            # needed by the trigram indexes, created by alembic otherwise
+            connection.execute(
+                sqlalchemy.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        with coprs.app.app_context():
+            self.use_postgresql = mock.patch.dict(coprs.db.engines,
+                                                  {None: self.engine})
+        self.use_postgresql.start()
+        super().setup_method(method)
+
+    def teardown_method(self, method):
+        super().teardown_method(method)
+        self.use_postgresql.stop()
+        self.engine.dispose()
+
+    def _rebuild(self, package_id, rebuilt, release=None):
+        # each thread has its own app context, and thus its own session
+        with self.app.app_context():
+            package = self.db.session.get(models.Package, package_id)
+            BuildsLogic.rebuild_package(package)
+            rebuilt.set()
+            if release:
+                release.wait(timeout=10)
+            self.db.session.commit()
+
+    def _wait_for_lock(self, package_id):
+        """ Wait till some transaction waits for the package lock """
+        query = sqlalchemy.text(
+            "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' "
+            "AND NOT granted AND classid = :namespace AND objid = :id")
+        params = {"namespace": LOCK_PACKAGE_REBUILD, "id": package_id}
+        for _ in range(50):
+            with self.engine.connect() as connection:
+                if connection.execute(query, params).scalar():
+                    return True
+            time.sleep(0.1)
+        return False
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_db")
+    def test_concurrent_rebuilds(self):
+        """
+        Rebuilds of unrelated packages proceed in parallel, rebuilds of the same
+        package wait for each other and are submitted in order.
+        """
+        packages = [
+            models.Package(copr=self.c1, name=name, source_type=8,
+                           source_json='{"clone_url": "https://x.org/foo"}')
+            for name in ["foo", "bar"]
+        ]
+        self.db.session.add_all(packages)
+        self.db.session.commit()
+        foo, bar = [package.id for package in packages]
+
+        release = threading.Event()
+        rebuilt = {name: threading.Event() for name in ["first", "other", "same"]}
+        first = threading.Thread(target=self._rebuild,
+                                 args=(foo, rebuilt["first"], release))
+        other = threading.Thread(target=self._rebuild,
+                                 args=(bar, rebuilt["other"]))
+        same = threading.Thread(target=self._rebuild,
+                                args=(foo, rebuilt["same"]))
+        try:
+            first.start()
+            assert rebuilt["first"].wait(timeout=10)
+
+            other.start()
+            same.start()
+            # a different package is not blocked by the first transaction
+            other.join(timeout=10)
+            assert not other.is_alive()
+            assert rebuilt["other"].is_set()
+            # the same package waits till the first transaction ends
+            assert self._wait_for_lock(foo)
+            assert not rebuilt["same"].is_set()
+        finally:
+            release.set()
+            for thread in [first, other, same]:
+                if thread.is_alive():
+                    thread.join(timeout=10)
+
+        assert rebuilt["same"].is_set()
+        self.db.session.expire_all()
+        builds = (models.Build.query.filter(models.Build.package_id == foo)
+                  .order_by(models.Build.id).all())
+        assert len(builds) == 2
+        assert builds[0].submitted_on <= builds[1].submitted_on
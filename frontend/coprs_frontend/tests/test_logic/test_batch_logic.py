@@ -163,16 +163,16 @@ class TestBatchesLogic(CoprsTestCase):
         #    finished).
         # 4. Read all builds (lazy) from Batch 2 to get Build statuses.  This is
         #    the only Batch where we need to iterate through Builds (as there's
-        #    only one tree of batches).
-        # 5. Read BuildChroots (lazy) from ^^ to get statuses.
-        # 6. Large query for BuildChroots (get_pending_build_tasks).
+        #    only one tree of batches).  The statuses are materialized in the
+        #    build table so no BuildChroots are loaded.
+        # 5. Large query for BuildChroots (get_pending_build_tasks).
         #
         # The last batch (ID=2+more_bchs) contains one "ready" BuildChroot task
         # (the srpm upload emulation, see _prepare_project_with_batches()) which
         # is only blocked by parent batch.  But because we cache Batch objects
         # in pending_jobs() method - they are preloaded and we can be sure that
         # we don't have to re-load the batch data to check if that is finished.
-        expected = 6
+        expected = 5
         if expected != len(dq):
             print()
             for n, query in enumerate(dq):
@@ -299,13 +299,14 @@ class TestBatchesLogic(CoprsTestCase):
         asserts = [
             sql_alchemy_time < fill_time/3*2,
             query_time < fill_time/20,
-            # - for each project two queries (for batch => one build +batch_build)
+            # - for each project one query (for batch => one build, the build
+            #   status is materialized so no build_chroots are loaded)
             # - two large queries (srpm + rpms)
             # - one query for self.tc initialization
             # Note that we only lazily load first Build in each unblocked batch,
             # because even that first Build in batch is not yet finished -
             # meaning that the whole batch is not yet finished as well.
-            len(dq) == len(projects)*2 + 2 + 1,
+            len(dq) == len(projects) + 2 + 1,
         ]
 
         if not all(asserts):
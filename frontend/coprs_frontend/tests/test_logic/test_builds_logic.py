@@ -20,8 +20,10 @@ from coprs.exceptions import (ActionInProgressException,
                               InsufficientStorage)
 
 from coprs.logic.actions_logic import ActionsLogic
+from coprs.logic.background_jobs_logic import BackgroundJobsLogic
 from coprs.logic.builds_logic import (
     BuildsLogic,
+    BuildsMonitorLogic,
 )
 
 from tests.coprs_test_case import CoprsTestCase, TransactionDecorator
@@ -180,6 +182,138 @@ class TestBuildsLogic(CoprsTestCase):
         assert len(BuildsLogic.get_pending_srpm_build_tasks().all()) == 1
         assert len(BuildsLogic.get_pending_srpm_build_tasks(data_type="for_backend").all()) == 3
 
+    def _check_latest_build_chroots(self):
+        expected = {}
+        for bch in self.models.BuildChroot.query.all():
+            build = bch.build
+            if build is None:
+                # SQLite doesn't cascade the build deletion
+                continue
+            key = (build.copr_dir_id, build.package_id, bch.mock_chroot_id)
+            if None in key:
+                continue
+            expected[key] = max(expected.get(key, 0), build.id)
+
+        stored = {
+            (row.copr_dir_id, row.package_id, row.mock_chroot_id): row.build_id
+            for row in self.models.LatestBuildChroot.query.all()
+        }
+        assert stored == expected
+        return stored
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_builds",
+                             "f_db")
+    def test_latest_build_chroot(self):
+        stored = self._check_latest_build_chroots()
+        assert stored[(self.c2_dir.id, self.p2.id, self.mc2.id)] == self.b4.id
+
+        # a new build replaces the old ones
+        build = BuildsLogic.create_new_from_other_build(self.u2, self.c2,
+                                                        self.b4)
+        self.db.session.commit()
+        stored = self._check_latest_build_chroots()
+        assert stored[(self.c2_dir.id, self.p2.id, self.mc2.id)] == build.id
+
+        # the old build moved to a different package
+        self.b3.package = self.p1
+        self.db.session.commit()
+        self._check_latest_build_chroots()
+
+        # deleted build, the previous one is the latest again
+        self.db.session.delete(build)
+        self.db.session.commit()
+        stored = self._check_latest_build_chroots()
+        assert stored[(self.c2_dir.id, self.p2.id, self.mc2.id)] == self.b4.id
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_builds",
+                             "f_db")
+    def test_latest_build_chroot_upsert(self):
+        """ An older build never replaces the newer one """
+        key = (self.c2_dir.id, self.p2.id, self.mc2.id)
+        build = BuildsLogic.create_new_from_other_build(self.u2, self.c2,
+                                                        self.b4)
+        self.db.session.commit()
+        assert self._check_latest_build_chroots()[key] == build.id
+
+        # e.g. a concurrent transaction that still considers b4 the latest one
+        BuildsMonitorLogic.update_latest_build_chroots(self.b4.build_chroots,
+                                                       set())
+        self.db.session.commit()
+        assert self._check_latest_build_chroots()[key] == build.id
+
+        # missing rows are inserted
+        self.models.LatestBuildChroot.query.delete()
+        BuildsMonitorLogic.update_latest_build_chroots(self.b4.build_chroots,
+                                                       set())
+        BuildsMonitorLogic.update_latest_build_chroots(build.build_chroots,
+                                                       set())
+        self.db.session.commit()
+        row = self.db.session.get(self.models.LatestBuildChroot, key)
+        assert row.build_id == build.id
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_builds",
+                             "f_db")
+    def test_jobs_buckets(self):
+        # (submitted_on, started_on, ended_on, status) for each build chroot
+        times = [
+            (1000, 1100, 1500, "succeeded"),
+            (1000, None, None, "pending"),
+            (1000, None, None, "failed"),
+            (1250, 1600, None, "running"),
+            (1250, 2000, 2100, "succeeded"),
+            (1250, 1300, 1300, "succeeded"),
+        ]
+        build_chroots = self.models.BuildChroot.query.all()
+        assert len(build_chroots) >= len(times)
+        for build_chroot in build_chroots:
+            build_chroot.started_on = build_chroot.ended_on = None
+            build_chroot.status = StatusEnum("canceled")
+        for build_chroot, (submitted, started, ended, status) in \
+                zip(build_chroots, times):
+            build_chroot.build.submitted_on = submitted
+            build_chroot.started_on = started
+            build_chroot.ended_on = ended
+            build_chroot.status = StatusEnum(status)
+        self.db.session.commit()
+
+        for start, step, steps in [(900, 100, 15), (1250, 50, 10),
+                                   (1300, 300, 1), (2100, 100, 3)]:
+            buckets = BuildsLogic.get_jobs_buckets(start, step, steps)
+            expected = {"pending": [], "running": []}
+            for i in range(steps):
+                bucket_start = start + i * step
+                bucket_end = bucket_start + step
+                expected["pending"].append(BuildsLogic.get_pending_jobs_bucket(
+                    bucket_start, bucket_end))
+                expected["running"].append(BuildsLogic.get_running_jobs_bucket(
+                    bucket_start, bucket_end))
+            assert buckets == expected
+
+        assert BuildsLogic.get_jobs_buckets(900, 100, 15)["running"] == \
+            [0, 0, 1, 1, 1, 1, 0, 1, 1, 1, 1, 2, 1, 1, 1]
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_builds",
+                             "f_db")
+    def test_graph_data_cached(self):
+        params = {"type": "10min", "step": 600, "steps": 6,
+                  "start": 6000, "end": 9600}
+        self.db.session.add(self.models.BuildsStatistics(
+            time=7200, stat_type="10min", pending=5, running=6))
+        self.db.session.commit()
+
+        with mock.patch.object(BuildsLogic, "get_jobs_buckets",
+                               wraps=BuildsLogic.get_jobs_buckets) as buckets:
+            data = BuildsLogic.get_graph_data(params)
+            # one call for all the missing buckets
+            buckets.assert_called_once_with(6000, 600, 6, with_pending=True)
+            assert data["pending"][2] == 5
+            assert data["running"][2] == 6
+
+            assert BuildsLogic.get_graph_data(params) == data
+            assert buckets.call_count == 1
+
+        assert self.models.BuildsStatistics.query.count() == 6
+
     def test_delete_build_exceptions(
             self, f_users, f_coprs, f_mock_chroots, f_builds, f_db):
         for bc in self.b4_bc:
@@ -634,7 +768,9 @@ class TestBuildsLogic(CoprsTestCase):
         build = self.db.session.get(models.Build, 1)
         assert build.source_state == "failed" if fail else "importing"
 
-        # Removed upon failure, otherwise exists!
+        # Removed upon failure (by the background job), otherwise exists!
+        assert os.path.exists(storage)
+        BackgroundJobsLogic.process()
         assert os.path.exists(storage) is not fail
 
         if fail:
@@ -655,6 +791,7 @@ class TestBuildsLogic(CoprsTestCase):
         assert r.status_code == 200
         build = self.db.session.get(models.Build, 1)
         assert build.source_state == "succeeded"
+        assert BackgroundJobsLogic.process() == 1
         assert not os.path.exists(storage)
 
     @pytest.mark.parametrize(
@@ -699,3 +836,67 @@ class TestBuildsLogic(CoprsTestCase):
         )
         assert response.status_code == 200
         assert [x.state for x in build.build_chroots] == states
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots",
+                             "f_builds", "f_db")
+    def test_update_states_from_dicts(self):
+        upd_dicts = {}
+        for build, build_chroots in [(self.b1, self.b1_bc),
+                                     (self.b3, self.b3_bc),
+                                     (self.b4, self.b4_bc)]:
+            upd_dicts[build.id] = {
+                "id": build.id,
+                "task_id": "{}-{}".format(build.id, build_chroots[0].name),
+                "chroot": build_chroots[0].name,
+                "status": StatusEnum("running"),
+                "result_dir": "0000000{}".format(build.id),
+            }
+        upd_dicts[1000] = {"id": 1000, "chroot": "fedora-18-x86_64",
+                           "status": StatusEnum("running")}
+
+        updated = BuildsLogic.update_states_from_dicts(upd_dicts)
+        self.db.session.commit()
+        assert sorted(updated) == [self.b1.id, self.b3.id, self.b4.id]
+
+        # finished chroot stays finished
+        bch = self.db.session.get(models.BuildChroot, self.b1_bc[0].id)
+        assert bch.status == StatusEnum("succeeded")
+        assert bch.result_dir == "00000001"
+
+        # the materialized Build.status is updated, too
+        running = models.Build.query.filter(
+            models.Build.status == StatusEnum("running")).all()
+        assert [build.id for build in running] == [self.b4.id]
+        for build_chroots in [self.b3_bc, self.b4_bc]:
+            bch = self.db.session.get(models.BuildChroot, build_chroots[0].id)
+            assert bch.state == "running"
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots",
+                             "f_builds", "f_db")
+    @mock.patch("coprs.logic.builds_logic.requests.post")
+    def test_pagure_flag_background_job(self, post):
+        self.c1.scm_repo_url = "https://pagure.io/foo"
+        self.c1.scm_api_auth_json = json.dumps({"api_key": "key"})
+        self.b2.update_callback = "pagure_flag_commit"
+        self.b2.scm_object_id = "abcd"
+
+        # two state changes, one flag update
+        BuildsLogic.process_update_callback(self.b2)
+        BuildsLogic.process_update_callback(self.b2)
+        self.db.session.commit()
+        assert not post.called
+        assert BackgroundJobsLogic.process() == 2
+        assert post.call_count == 1
+        assert post.call_args[0][0] == \
+            "https://pagure.io/api/0//foo/c/abcd/flag"
+        assert models.BackgroundJob.query.count() == 0
+
+        # failed job is re-tried later
+        post.side_effect = IOError("connection refused")
+        BuildsLogic.process_update_callback(self.b2)
+        self.db.session.commit()
+        assert BackgroundJobsLogic.process() == 1
+        job = models.BackgroundJob.query.one()
+        assert job.attempts == 1
+        assert job.run_after > time.time()
+        assert BackgroundJobsLogic.process() == 0
@@ -11,6 +11,7 @@ from coprs.logic.actions_logic import ActionsLogic
 from coprs.logic.complex_logic import (
     BuildConfigLogic,
     ComplexLogic,
+    ConfigVersionLogic,
     ProjectForking,
     ReposLogic,
 )
@@ -243,6 +244,52 @@ class TestProjectForking(CoprsTestCase):
         assert ComplexLogic.get_copr_by_repo("copr:///user1/foocopr") is None
         assert ComplexLogic.get_copr_by_repo("copr://user1//foocopr") is None
 
+    @pytest.mark.usefixtures("f_users", "f_copr_transitive_dependency", "f_db")
+    def test_resolved_runtime_dependencies(self):
+        """
+        The transitive runtime dependencies are pre-calculated in database,
+        and re-calculated when any project in the chain changes.
+        """
+        def _deps(copr):
+            internal, external, non_existing = \
+                ComplexLogic.get_transitive_runtime_dependencies(copr)
+            return set(internal), external, non_existing
+
+        def _stored(copr):
+            return models.CoprRuntimeDependency.query.filter_by(
+                copr_id=copr.id).count()
+
+        expected = ({self.c_td2, self.c_td3}, ["http://some.url/"],
+                    ["copr://user2/nonexisting"])
+        assert _deps(self.c_td1) == expected
+        internal, external, non_existing = \
+            ComplexLogic.resolve_transitive_runtime_dependencies(self.c_td1)
+        assert (set(internal), external, non_existing) == expected
+        assert _stored(self.c_td1) == 4
+        assert _deps(self.c3) == ({self.c1}, ["https://url.to/external/repo"], [])
+
+        # invalidated along the reverse edges
+        self.c_td3.runtime_dependencies = "copr://user2/depcopr1"
+        self.db.session.commit()
+        assert _deps(self.c_td1) == ({self.c_td2, self.c_td3},
+                                     ["http://some.url/"], [])
+
+        # the missing dependency appears
+        nonexisting = models.Copr(name="nonexisting", user=self.u2, repos="",
+                                  runtime_dependencies="copr://user2/depcopr3")
+        self.db.session.add(nonexisting)
+        self.c_td3.runtime_dependencies = "copr://user2/nonexisting"
+        self.db.session.commit()
+        assert _deps(self.c_td1)[0] == {self.c_td2, self.c_td3, nonexisting}
+        assert _deps(nonexisting)[0] == {self.c_td3}
+
+        # deleted project breaks the chain
+        self.c_td3.deleted = True
+        self.db.session.commit()
+        assert _deps(self.c_td1) == ({self.c_td2}, ["http://some.url/"],
+                                     ["copr://user2/depcopr3"])
+        assert _stored(self.c_td3) == 0
+
     @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_builds",
                              "f_db")
     def test_generate_build_config_with_dep_mistake(self):
@@ -267,6 +314,41 @@ class TestProjectForking(CoprsTestCase):
         assert len(build_config["repos"]) == 2
         assert build_config["repos"][1]["id"] == "copr_non_existing"
 
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_db")
+    def test_build_config_snapshot(self):
+        bcl = BuildConfigLogic
+        chroot = "fedora-18-x86_64"
+        expected = bcl.generate_build_config(self.c1.main_dir, chroot)
+        version = ConfigVersionLogic.get(self.c1.id)
+        assert ConfigVersionLogic.get(self.c1.id) == version
+
+        with mock.patch.object(bcl, "generate_build_config",
+                               wraps=bcl.generate_build_config) as generate:
+            assert bcl.get_build_config(self.c1.main_dir, chroot) == expected
+            assert bcl.get_build_config(self.c1.main_dir, chroot) == expected
+            assert generate.call_count == 1
+
+            # the other process has only the Redis tier
+            bcl._snapshots.clear()
+            assert bcl.get_build_config(self.c1.main_dir, chroot) == expected
+            assert generate.call_count == 1
+
+            # not committed changes don't invalidate the cache
+            self.c1.copr_chroots[0].buildroot_pkgs = "foo bar"
+            self.db.session.flush()
+            assert ConfigVersionLogic.get(self.c1.id) == version
+            self.db.session.commit()
+            assert ConfigVersionLogic.get(self.c1.id) != version
+            config = bcl.get_build_config(self.c1.main_dir, chroot)
+            assert config["additional_packages"] == ["foo", "bar"]
+            assert generate.call_count == 2
+
+            # other projects are not affected
+            version = ConfigVersionLogic.get(self.c1.id)
+            self.c2.repos = "http://example.com/repo"
+            self.db.session.commit()
+            assert ConfigVersionLogic.get(self.c1.id) == version
+
 class FooModel(object):
     """
     Mocks SqlAlchemy db.Model
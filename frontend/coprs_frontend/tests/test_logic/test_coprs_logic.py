@@ -3,9 +3,7 @@ import pytest
 import flask
 
 from datetime import datetime, timedelta, date
-from flask_whooshee import Whooshee
 
-from sqlalchemy import desc
 
 from copr_common.enums import ActionTypeEnum, StatusEnum
 from coprs import app
@@ -17,7 +15,6 @@ from coprs.logic.users_logic import UsersLogic
 from coprs.logic.complex_logic import ComplexLogic
 
 from coprs import models
-from coprs.whoosheers import CoprWhoosheer
 from tests.coprs_test_case import CoprsTestCase
 from coprs.exceptions import (
     AccessRestricted,
@@ -39,14 +36,11 @@ class TestCoprsLogic(CoprsTestCase):
         # test will fail if this raises exception
         CoprsLogic.raise_if_unfinished_blocking_action(self.c1, "ha, failed")
 
-    def test_fulltext_whooshee_return_all_hits(self, f_users, f_db):
+    def test_fulltext_return_all_hits(self, f_users, f_db):
         # https://bugzilla.redhat.com/show_bug.cgi?id=1153039
         self.prefix = u"prefix"
         self.s_coprs = []
 
-        index = Whooshee.get_or_create_index(app, CoprWhoosheer)
-        writer = index.writer()
-
         u1_count = 150
         for x in range(u1_count):
             self.s_coprs.append(models.Copr(name=self.prefix + str(x), user=self.u1))
@@ -62,17 +56,7 @@ class TestCoprsLogic(CoprsTestCase):
         self.db.session.add_all(self.s_coprs)
         self.db.session.commit()
 
-        for copr in self.s_coprs:
-            CoprWhoosheer.insert_copr(writer, copr)
-        writer.commit(optimize=True)
-
-        query = CoprsLogic.get_multiple_fulltext("prefix")
-        pre_query = models.Copr.query.order_by(desc(models.Copr.created_on))\
-            .join(models.User).filter(models.Copr.deleted == False)
-
-        query = pre_query.whooshee_search(self.prefix, whoosheer=CoprWhoosheer) # needs flask-whooshee-0.2.0
-
-        results = query.all()
+        results = CoprsLogic.get_multiple_fulltext(self.prefix).all()
         for obj in results:
             assert self.prefix in obj.name
 
@@ -81,6 +65,41 @@ class TestCoprsLogic(CoprsTestCase):
 
         assert obtained == expected
 
+    def test_fulltext_updated_with_changes(self, f_users, f_coprs,
+                                           f_mock_chroots, f_db):
+        def _search(fulltext):
+            return {copr.full_name for copr in
+                    CoprsLogic.get_multiple_fulltext(fulltext)}
+
+        assert _search("foocopr") == {"user1/foocopr", "user2/foocopr"}
+        assert _search("user2") == {"user2/foocopr", "user2/barcopr"}
+        assert _search("barc") == {"user2/barcopr"}
+        assert _search("foo-copr") == set()
+        assert _search("---") == set()
+
+        self.c1.description = "Experimental python3.12 builds"
+        package = models.Package(name="python-flask", copr=self.c2,
+                                 source_type=0)
+        self.db.session.add(package)
+        self.db.session.commit()
+        assert _search("python3 12") == {"user1/foocopr"}
+        assert _search("Flask") == {"user2/foocopr"}
+
+        # chroots are searchable, too
+        assert _search("fedora 17 i386") == {"user2/foocopr"}
+        self.c2.copr_chroots[1].deleted = True
+        self.db.session.commit()
+        assert _search("fedora 17 i386") == set()
+
+        package.name = "python-django"
+        self.db.session.commit()
+        assert _search("flask") == set()
+        assert _search("django") == {"user2/foocopr"}
+
+        self.db.session.delete(package)
+        self.db.session.commit()
+        assert _search("django") == set()
+
     def test_raise_if_cant_delete(self, f_users, f_fas_groups, f_coprs):
         # Project owner should be able to delete his project
         CoprsLogic.raise_if_cant_delete(self.u2, self.c2)
@@ -1,5 +1,8 @@
+import json
+
 import pytest
 
+from coprs import models
 from coprs.logic.packages_logic import PackagesLogic
 
 from tests.coprs_test_case import CoprsTestCase
@@ -14,6 +17,48 @@ class TestPackagesLogic(CoprsTestCase):
         assert builds_p5 == {self.b10: [self.b10_bc[0]],
                              self.b11: [self.b11_bc[1]]}
 
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_db")
+    def test_package_scm_source(self):
+        def _source(clone_url, **kwargs):
+            return json.dumps({"clone_url": clone_url, **kwargs})
+
+        def _candidates(clone_url):
+            return sorted(package.name for package, _ in
+                          PackagesLogic.get_by_clone_url(clone_url))
+
+        foo = models.Package(
+            copr=self.c1, name="foo", source_type=8, webhook_rebuild=True,
+            source_json=_source("https://github.com/copr/foo.git/",
+                                committish="main", subdirectory="foo"))
+        bar = models.Package(
+            copr=self.c2, name="bar", source_type=8, webhook_rebuild=True,
+            source_json=_source("https://github.com/copr/foo"))
+        baz = models.Package(
+            copr=self.c2, name="baz", source_type=8, webhook_rebuild=False,
+            source_json=_source("https://github.com/copr/foo"))
+        self.db.session.add_all([foo, bar, baz])
+        self.db.session.commit()
+
+        assert _candidates("http://github.com/copr/foo/") == ["bar", "foo"]
+        assert _candidates("https://github.com/copr/foobar") == []
+
+        scm_source = self.db.session.get(models.PackageScmSource, foo.id)
+        assert scm_source.clone_url == "github.com/copr/foo"
+        assert scm_source.committish == "main"
+        assert scm_source.subdirectory == "foo"
+
+        # source changed
+        bar.source_json = _source("https://github.com/copr/bar")
+        self.db.session.commit()
+        assert _candidates("https://github.com/copr/foo") == ["foo"]
+        assert _candidates("https://github.com/copr/bar") == ["bar"]
+
+        # package removed
+        self.db.session.delete(foo)
+        self.db.session.commit()
+        assert _candidates("https://github.com/copr/foo") == []
+        assert models.PackageScmSource.query.count() == 2
+
     @staticmethod
     @pytest.mark.parametrize(
         "ref, copr_pkg_name, result",
@@ -1,7 +1,13 @@
 # coding: utf-8
+from unittest import mock
+
 import pytest
 
-from coprs.logic.stat_logic import CounterStatLogic
+from coprs.logic.stat_logic import (
+    CounterStatLogic,
+    REDIS_COUNTERS_KEY,
+    handle_be_stat_message,
+)
 from coprs.helpers  import CounterStatType
 from tests.coprs_test_case import CoprsTestCase
 
@@ -30,3 +36,96 @@ class TestStatLogic(CoprsTestCase):
         self.db.session.commit()
         csl = CounterStatLogic.get(self.counter_name).one()
         assert csl.counter == 1
+
+    def test_incr_many(self):
+        CounterStatLogic.incr(self.counter_name, self.counter_type, 5)
+        other_name = "{}:user/other".format(CounterStatType.REPO_DL)
+        CounterStatLogic.incr_many({
+            self.counter_name: (self.counter_type, 2),
+            other_name: (self.counter_type, 3),
+        })
+        self.db.session.commit()
+        assert CounterStatLogic.get(self.counter_name).one().counter == 7
+        assert CounterStatLogic.get(other_name).one().counter == 3
+
+    def test_buffered_counters(self):
+        CounterStatLogic.incr(self.counter_name, self.counter_type, 5)
+        for _ in range(3):
+            CounterStatLogic.buffer_incr(self.counter_name, self.counter_type)
+        other_name = "{}:user/other".format(CounterStatType.REPO_DL)
+        CounterStatLogic.buffer_incr(other_name, self.counter_type, 2)
+
+        # nothing in the database yet
+        assert CounterStatLogic.get(self.counter_name).one().counter == 5
+        assert CounterStatLogic.get_buffered(
+            self.counter_type, [self.counter_name, other_name, "unknown"]) \
+            == {self.counter_name: 3, other_name: 2}
+
+        assert CounterStatLogic.flush_buffered() == 2
+        assert CounterStatLogic.get(self.counter_name).one().counter == 8
+        assert CounterStatLogic.get(other_name).one().counter == 2
+        assert CounterStatLogic.get_buffered(
+            self.counter_type, [self.counter_name, other_name]) == {}
+        assert CounterStatLogic.flush_buffered() == 0
+
+    def test_buffered_counters_failed_flush(self):
+        """ The increments from a failed flush are not lost """
+        CounterStatLogic.buffer_incr(self.counter_name, self.counter_type, 2)
+        with mock.patch("coprs.logic.stat_logic.CounterStatLogic.incr_many",
+                        side_effect=RuntimeError("db is down")):
+            with pytest.raises(RuntimeError):
+                CounterStatLogic.flush_buffered()
+        CounterStatLogic.buffer_incr(self.counter_name, self.counter_type, 1)
+        assert CounterStatLogic.get_buffered(
+            self.counter_type, [self.counter_name]) == {self.counter_name: 3}
+
+        assert CounterStatLogic.flush_buffered() == 1
+        assert CounterStatLogic.get(self.counter_name).one().counter == 3
+        assert CounterStatLogic.flush_buffered() == 0
+
+    def test_buffered_counters_popped_before_commit(self):
+        """ The increments are removed from Redis before the DB commit """
+        CounterStatLogic.buffer_incr(self.counter_name, self.counter_type, 2)
+        buffered = []
+
+        def _commit():
+            buffered.append(CounterStatLogic.redis().exists(REDIS_COUNTERS_KEY))
+
+        with mock.patch("coprs.logic.stat_logic.db.session.commit",
+                        side_effect=_commit):
+            assert CounterStatLogic.flush_buffered() == 1
+        assert buffered == [0]
+
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_db")
+    def test_repo_file_download_counter(self):
+        """ The .repo file downloads are counted in Redis """
+        url = "/coprs/{0}/{1}/repo/fedora-18/some.repo".format(
+            self.u1.name, self.c1.name)
+        for _ in range(2):
+            assert self.tc.get(url).status_code == 200
+        assert not self.models.CounterStat.query.all()
+        assert CounterStatLogic.get_copr_repo_dl_stat(self.c1)["fedora-18"] == 2
+
+        CounterStatLogic.flush_buffered()
+        assert [stat.counter for stat in self.models.CounterStat.query] == [2]
+        assert CounterStatLogic.get_copr_repo_dl_stat(self.c1)["fedora-18"] == 2
+
+    def test_handle_be_stat_message(self):
+        handle_be_stat_message({
+            "ts_from": 1, "ts_to": 2,
+            "hits": {
+                "chroot_rpms_dl_stat|user|copr|fedora-rawhide-x86_64": 3,
+                "project_rpms_dl_stat|user|copr": 3,
+            },
+        })
+        handle_be_stat_message({
+            "ts_from": 3, "ts_to": 4,
+            "hits": {"project_rpms_dl_stat|user|copr": 2},
+        })
+        self.db.session.commit()
+        counters = {stat.name: stat.counter
+                    for stat in self.models.CounterStat.query.all()}
+        assert counters == {
+            "chroot_rpms_dl_stat:hset::user@copr:fedora-rawhide-x86_64": 3,
+            "project_rpms_dl_stat:hset::user@copr": 5,
+        }
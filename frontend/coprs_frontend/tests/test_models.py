@@ -87,6 +87,39 @@ class TestBuildModel(CoprsTestCase):
         self.b1.source_status = StatusEnum("canceled")
         assert bch.finished
 
+    @pytest.mark.usefixtures('f_users', 'f_coprs', 'f_mock_chroots', 'f_builds',
+                             'f_db')
+    def test_materialized_status(self):
+        """ Build.status and Build.finished are stored in the build table """
+        build_model = self.models.Build
+
+        def _query(status):
+            return [b.id for b in build_model.query
+                    .filter(build_model.status == StatusEnum(status))
+                    .order_by(build_model.id)]
+
+        def _unfinished():
+            return build_model.query.filter(build_model.finished.is_(False)).all()
+
+        assert _query("succeeded") == [self.b1.id]
+        assert _query("importing") == [self.b2.id, self.b3.id]
+        assert _query("running") == []
+
+        self.b1.build_chroots[0].status = StatusEnum("running")
+        assert self.b1.status == StatusEnum("running")
+        self.db.session.commit()
+        assert _query("running") == [self.b1.id]
+        assert self.b1 in _unfinished()
+
+        self.b1.build_chroots[0].status = StatusEnum("succeeded")
+        self.b2.canceled = True
+        self.db.session.commit()
+        assert _query("succeeded") == [self.b1.id]
+        assert _query("canceled") == [self.b2.id]
+        assert _query("importing") == [self.b3.id]
+        assert self.b1 not in _unfinished()
+        assert self.b2 not in _unfinished()
+
     @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_builds",
                              "f_db")
     def test_build_logs(self):
@@ -152,6 +152,49 @@ class TestWaitingBuilds(CoprsTestCase):
             'allow_user_ssh': False,
         }]
 
+    @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_builds", "f_db")
+    def test_pending_jobs_delta(self):
+        self.b2.source_status = StatusEnum("pending")
+        for bch in self.b3_bc:
+            bch.status = StatusEnum("pending")
+        self.db.session.commit()
+
+        full = self.tc.get("/backend/pending-jobs/").json
+        delta = self.tc.get("/backend/pending-jobs-delta/").json
+        assert delta["full"]
+        assert delta["changed"] == full
+        assert delta["removed"] == []
+
+        # nothing happened
+        token = delta["token"]
+        delta = self.tc.get("/backend/pending-jobs-delta/{}/".format(token)).json
+        assert not delta["full"]
+        assert delta["changed"] == []
+        assert delta["removed"] == []
+        assert delta["token"] != token
+
+        # one task finished, one added, one changed
+        self.b3_bc[0].status = StatusEnum("succeeded")
+        self.b3_bc[1].set_tags(["foo"])
+        for bch in self.b4_bc:
+            bch.status = StatusEnum("pending")
+        self.db.session.commit()
+
+        token = delta["token"]
+        delta = self.tc.get("/backend/pending-jobs-delta/{}/".format(token)).json
+        assert not delta["full"]
+        assert delta["removed"] == [self.b3_bc[0].task_id]
+        changed = {task["task_id"]: task for task in delta["changed"]}
+        assert set(changed) == {self.b3_bc[1].task_id} | \
+            {bch.task_id for bch in self.b4_bc}
+        assert changed[self.b3_bc[1].task_id]["tags"] == ["foo"]
+
+        # the token may be used only once
+        delta = self.tc.get("/backend/pending-jobs-delta/{}/".format(token)).json
+        assert delta["full"]
+        assert {task["task_id"] for task in delta["changed"]} == \
+            {task["task_id"] for task in self.tc.get("/backend/pending-jobs/").json}
+
     @pytest.mark.usefixtures("f_users", "f_coprs", "f_mock_chroots", "f_builds", "f_db")
     def test_canceled_build_not_in_pending_jobs(self):
         """
@@ -19,6 +19,19 @@ class TestBuildProxy(object):
         assert build.id == 1
         assert build.foo == "bar"
 
+    def test_get_many(self, send):
+        def _send(endpoint):
+            build_id = int(endpoint.split("/")[-1])
+            response = mock.Mock(spec=Response)
+            response.json.return_value = {"id": build_id}
+            return response
+        send.side_effect = _send
+
+        build_proxy = BuildProxy(self.config)
+        builds = build_proxy.get_many(range(1, 21), max_workers=4)
+        assert [build.id for build in builds] == list(range(1, 21))
+        assert all(build.__proxy__ is build_proxy for build in builds)
+
 
 @mock.patch('copr.v3.proxies.Request.send')
 def test_build_distgit(send):
@@ -0,0 +1,80 @@
+from requests import PreparedRequest, Response
+from copr.test import mock
+from copr.v3.pagination import iterate, next_page
+from copr.v3.requests import munchify
+
+
+def _response(url, items, **meta):
+    request = PreparedRequest()
+    request.prepare(method="GET", url=url)
+    response = mock.Mock(spec=Response)
+    response.request = request
+    response.json.return_value = {
+        "items": [{"id": item} for item in items],
+        "meta": dict({"limit": 2, "offset": 0}, **meta),
+    }
+    return munchify(response)
+
+
+class TestPagination(object):
+    url = "http://copr/api_3/build/list?ownername=a&projectname=b&limit=2"
+
+    def test_next_page_offset(self):
+        session = mock.Mock()
+        session.send.return_value = _response(self.url, []).__response__
+        next_page(_response(self.url, [1, 2]), session=session)
+        request = session.send.call_args[0][0]
+        assert "offset=2" in request.url
+        assert "cursor" not in request.url
+
+    def test_next_page_cursor(self):
+        session = mock.Mock()
+        session.send.return_value = _response(self.url, []).__response__
+        page = _response(self.url + "&offset=5", [1, 2], next_cursor="abc")
+        next_page(page, session=session)
+        request = session.send.call_args[0][0]
+        assert "cursor=abc" in request.url
+        assert "offset" not in request.url
+
+        # the last page, no need to ask again
+        page = _response(self.url + "&cursor=abc", [3])
+        assert next_page(page, session=session) == []
+        assert session.send.call_count == 1
+
+    @mock.patch("copr.v3.pagination.requests.Session")
+    def test_iterate(self, session_cls):
+        session = session_cls.return_value
+        session.send.side_effect = [
+            _response(self.url + "&cursor=c1", [3, 4],
+                      next_cursor="c2").__response__,
+            _response(self.url + "&cursor=c2", [5]).__response__,
+        ]
+        first = _response(self.url, [1, 2], next_cursor="c1")
+        assert [item.id for item in iterate(first)] == [1, 2, 3, 4, 5]
+        # one session for all the pages
+        assert session_cls.call_count == 1
+        assert session.send.call_count == 2
+        assert session.close.call_count == 1
+
+    @mock.patch("copr.v3.pagination.requests.Session")
+    def test_iterate_client_session(self, session_cls):
+        session = mock.Mock()
+        session.send.return_value = _response(self.url + "&cursor=c1",
+                                              [3]).__response__
+        first = _response(self.url, [1, 2], next_cursor="c1")
+        first.__response__.copr_session = session
+        assert [item.id for item in iterate(first)] == [1, 2, 3]
+        assert session.send.call_count == 1
+        # the Client session is reused, and kept open
+        assert not session_cls.called
+        assert not session.close.called
+
+    def test_next_page_client_session(self):
+        session = mock.Mock()
+        session.send.return_value = _response(self.url, []).__response__
+        page = _response(self.url, [1, 2])
+        page.__response__.copr_session = session
+        next_page(page)
+        assert session.send.call_count == 1
+        # and the following page continues with the same session
+        assert session.send.return_value.copr_session == session
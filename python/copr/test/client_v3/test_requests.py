@@ -1,6 +1,7 @@
 from requests import Response
 from copr.test import mock
-from copr.v3.requests import Request, munchify
+from copr.v3 import BuildProxy, Client
+from copr.v3.requests import DEFAULT_POOL_SIZE, Request, munchify
 
 
 class TestResponse(object):
@@ -35,3 +36,33 @@ class TestRequest(object):
         args, kwargs = request.call_args
         assert kwargs["method"] == "GET"
         assert kwargs["url"] == "http://copr/api_3/foo"
+
+    def test_send_session(self):
+        session = mock.Mock()
+        session.request.return_value.json.return_value = {"foo": "bar"}
+        req = Request(api_base_url="http://copr/api_3", session=session)
+        response = req.send(endpoint="foo")
+        assert response == session.request.return_value
+        assert session.request.call_args[1]["url"] == "http://copr/api_3/foo"
+        # next_page() continues with the same session
+        assert response.copr_session == session
+
+
+class TestSession(object):
+    config = {"copr_url": "http://copr", "connection_pool_size": 3}
+
+    def test_shared_session(self):
+        client = Client(self.config)
+        proxies = [client.base_proxy, client.build_proxy,
+                   client.build_chroot_proxy, client.project_proxy]
+        for proxy in proxies:
+            assert proxy.session is client.session
+            assert proxy.request.session is client.session
+
+        adapter = client.session.get_adapter("https://copr")
+        assert adapter._pool_maxsize == 3
+
+    def test_standalone_proxy_session(self):
+        proxy = BuildProxy({"copr_url": "http://copr"})
+        adapter = proxy.session.get_adapter("https://copr")
+        assert adapter._pool_maxsize == DEFAULT_POOL_SIZE
@@ -1,4 +1,5 @@
 from .helpers import config_from_file
+from .requests import create_session, DEFAULT_POOL_SIZE
 from .proxies import BaseProxy
 from .proxies.project import ProjectProxy
 from .proxies.build import BuildProxy
@@ -13,15 +14,18 @@ from .proxies.webhook import WebhookProxy
 class Client(object):
     def __init__(self, config):
         self.config = config
-        self.base_proxy = BaseProxy(config)
-        self.project_proxy = ProjectProxy(config)
-        self.build_proxy = BuildProxy(config)
-        self.package_proxy = PackageProxy(config)
-        self.mock_chroot_proxy = MockChrootProxy(config)
-        self.monitor_proxy = MonitorProxy(config)
-        self.project_chroot_proxy = ProjectChrootProxy(config)
-        self.build_chroot_proxy = BuildChrootProxy(config)
-        self.webhook_proxy = WebhookProxy(config)
+        # All the proxies share one pool of keep-alive connections
+        self.session = create_session(
+            config.get("connection_pool_size", DEFAULT_POOL_SIZE))
+        self.base_proxy = BaseProxy(config, self.session)
+        self.project_proxy = ProjectProxy(config, self.session)
+        self.build_proxy = BuildProxy(config, self.session)
+        self.package_proxy = PackageProxy(config, self.session)
+        self.mock_chroot_proxy = MockChrootProxy(config, self.session)
+        self.monitor_proxy = MonitorProxy(config, self.session)
+        self.project_chroot_proxy = ProjectChrootProxy(config, self.session)
+        self.build_chroot_proxy = BuildChrootProxy(config, self.session)
+        self.webhook_proxy = WebhookProxy(config, self.session)
 
     @classmethod
     def create_from_config_file(cls, path=None):
@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
 import requests
+from .helpers import List
 from .requests import munchify
 
 try:
@@ -11,28 +12,72 @@ except ImportError:
     from urllib.parse import urlencode
 
 
-def next_page(objects):
+def next_page(objects, session=None):
+    """
+    Request the page following the `objects` page.  The server-provided cursor
+    (`meta.next_cursor`) is used when available, offset otherwise.  The page
+    is requested through the `session` (requests.Session), or through the
+    session of the Client that requested the `objects` page.
+    """
     request = objects.__response__.request
 
-    # Add offset to the previous request URL
     url_parts = list(urlparse.urlparse(request.url))
     query = dict(urlparse.parse_qsl(url_parts[4]))
-    query.update({"offset": objects.meta.offset + objects.meta.limit})
+    next_cursor = objects.meta.get("next_cursor")
+    if next_cursor:
+        query.pop("offset", None)
+        query.update({"cursor": next_cursor})
+    elif "cursor" in query:
+        # the last page in the cursor mode
+        return List(items=[], meta=objects.meta,
+                    response=objects.__response__)
+    else:
+        # Add offset to the previous request URL
+        query.update({"offset": objects.meta.offset + objects.meta.limit})
     url_parts[4] = urlencode(query)
     request.url = urlparse.urlunparse(url_parts)
 
-    session = requests.Session()
+    if session is None:
+        session = _client_session(objects) or requests.Session()
     response = session.send(request)
+    # next_page() of the returned page continues with the same session
+    response.copr_session = session
     return munchify(response)
 
 
+def _client_session(objects):
+    return getattr(objects.__response__, "copr_session", None)
+
+
 # @TODO remove all_pages function if unlimited generator is preferred over it
 def all_pages(objects):
-    all_objects = []
-    while objects:
-        all_objects.extend(objects)
-        objects = next_page(objects)
-    return all_objects
+    return list(iterate(objects))
+
+
+def iterate(objects):
+    """
+    Generator yielding all the objects from the `objects` page, and all the
+    following pages.  The pages are requested one by one, using a single
+    keep-alive connection (of the Client session, if available).
+
+        builds = client.build_proxy.get_list("@copr", "copr",
+                                             pagination={"limit": 100})
+        for build in iterate(builds):
+            print(build.id)
+    """
+    session = _client_session(objects)
+    own_session = session is None
+    if own_session:
+        session = requests.Session()
+    try:
+        while objects:
+            for item in objects:
+                yield item
+            objects = next_page(objects, session=session)
+    finally:
+        # the Client session is closed by the Client
+        if own_session:
+            session.close()
 
 
 def unlimited(objects):
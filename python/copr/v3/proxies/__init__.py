@@ -1,7 +1,8 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from copr.v3.auth import auth_from_config
-from copr.v3.requests import munchify, Request, POST
+from copr.v3.requests import munchify, create_session, Request, POST, DEFAULT_POOL_SIZE
 from ..helpers import for_all_methods, bind_proxy, config_from_file
 
 
@@ -11,11 +12,22 @@ class BaseProxy(object):
     Parent class for all other proxies
     """
 
-    def __init__(self, config):
+    def __init__(self, config, session=None):
+        """
+        :param config: Client configuration dict
+        :param session: requests.Session shared with other proxies, a new one
+            is created (with the "connection_pool_size" from the config)
+            when not specified
+        """
         self.config = config
+        if session is None:
+            session = create_session(
+                config.get("connection_pool_size", DEFAULT_POOL_SIZE))
+        self.session = session
         self.request = Request(
             api_base_url=self.api_base_url,
-            connection_attempts=config.get("connection_attempts", 1)
+            connection_attempts=config.get("connection_attempts", 1),
+            session=session,
         )
         self._auth = None
 
@@ -34,6 +46,18 @@ class BaseProxy(object):
             self._auth = auth_from_config(self.config)
         return self._auth
 
+    def _get_many(self, method, arguments, max_workers=None):
+        """
+        Call method(*args) for each args tuple in arguments concurrently, and
+        return the list of results in the same order.  The first exception
+        raised by the method is re-raised.
+        """
+        if not max_workers:
+            max_workers = self.config.get("connection_pool_size",
+                                          DEFAULT_POOL_SIZE)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda args: method(*args), arguments))
+
     def home(self):
         """
         Call the Copr APIv3 base URL
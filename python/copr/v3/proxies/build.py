@@ -20,6 +20,18 @@ class BuildProxy(BaseProxy):
         response = self.request.send(endpoint=endpoint)
         return munchify(response)
 
+    def get_many(self, build_ids, max_workers=None):
+        """
+        Return builds, requested concurrently
+
+        :param list build_ids: list of int
+        :param int max_workers: number of concurrent requests, defaults to
+            the connection pool size
+        :return: list of Munch, in the order of build_ids
+        """
+        return self._get_many(self.get, [(build_id,) for build_id in build_ids],
+                              max_workers)
+
     def get_source_chroot(self, build_id):
         """
         Return a source build
@@ -342,6 +354,7 @@ class BuildProxy(BaseProxy):
         else:
             kwargs["files"] = files
             kwargs["connection_attempts"] = self.config.get("connection_attempts", 1)
+            kwargs["session"] = self.session
             request = FileRequest(**kwargs)
             response = request.send(
                 endpoint=endpoint, data=data, method=POST, auth=self.auth)
@@ -23,6 +23,17 @@ class BuildChrootProxy(BaseProxy):
         response = self.request.send(endpoint=endpoint, params=params)
         return munchify(response)
 
+    def get_many(self, build_chroots, max_workers=None):
+        """
+        Return build chroots, requested concurrently
+
+        :param list build_chroots: list of (build_id, chrootname) tuples
+        :param int max_workers: number of concurrent requests, defaults to
+            the connection pool size
+        :return: list of Munch, in the order of build_chroots
+        """
+        return self._get_many(self.get, build_chroots, max_workers)
+
     def get_list(self, build_id, pagination=None):
         """
         Return a list of build chroots
@@ -162,7 +162,7 @@ class PackageProxy(BaseProxy):
             "package_name": packagename,
             "project_dirname": project_dirname,
         }
-        build_proxy = BuildProxy(self.config)
+        build_proxy = BuildProxy(self.config, self.session)
         return build_proxy._create(endpoint, data, buildopts=buildopts)
 
     def delete(self, ownername, projectname, packagename):
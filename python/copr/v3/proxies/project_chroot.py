@@ -106,7 +106,8 @@ class ProjectChrootProxy(BaseProxy):
         request = FileRequest(
             api_base_url=self.api_base_url,
             files=files,
-            connection_attempts=self.config.get("connection_attempts", 1)
+            connection_attempts=self.config.get("connection_attempts", 1),
+            session=self.session,
         )
         response = request.send(
             endpoint=endpoint,
@@ -19,21 +19,41 @@ DELETE = "DELETE"
 
 USER_AGENT = "copr python-copr/{0}".format(__version__)
 
+# How many connections to the frontend are kept open by one session (Client)
+DEFAULT_POOL_SIZE = 10
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE):
+    """
+    Create a requests.Session keeping (at most pool_size) keep-alive
+    connections to the frontend, so the consecutive API calls don't need
+    to open a new (TLS) connection each time.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                            pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 
 class Request(object):
     # This should be a replacement of the _fetch method from APIv1
     # We can have Request, FileRequest, AuthRequest/UnAuthRequest, ...
 
-    def __init__(self, api_base_url=None, connection_attempts=1):
+    def __init__(self, api_base_url=None, connection_attempts=1, session=None):
         """
         :param api_base_url:
         :param connection_attempts:
+        :param session: requests.Session to send the requests through, a new
+            connection is opened for each request by default
 
         @TODO maybe don't have both params and data, but rather only one variable
         @TODO and send it as data on POST and as params on GET
         """
         self.api_base_url = api_base_url
         self.connection_attempts = connection_attempts
+        self.session = session
 
     def endpoint_url(self, endpoint, params=None):
         params = params or {}
@@ -48,6 +68,8 @@ class Request(object):
 
         response = self._send_request_repeatedly(request_params, auth)
 
+        # next_page() continues with the same session
+        response.copr_session = self.session
         handle_errors(response)
         return response
 
@@ -56,9 +78,10 @@ class Request(object):
         Repeat the request until it succeeds, or connection retry reaches its limit.
         """
         sleep = 5
+        sender = self.session or requests
         for i in range(1, self.connection_attempts + 1):
             try:
-                response = requests.request(**request_params)
+                response = sender.request(**request_params)
                 if response.status_code == 401 and i < self.connection_attempts:
                     # try to authenticate again, don't sleep!
                     self._update_auth_params(request_params, auth, reauth=True)